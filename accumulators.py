@@ -0,0 +1,357 @@
+"""
+Statistics that are accumulated over many seqtables (i.e. chunks of a large fastq file, or files processed by different workers) without
+keeping the sequences in memory. Accumulators are updated with successive seqtables and accumulators of the same type can be merged. The
+reported statistics are identical to running the corresponding seqtable function on all of the sequences at once
+
+.. note:: chunks of different widths
+
+    Chunks returned by read_sequences.iter_fastq are only padded to the longest read of each chunk while read_fastq pads every read to the
+    longest read of the file. Positions missing from a chunk are therefore counted as padding (fillna_val letters with null quality), exactly
+    as if the chunk had been padded to the widest chunk. Letters at positions missing from a ragged_seqtable are not counted (identical to
+    ragged_seqtable.get_seq_dist), their quality is counted as null quality (identical to get_quality_dist)
+"""
+
+import copy
+import numpy as np
+import pandas as pd
+from .seq_tables import seqtable, format_seq_dist
+from .seq_table_util import quality_histogram, quality_dist_from_histogram
+from .ragged_seqtable import ragged_seqtable
+
+
+def _add_counts(columns, counts, total, new_columns, new_counts, new_total, pad_row=None):
+    """
+        Add two tables of counts (rows are values, columns are positions) that may not contain the same positions or the same number of values
+
+        Args:
+            columns (pd.Index), counts (np array), total (number): positions, counts and number of reads (or sum of weights) of the first table
+            new_columns (list), new_counts (np array), new_total (number): same for the second table
+            pad_row (int, default=None): if defined, reads are padded: positions missing from one table are counted as total reads with the value pad_row
+
+        Returns:
+            columns (pd.Index), counts (np array)
+    """
+    new_columns = pd.Index(new_columns)
+    columns = columns.append(new_columns.difference(columns, sort=False)) if len(columns) else new_columns
+    num_values = max(counts.shape[0], new_counts.shape[0], 0 if pad_row is None else pad_row + 1)
+    dtype = np.result_type(counts.dtype, new_counts.dtype, np.min_scalar_type(total), np.min_scalar_type(new_total))
+    total_counts = np.zeros((num_values, len(columns)), dtype=dtype)
+    total_counts[:counts.shape[0], :counts.shape[1]] += counts
+    new_cols = columns.get_indexer(new_columns)
+    total_counts[:new_counts.shape[0], new_cols] += new_counts
+    if pad_row is not None:
+        total_counts[pad_row, counts.shape[1]:] += total
+        missing = np.ones(len(columns), dtype=bool)
+        missing[new_cols] = False
+        total_counts[pad_row, missing] += new_total
+    return (columns, total_counts)
+
+
+def _pads_reads(st):
+    """
+        Whether positions that are missing from a seqtable should be counted as padding (see the note on chunks of different widths)
+    """
+    return not isinstance(st, ragged_seqtable)
+
+
+def _num_reads(st, weights=None):
+    """
+        Number of reads represented by a seqtable (the sum of counts for collapsed tables, or the sum of weights)
+    """
+    if weights is not None:
+        return np.sum(weights)
+    return len(st) if st.counts is None else st.counts.sum()
+
+
+def merge_accumulators(accumulators):
+    """
+        Merge a list of accumulators of the same type (i.e. returned by different workers) into a new accumulator
+    """
+    accumulators = list(accumulators)
+    merged = copy.deepcopy(accumulators[0])
+    for other in accumulators[1:]:
+        merged.merge(other)
+    return merged
+
+
+class seq_dist_accumulator():
+    """
+    Accumulates the distribution of letters at each position (see seqtable.get_seq_dist)
+
+    Args:
+        positions (list, default=None): positions to count (all positions if None)
+
+    Examples:
+        >>> acc = seq_dist_accumulator()
+        >>> for chunk in iter_fastq('run.fastq'):
+        >>>     acc.update(chunk)
+        >>> acc.result(method='freq')
+    """
+    def __init__(self, positions=None):
+        self.positions = positions
+        self.seqtype = None
+        self.pad_row = None
+        self.columns = pd.Index(positions if positions else [])
+        self.counts = np.zeros((256, len(self.columns)), dtype=np.int64)
+        self.num_reads = 0
+        self.total_weight = 0
+
+    def update(self, st, weight_by=None):
+        """
+            Add the letters of a seqtable. Weights default to the counts of collapsed tables (see seqtable.get_seq_dist)
+        """
+        if self.seqtype is None:
+            self.seqtype = st.seqtype
+            self.pad_row = ord(st.fillna_val) if _pads_reads(st) else None
+        weights = st._validate_weights(weight_by)
+        positions = st.columns if not self.positions else [p for p in self.positions if p in st.columns]
+        counts = np.zeros((256, len(positions)), dtype=np.int64 if weights is None else np.float64)
+        if len(positions):
+            dist = st.get_seq_dist(list(positions), weight_by=weights)
+            counts = counts.astype(dist.values.dtype)
+            counts[[ord(c) for c in dist.index]] = dist.values
+        weight = _num_reads(st, weights)
+        (self.columns, self.counts) = _add_counts(self.columns, self.counts, self.total_weight, positions, counts, weight, self.pad_row)
+        self.num_reads += _num_reads(st)
+        self.total_weight += weight
+        return self
+
+    def merge(self, other):
+        """
+            Add the counts of another seq_dist_accumulator
+        """
+        if self.seqtype is None:
+            (self.seqtype, self.pad_row) = (other.seqtype, other.pad_row)
+        (self.columns, self.counts) = _add_counts(self.columns, self.counts, self.total_weight, other.columns, other.counts, other.total_weight, self.pad_row)
+        self.num_reads += other.num_reads
+        self.total_weight += other.total_weight
+        return self
+
+    def result(self, method='counts', ignore_characters=[]):
+        """
+            Returns the distribution of letters at each position (identical to seqtable.get_seq_dist)
+        """
+        present = np.flatnonzero(self.counts.any(axis=1))
+        dist = pd.DataFrame(self.counts[present], index=present, columns=range(len(self.columns)))
+        return format_seq_dist(dist, self.columns, method, ignore_characters, self.seqtype or 'NT', self.num_reads)
+
+
+class mutation_profile_accumulator():
+    """
+    Accumulates the mutations observed between a reference sequence and the sequences (see seqtable.mutation_profile)
+
+    Args:
+        Identical to seqtable.mutation_profile (normalized is passed to result)
+    """
+    def __init__(self, reference_seq, positions=None, ref_start=0, set_diff=False, ignore_characters=[], treat_as_true=[]):
+        self.reference_seq = reference_seq
+        self.positions = positions
+        self.ref_start = ref_start
+        self.set_diff = set_diff
+        self.ignore_characters = ignore_characters
+        self.treat_as_true = treat_as_true
+        self.seqtype = None
+        self.pads = True
+        self.columns = pd.Index([])
+        self.total_weight = 0
+        self.counts = None
+
+    def _add(self, profile):
+        if profile.empty:
+            return
+        self.counts = profile.copy() if self.counts is None else self.counts.add(profile, fill_value=0)
+
+    def _compared_positions(self, columns):
+        """
+            The columns of a table that are compared to the reference
+        """
+        if self.positions is None:
+            return list(columns)
+        return [c for c in columns if (c in self.positions) != self.set_diff]
+
+    def _profile(self, st):
+        positions = self._compared_positions(st.columns)
+        if not positions:
+            return pd.Series()
+        return st.mutation_profile(
+            self.reference_seq, positions, self.ref_start, False, self.ignore_characters, self.treat_as_true, normalized=False
+        )
+
+    def _add_padding(self, columns, weight):
+        """
+            Add the mutations found in weight reads that only contain padding (fillna_val) at the provided columns
+
+            The reference is aligned to the columns of a table by their order, so the padding is placed in a table containing every column up
+            to the last padded column. Other columns contain the reference letters and are not compared
+        """
+        if not self.pads or weight == 0 or len(columns) == 0:
+            return
+        padding = seqtable(seqtype=self.seqtype)
+        table_columns = self.columns[:self.columns.get_indexer(columns).max() + 1]
+        letters = padding.adjust_ref_seq(self.reference_seq, table_columns, self.ref_start, None)[0]
+        letters[table_columns.get_indexer(columns)] = ord(padding.fillna_val)
+        padding.seq_table = pd.DataFrame(letters[None, :], columns=table_columns, copy=False)
+        padding.qual_table = None
+        padding.index = padding.seq_table.index
+        padding.counts = pd.Series([weight])
+        positions = self._compared_positions(columns)
+        if positions:
+            self._add(padding.mutation_profile(
+                self.reference_seq, positions, self.ref_start, False, self.ignore_characters, self.treat_as_true, normalized=False
+            ))
+
+    def _add_columns(self, columns, weight):
+        """
+            Pad the reads that were already added (if columns contains new positions) and the weight new reads (for positions they do not contain)
+        """
+        columns = pd.Index(columns)
+        (previous, self.columns) = (self.columns, self.columns.append(columns.difference(self.columns, sort=False)) if len(self.columns) else columns)
+        self._add_padding(columns.difference(previous, sort=False), self.total_weight)
+        self._add_padding(previous.difference(columns, sort=False), weight)
+        self.total_weight += weight
+
+    def update(self, st):
+        """
+            Add the mutations found in a seqtable
+        """
+        if self.seqtype is None:
+            (self.seqtype, self.pads) = (st.seqtype, _pads_reads(st))
+        self._add(self._profile(st))
+        self._add_columns(st.columns, _num_reads(st))
+        return self
+
+    def merge(self, other):
+        """
+            Add the mutations of another mutation_profile_accumulator
+        """
+        if self.seqtype is None:
+            (self.seqtype, self.pads) = (other.seqtype, other.pads)
+        if other.counts is not None:
+            self._add(other.counts)
+        self._add_columns(other.columns, other.total_weight)
+        return self
+
+    def result(self, normalized=False):
+        """
+            Returns the counts (or frequency) of each mutation (identical to seqtable.mutation_profile)
+        """
+        if self.counts is None:
+            return pd.Series()
+        mutation_counts = self.counts.sort_index()
+        if normalized is True:
+            mutation_counts = mutation_counts / (mutation_counts.sum())
+        return mutation_counts
+
+
+class quality_dist_accumulator():
+    """
+    Accumulates a histogram of the quality scores at each position. The quality distribution (see seqtable.get_quality_dist) is calculated
+    from the histogram
+
+    Args:
+        num_values (int, default=94): number of quality scores (increased if higher scores are found)
+    """
+    def __init__(self, num_values=94):
+        self.pad_row = None
+        self.columns = pd.Index([])
+        self.hist = np.zeros((num_values, 0), dtype=np.int64)
+        self.total_weight = 0
+
+    def update(self, st):
+        """
+            Add the quality scores of a seqtable. Rows of collapsed tables count as the number of reads they represent
+        """
+        if st.qual_table is None:
+            raise Exception("You have not passed in any quality data for these sequences")
+        if self.total_weight == 0 and len(self.columns) == 0:
+            # qual_table of every table (including ragged_seqtable) pads reads with null quality
+            self.pad_row = ord(st.null_qual) - st.phred_adjust
+        hist = quality_histogram(st.qual_table.values, st.counts.values if st.counts is not None else None, self.hist.shape[0])
+        weight = _num_reads(st)
+        (self.columns, self.hist) = _add_counts(self.columns, self.hist, self.total_weight, st.qual_table.columns, hist, weight, self.pad_row)
+        self.total_weight += weight
+        return self
+
+    def merge(self, other):
+        """
+            Add the histogram of another quality_dist_accumulator
+        """
+        if self.total_weight == 0 and len(self.columns) == 0:
+            self.pad_row = other.pad_row
+        (self.columns, self.hist) = _add_counts(self.columns, self.hist, self.total_weight, other.columns, other.hist, other.total_weight, self.pad_row)
+        self.total_weight += other.total_weight
+        return self
+
+    def result(self, bins='fastqc', percentiles=[10, 25, 50, 75, 90], exclude_null_quality=True, plotly_sampledata_size=20):
+        """
+            Returns the distribution of quality across positions (identical to seqtable.get_quality_dist)
+        """
+        return quality_dist_from_histogram(self.hist, self.columns, bins, percentiles, exclude_null_quality, plotly_sampledata_size)
+
+
+class read_count_accumulator():
+    """
+    Accumulates the number of rows and reads (rows of collapsed tables represent counts reads), and optionally the number of reads of each
+    unique sequence (see seqtable.collapse)
+
+    Args:
+        keep_sequences (bool, default=False): count the reads of each unique sequence. Sequences are stored without their trailing padding
+            (fillna_val), so reads padded to different widths by different chunks are counted together, exactly as collapse counts reads
+            that are all padded to the same width
+    """
+    def __init__(self, keep_sequences=False):
+        self.keep_sequences = keep_sequences
+        self.num_rows = 0
+        self.num_reads = 0
+        self.sequences = pd.Series(dtype=np.int64)
+        # row (in the order the reads were added) where each sequence was first found, collapse uses it to order sequences with the same counts
+        self.first_row = pd.Series(dtype=np.int64)
+
+    def _add_sequences(self, sequences, first_row):
+        dtype = np.result_type(self.sequences.dtype, sequences.dtype)
+        self.sequences = self.sequences.add(sequences, fill_value=0).astype(dtype)
+        self.first_row = self.first_row.combine(first_row, min, fill_value=np.iinfo(np.int64).max).astype(np.int64)
+
+    def update(self, st):
+        """
+            Add the reads of a seqtable
+        """
+        if self.keep_sequences:
+            seqs = np.ascontiguousarray(st.seq_table.values)
+            # trailing padding is replaced by null bytes, which are not part of numpy byte strings
+            padding = np.flip(np.logical_and.accumulate(np.flip(seqs == ord(st.fillna_val), axis=1), axis=1), axis=1)
+            seqs = np.where(padding, np.uint8(0), seqs)
+            keys = seqs.view('S{0}'.format(seqs.shape[1])).ravel() if seqs.shape[1] else np.full(seqs.shape[0], b'', dtype='S1')
+            (unique_keys, first, inverse) = np.unique(keys, return_index=True, return_inverse=True)
+            counts = np.bincount(inverse.ravel(), weights=st.counts.values if st.counts is not None else None, minlength=unique_keys.shape[0])
+            if st.counts is None or np.issubdtype(st.counts.dtype, np.integer):
+                counts = counts.astype(np.int64)
+            self._add_sequences(pd.Series(counts, index=unique_keys), pd.Series(first + self.num_rows, index=unique_keys))
+        self.num_rows += len(st)
+        self.num_reads += _num_reads(st)
+        return self
+
+    def merge(self, other):
+        """
+            Add the reads of another read_count_accumulator (its reads are considered to follow the reads of this accumulator)
+        """
+        if self.keep_sequences and other.keep_sequences:
+            self._add_sequences(other.sequences, other.first_row + self.num_rows)
+        self.num_rows += other.num_rows
+        self.num_reads += other.num_reads
+        return self
+
+    def result(self):
+        """
+            Returns the number of rows and reads
+        """
+        return pd.Series({'rows': self.num_rows, 'reads': self.num_reads})
+
+    def sequence_counts(self):
+        """
+            Returns the number of reads of each unique sequence, ordered as the rows of seqtable.collapse (most abundant first, then by first appearance)
+        """
+        if not self.keep_sequences:
+            raise Exception('Sequences are only counted when keep_sequences is True')
+        order = np.lexsort((self.first_row.loc[self.sequences.index].values, -self.sequences.values))
+        return self.sequences.iloc[order]
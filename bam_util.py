@@ -0,0 +1,318 @@
+import os
+import array
+import struct
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from .parse_util import iter_bgzf_raw_blocks, inflate_bgzf_block, fill_matrix, stack_matrices, matrix_to_strings
+from .cigar_util import CONSUMES_REF
+
+"""
+Methods for decoding BAM records (and their BAI index) directly into numpy arrays
+"""
+
+BAM_MAGIC = b'BAM\x01'
+BAI_MAGIC = b'BAI\x01'
+
+# 4-bit encoded bases used by BAM
+SEQ_NT16 = np.frombuffer(b'=ACMGRSVTWYHKDBN', dtype=np.uint8)
+
+# size of the fixed length portion of a BAM record (including block_size)
+BAM_CORE_SIZE = 36
+
+# constants used by the BAI binning scheme
+BAI_PSEUDO_BIN = 37450
+BAI_LINEAR_SHIFT = 14
+
+
+def gather_ints(buf, offsets, dtype):
+    """
+        Read one little endian integer of the given dtype at each offset in a uint8 buffer
+    """
+    dtype = np.dtype(dtype).newbyteorder('<')
+    offsets = np.asarray(offsets, dtype=np.int64)
+    return np.ascontiguousarray(buf[offsets[:, None] + np.arange(dtype.itemsize)]).view(dtype).ravel()
+
+
+def parse_bam_header(data):
+    """
+        Parse the header of a decompressed BAM stream
+
+        Returns:
+            references (list of tuples): (name, length) of every reference sequence
+            header_size (int): number of bytes used by the header (None if data does not contain the full header)
+    """
+    if data[:4] != BAM_MAGIC:
+        raise Exception('The provided file is not a BAM file')
+    if len(data) < 8:
+        return None, None
+    l_text = struct.unpack_from('<i', data, 4)[0]
+    pos = 8 + l_text
+    if len(data) < pos + 4:
+        return None, None
+    n_ref = struct.unpack_from('<i', data, pos)[0]
+    pos += 4
+    references = []
+    for _ in range(n_ref):
+        if len(data) < pos + 4:
+            return None, None
+        l_name = struct.unpack_from('<i', data, pos)[0]
+        if len(data) < pos + 8 + l_name:
+            return None, None
+        name = data[pos + 4:pos + 4 + l_name - 1].decode()
+        l_ref = struct.unpack_from('<i', data, pos + 4 + l_name)[0]
+        references.append((name, l_ref))
+        pos += 8 + l_name
+    return references, pos
+
+
+def bam_record_offsets(data, start=0, end=None):
+    """
+        Find the offset of every complete BAM record in a decompressed buffer
+
+        .. note:: known hot spot
+
+            The position of a record is only known from the size of the previous record, so records are found by a python loop over
+            block_size (about 0.45 microseconds per record, the largest part of read_bam for files with short reads). A vectorized scan
+            would have to read a candidate block_size at every byte of the buffer and then follow the chain of records, which costs more
+            per byte than this loop costs per record. Everything after the offsets (decode_bam_records) is vectorized
+
+        Args:
+            data (bytes): decompressed BAM data starting at a record
+            start (int): position of the first record
+            end (int, default=None): only return records starting before this position
+
+        Returns:
+            offsets (np array int64): position of each record
+            consumed (int): position after the last complete record
+    """
+    size = len(data)
+    end = size if end is None else end
+    unpack = struct.Struct('<i').unpack_from
+    offsets = array.array('q')
+    append = offsets.append
+    pos = start
+    # a record needs at least 4 bytes to store its block_size
+    last_start = min(end, size - 3)
+    while pos < last_start:
+        next_pos = pos + 4 + unpack(data, pos)[0]
+        if not pos + BAM_CORE_SIZE <= next_pos <= size:
+            if next_pos > size:
+                break
+            raise Exception('Invalid BAM record at offset {0} (block_size is smaller than the fixed length fields)'.format(pos))
+        append(pos)
+        pos = next_pos
+    return np.frombuffer(offsets, dtype=np.int64), pos
+
+
+def decode_bam_records(data, offsets):
+    """
+        Decode the fields of a set of BAM records into numpy arrays
+
+        Returns:
+            records (dict):
+
+                1. names (np array uint8): read names padded with null characters
+                2. ref_id, pos (np arrays): reference id and 1-based leftmost position of each read
+                3. flag, mapq (np arrays)
+                4. seq_lens (np array int64): length of each read
+                5. seqs, quals (np array uint8): all bases (ascii) and all qualities (phred + 33) concatenated
+                6. cigar (tuple of np arrays): read_idx, ops, lens (see cigar_util.parse_cigar_strings)
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    num_reads = offsets.shape[0]
+    ref_id = gather_ints(buf, offsets + 4, np.int32)
+    pos = gather_ints(buf, offsets + 8, np.int32).astype(np.int64) + 1
+    l_read_name = buf[offsets + 12].astype(np.int64)
+    mapq = buf[offsets + 13]
+    n_cigar = gather_ints(buf, offsets + 16, np.uint16).astype(np.int64)
+    flag = gather_ints(buf, offsets + 18, np.uint16)
+    seq_lens = gather_ints(buf, offsets + 20, np.int32).astype(np.int64)
+
+    name_start = offsets + BAM_CORE_SIZE
+    cigar_start = name_start + l_read_name
+    seq_start = cigar_start + 4 * n_cigar
+    qual_start = seq_start + (seq_lens + 1) // 2
+
+    names = fill_matrix(buf, name_start, l_read_name - 1, 0)
+
+    # cigar operations are stored as uint32 values: length << 4 | op
+    read_idx = np.repeat(np.arange(num_reads, dtype=np.int64), n_cigar)
+    within = np.arange(read_idx.shape[0], dtype=np.int64) - np.repeat(np.cumsum(n_cigar) - n_cigar, n_cigar)
+    cigar_values = gather_ints(buf, cigar_start[read_idx] + 4 * within, np.uint32) if read_idx.shape[0] else np.zeros(0, dtype=np.uint32)
+    ops = (cigar_values & 0xF).astype(np.uint8)
+    lens = (cigar_values >> 4).astype(np.int64)
+
+    # bases are packed two per byte (high nibble first)
+    base_read = np.repeat(np.arange(num_reads, dtype=np.int64), seq_lens)
+    base_idx = np.arange(base_read.shape[0], dtype=np.int64) - np.repeat(np.cumsum(seq_lens) - seq_lens, seq_lens)
+    packed = buf[seq_start[base_read] + base_idx // 2]
+    seqs = SEQ_NT16[np.where(base_idx % 2 == 0, packed >> 4, packed & 0xF)]
+    quals = buf[qual_start[base_read] + base_idx]
+    # 0xFF means the quality is not stored
+    quals = np.where(quals == 255, 0, quals).astype(np.uint8) + np.uint8(33)
+
+    return {
+        'names': names, 'ref_id': ref_id, 'pos': pos, 'flag': flag, 'mapq': mapq, 'seq_lens': seq_lens,
+        'seqs': seqs, 'quals': quals, 'cigar': (read_idx, ops, lens)
+    }
+
+
+def concat_bam_records(blocks):
+    """
+        Concatenate the decoded records from several blocks
+    """
+    if len(blocks) == 0:
+        blocks = [decode_bam_records(b'', np.zeros(0, dtype=np.int64))]
+    records = {
+        k: np.concatenate([b[k] for b in blocks]) for k in ['ref_id', 'pos', 'flag', 'mapq', 'seq_lens', 'seqs', 'quals']
+    }
+    records['names'] = stack_matrices([b['names'] for b in blocks], 0)
+    read_offsets = np.cumsum([0] + [b['ref_id'].shape[0] for b in blocks[:-1]])
+    records['cigar'] = (
+        np.concatenate([b['cigar'][0] + o for b, o in zip(blocks, read_offsets)]),
+        np.concatenate([b['cigar'][1] for b in blocks]),
+        np.concatenate([b['cigar'][2] for b in blocks])
+    )
+    return records
+
+
+def filter_bam_records(records, keep):
+    """
+        Only keep the records where keep is True
+    """
+    keep = np.asarray(keep, dtype=bool)
+    seq_lens = records['seq_lens']
+    new_records = {k: records[k][keep] for k in ['ref_id', 'pos', 'flag', 'mapq', 'seq_lens', 'names']}
+    new_records['seqs'] = records['seqs'][np.repeat(keep, seq_lens)]
+    new_records['quals'] = records['quals'][np.repeat(keep, seq_lens)]
+    read_idx, ops, lens = records['cigar']
+    new_idx = np.cumsum(keep) - 1
+    op_keep = keep[read_idx]
+    new_records['cigar'] = (new_idx[read_idx[op_keep]], ops[op_keep], lens[op_keep])
+    return new_records
+
+
+def reference_lengths(records):
+    """
+        Number of reference bases covered by each record (calculated from the CIGAR operations)
+    """
+    read_idx, ops, lens = records['cigar']
+    return np.bincount(read_idx, weights=np.where(CONSUMES_REF[ops], lens, 0), minlength=records['pos'].shape[0]).astype(np.int64)
+
+
+def read_bai(index_file):
+    """
+        Parse a BAI index
+
+        Returns:
+            list with one entry per reference: (dict of bin -> np array of chunk virtual offsets shape (n, 2), np array of linear index offsets)
+    """
+    with open(index_file, 'rb') as r:
+        data = r.read()
+    if data[:4] != BAI_MAGIC:
+        raise Exception('The provided index is not a BAI file')
+    n_ref = struct.unpack_from('<i', data, 4)[0]
+    pos = 8
+    references = []
+    for _ in range(n_ref):
+        n_bin = struct.unpack_from('<i', data, pos)[0]
+        pos += 4
+        bins = {}
+        for _ in range(n_bin):
+            bin_id, n_chunk = struct.unpack_from('<Ii', data, pos)
+            pos += 8
+            bins[bin_id] = np.frombuffer(data, dtype='<u8', count=2 * n_chunk, offset=pos).reshape(-1, 2)
+            pos += 16 * n_chunk
+        n_intv = struct.unpack_from('<i', data, pos)[0]
+        pos += 4
+        intervals = np.frombuffer(data, dtype='<u8', count=n_intv, offset=pos)
+        pos += 8 * n_intv
+        references.append((bins, intervals))
+    return references
+
+
+def reg2bins(beg, end):
+    """
+        List all bins that may contain records overlapping the 0-based, half open region [beg, end) (from the SAM specification)
+    """
+    end -= 1
+    bins = [0]
+    for shift, offset in [(26, 1), (23, 9), (20, 73), (17, 585), (14, 4681)]:
+        bins.extend(range(offset + (beg >> shift), offset + (end >> shift) + 1))
+    return bins
+
+
+def region_chunks(bai_reference, beg, end):
+    """
+        Find the merged list of BGZF virtual offset ranges that must be read to find all records overlapping [beg, end)
+    """
+    bins, intervals = bai_reference
+    chunks = [bins[b] for b in reg2bins(beg, end) if b in bins and b != BAI_PSEUDO_BIN]
+    if len(chunks) == 0:
+        return []
+    chunks = np.concatenate(chunks)
+    # records starting before the linear index offset cannot overlap the region
+    min_offset = intervals[min(beg >> BAI_LINEAR_SHIFT, intervals.shape[0] - 1)] if intervals.shape[0] else 0
+    chunks = chunks[chunks[:, 1] > min_offset]
+    chunks = chunks[np.argsort(chunks[:, 0])]
+    merged = []
+    for chunk_beg, chunk_end in chunks:
+        chunk_beg = max(int(chunk_beg), int(min_offset))
+        if merged and chunk_beg <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], int(chunk_end))
+        else:
+            merged.append([chunk_beg, int(chunk_end)])
+    return [tuple(m) for m in merged]
+
+
+def read_bgzf_virtual_range(input_file, voffset_beg, voffset_end, threads=None):
+    """
+        Decompress the data between two BGZF virtual offsets (compressed block offset << 16 | offset within the decompressed block)
+    """
+    block_beg, within_beg = voffset_beg >> 16, voffset_beg & 0xFFFF
+    block_end, within_end = voffset_end >> 16, voffset_end & 0xFFFF
+    blocks = []
+    with open(input_file, 'rb') as handle:
+        handle.seek(block_beg)
+        for offset, data, _ in iter_bgzf_raw_blocks(handle):
+            if offset > block_end or (offset == block_end and within_end == 0):
+                break
+            blocks.append(data)
+    threads = threads or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        inflated = list(pool.map(inflate_bgzf_block, blocks))
+    if len(inflated) == 0:
+        return b''
+    end = sum(len(d) for d in inflated[:-1]) + within_end if within_end else sum(len(d) for d in inflated)
+    return b''.join(inflated)[within_beg:end]
+
+
+def parse_region(region, references):
+    """
+        Convert a samtools style region string ('chr1', 'chr1:100', 'chr1:100-200', 1-based and inclusive) to a 0-based half open interval
+
+        Returns:
+            ref_id (int), beg (int), end (int)
+    """
+    names = [r[0] for r in references]
+    if region in names:
+        name, coords = region, None
+    else:
+        name, _, coords = region.rpartition(':')
+        if name not in names:
+            raise Exception('The reference in region {0} was not found in the BAM header'.format(region))
+    ref_id = names.index(name)
+    if not coords:
+        return ref_id, 0, references[ref_id][1]
+    coords = coords.replace(',', '')
+    if '-' in coords:
+        beg, end = coords.split('-')
+        return ref_id, int(beg) - 1, int(end)
+    return ref_id, int(coords) - 1, references[ref_id][1]
+
+
+def read_names(records):
+    """
+        Convert the read names of decoded records into python strings
+    """
+    return matrix_to_strings(records['names'])
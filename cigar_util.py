@@ -0,0 +1,201 @@
+import numpy as np
+import pandas as pd
+from .parse_util import fill_matrix, matrix_to_strings
+
+"""
+Vectorized methods for using CIGAR strings to place aligned reads onto reference coordinates
+"""
+
+# CIGAR operations in the order used by the BAM specification (op code = index in string)
+CIGAR_OPS = 'MIDNSHP=X'
+CIGAR_MATCH, CIGAR_INS, CIGAR_DEL, CIGAR_SKIP, CIGAR_SOFTCLIP, CIGAR_HARDCLIP, CIGAR_PAD, CIGAR_EQUAL, CIGAR_DIFF = range(9)
+
+# does an operation consume bases in the read (query) and/or the reference
+CONSUMES_QUERY = np.array([1, 1, 0, 0, 1, 0, 0, 1, 1], dtype=bool)
+CONSUMES_REF = np.array([1, 0, 1, 1, 0, 0, 0, 1, 1], dtype=bool)
+ALIGNED_OPS = np.array([1, 0, 0, 0, 0, 0, 0, 1, 1], dtype=bool)
+
+_ascii_to_op = np.full(256, 255, dtype=np.uint8)
+_ascii_to_op[np.frombuffer(CIGAR_OPS.encode(), dtype=np.uint8)] = np.arange(len(CIGAR_OPS))
+
+
+def parse_cigar_strings(cigars):
+    """
+        Convert a list of CIGAR strings into flat arrays describing every operation without looping over reads
+
+        Args:
+            cigars (list or Series of str): CIGAR string for each read. Unmapped reads ('*') have no operations
+
+        Returns:
+            read_idx (np array int64): the read each operation belongs to
+            ops (np array uint8): the operation code (index in CIGAR_OPS)
+            lens (np array int64): the length of each operation
+    """
+    cigars = ['' if c == '*' or not isinstance(c, str) else c for c in cigars]
+    cigar_lens = np.array([len(c) for c in cigars], dtype=np.int64)
+    buf = np.frombuffer(''.join(cigars).encode(), dtype=np.uint8)
+    is_op = buf > ord('9')
+    op_pos = np.flatnonzero(is_op)
+    ops = _ascii_to_op[buf[op_pos]]
+    if (ops == 255).any():
+        raise Exception('Invalid CIGAR operation found. Only the following operations are allowed: {0}'.format(CIGAR_OPS))
+    # each digit contributes digit * 10 ** (number of digits between it and its operation)
+    digit_pos = np.flatnonzero(~is_op)
+    digit_op = np.searchsorted(op_pos, digit_pos)
+    place = op_pos[digit_op] - digit_pos - 1
+    lens = np.bincount(digit_op, weights=(buf[digit_pos] - ord('0')) * (10.0 ** place), minlength=op_pos.shape[0]).astype(np.int64)
+    read_idx = np.searchsorted(np.cumsum(cigar_lens), op_pos, side='right')
+    return read_idx, ops, lens
+
+
+def cigar_op_offsets(read_idx, ops, lens, ref_pos):
+    """
+        Calculate where each operation starts within its read and on the reference
+
+        Args:
+            ref_pos (np array int): leftmost reference position of each read (POS column in a SAM file)
+
+        Returns:
+            query_start (np array int64): 0-based offset within the read of the first base in each operation
+            ref_start (np array int64): reference position of the first base in each operation
+    """
+    query_len = np.where(CONSUMES_QUERY[ops], lens, 0)
+    ref_len = np.where(CONSUMES_REF[ops], lens, 0)
+    # exclusive cumulative sums restarted at the first operation of every read
+    query_cum = np.cumsum(query_len) - query_len
+    ref_cum = np.cumsum(ref_len) - ref_len
+    first_op = np.flatnonzero(np.concatenate([[True], read_idx[1:] != read_idx[:-1]])) if read_idx.shape[0] else np.zeros(0, dtype=np.int64)
+    op_group = np.repeat(np.arange(first_op.shape[0]), np.diff(np.concatenate([first_op, [read_idx.shape[0]]])))
+    query_start = query_cum - query_cum[first_op][op_group]
+    ref_start = ref_cum - ref_cum[first_op][op_group] + np.asarray(ref_pos, dtype=np.int64)[read_idx]
+    return query_start, ref_start
+
+
+def softclip_bounds(read_idx, ops, lens, num_reads, seq_lens=None):
+    """
+        Returns the number of soft clipped bases at the start and end of each read
+
+        Args:
+            seq_lens (np array int, default=None): number of stored bases in each read. Reads without stored bases (SEQ of '*') have nothing to clip
+    """
+    lead = np.zeros(num_reads, dtype=np.int64)
+    trail = np.zeros(num_reads, dtype=np.int64)
+    if seq_lens is not None:
+        read_idx, ops, lens = _drop_reads_without_bases(read_idx, ops, lens, seq_lens)
+    if read_idx.shape[0] == 0:
+        return lead, trail
+    # hard clips can be found outside of soft clips, so ignore them when finding the first/last operation
+    keep = ops != CIGAR_HARDCLIP
+    r, o, l = read_idx[keep], ops[keep], lens[keep]
+    clipped = o == CIGAR_SOFTCLIP
+    is_first = np.concatenate([[True], r[1:] != r[:-1]])
+    is_last = np.concatenate([r[1:] != r[:-1], [True]])
+    lead[r[is_first & clipped]] = l[is_first & clipped]
+    trail[r[is_last & clipped]] = l[is_last & clipped]
+    return lead, trail
+
+
+def _drop_reads_without_bases(read_idx, ops, lens, seq_lens):
+    """
+        Remove the operations of reads that do not store any bases (e.g. secondary alignments with SEQ of '*')
+
+        .. important::Private function
+
+            This function is not for public use
+    """
+    keep = np.asarray(seq_lens)[read_idx] > 0
+    if keep.all():
+        return read_idx, ops, lens
+    return read_idx[keep], ops[keep], lens[keep]
+
+
+def project_to_reference(
+    seq_buf, seq_offsets, qual_buf, qual_offsets, ref_pos, read_idx, ops, lens, num_reads,
+    seq_fill='N', qual_fill='!', deletion_char='-', return_insertions=False, seq_lens=None
+):
+    """
+        Place every aligned base onto its reference coordinate using the CIGAR operations of each read
+
+        Soft clipped bases are dropped, deleted reference positions are filled with deletion_char (with a null quality), skipped regions (N operations)
+        are left as seq_fill, and inserted bases are removed from the table (optionally returned separately)
+
+        Args:
+            seq_buf (np array uint8): all read sequences concatenated
+            seq_offsets (np array int): position of each read within seq_buf
+            qual_buf (np array uint8): all quality strings concatenated (None if quality is not available)
+            qual_offsets (np array int): position of each quality string within qual_buf
+            ref_pos (np array int): reference position of the first aligned base of each read
+            read_idx, ops, lens: CIGAR operations returned by parse_cigar_strings
+            seq_lens (np array int, default=None): number of stored bases in each read. Reads without stored bases (SEQ of '*') have nothing
+                to place and their row is left as seq_fill
+
+        Returns:
+            seqs (np array uint8): table of bases where column 0 is reference position ref_start
+            quals (np array uint8): table of quality characters (or None)
+            ref_start (int): reference position of the first column
+            insertions (dict of np arrays): only if return_insertions is True. Contains the read number, reference position FOLLOWING the insertion,
+                inserted bases and their qualities
+    """
+    if isinstance(seq_fill, str):
+        seq_fill = ord(seq_fill)
+    if isinstance(qual_fill, str):
+        qual_fill = ord(qual_fill)
+    if seq_lens is not None:
+        read_idx, ops, lens = _drop_reads_without_bases(read_idx, ops, lens, seq_lens)
+    query_start, op_ref_start = cigar_op_offsets(read_idx, ops, lens, ref_pos)
+    consumes_ref = CONSUMES_REF[ops]
+    ref_end = op_ref_start + np.where(consumes_ref, lens, 0)
+    placed = ALIGNED_OPS[ops] | (ops == CIGAR_DEL) | (ops == CIGAR_SKIP)
+    if placed.any():
+        ref_min = int(op_ref_start[placed].min())
+        width = int(ref_end[placed].max()) - ref_min
+    else:
+        ref_min, width = 1, 0
+
+    seqs = np.full((num_reads, width), seq_fill, dtype=np.uint8)
+    quals = np.full((num_reads, width), qual_fill, dtype=np.uint8) if qual_buf is not None else None
+
+    def expand(mask):
+        # one entry per base covered by the selected operations
+        op_lens = lens[mask]
+        within = np.arange(int(op_lens.sum()), dtype=np.int64) - np.repeat(np.cumsum(op_lens) - op_lens, op_lens)
+        rows = np.repeat(read_idx[mask], op_lens)
+        cols = np.repeat(op_ref_start[mask] - ref_min, op_lens) + within
+        query = np.repeat(query_start[mask], op_lens) + within
+        return rows, cols, query
+
+    rows, cols, query = expand(ALIGNED_OPS[ops])
+    seqs[rows, cols] = seq_buf[seq_offsets[rows] + query]
+    if quals is not None:
+        quals[rows, cols] = qual_buf[qual_offsets[rows] + query]
+
+    rows, cols, _ = expand(ops == CIGAR_DEL)
+    seqs[rows, cols] = ord(deletion_char)
+    if quals is not None:
+        quals[rows, cols] = qual_fill
+
+    if not return_insertions:
+        return seqs, quals, ref_min
+
+    ins = ops == CIGAR_INS
+    insertions = {
+        'read': read_idx[ins],
+        'ref_pos': op_ref_start[ins],
+        'seq': matrix_to_strings(fill_matrix(seq_buf, seq_offsets[read_idx[ins]] + query_start[ins], lens[ins], 0)),
+        'qual': matrix_to_strings(fill_matrix(qual_buf, qual_offsets[read_idx[ins]] + query_start[ins], lens[ins], 0)) if qual_buf is not None else None
+    }
+    return seqs, quals, ref_min, insertions
+
+
+def insertions_to_dataframe(insertions, index):
+    """
+        Convert the insertions returned by project_to_reference into a dataframe using the read names in index
+    """
+    df = pd.DataFrame({
+        'read': np.asarray(index)[insertions['read']],
+        'ref_pos': insertions['ref_pos'],
+        'seq': insertions['seq'],
+    }, columns=['read', 'ref_pos', 'seq', 'qual'])
+    if insertions['qual'] is not None:
+        df['qual'] = insertions['qual']
+    return df
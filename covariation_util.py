@@ -0,0 +1,89 @@
+"""
+Joint letter counts for every pair of positions and the mutual information between positions. Each chunk of sequences is one-hot encoded
+(one column per position and letter) so that the joint counts of all pairs are a single matrix product (X.T @ X)
+"""
+
+import numpy as np
+
+# number of one-hot cells (rows x (positions x letters)) created at once
+MAX_ONE_HOT_CELLS = 2 ** 24
+
+
+def one_hot(codes, num_letters, dtype=np.float32):
+    """
+        Convert codes (0..num_letters - 1, or num_letters for letters that should be ignored) into a one-hot matrix
+
+        Returns:
+            np array: rows are sequences, columns are position * num_letters + code
+    """
+    (num_rows, num_cols) = codes.shape
+    arr = np.zeros((num_rows, num_cols * (num_letters + 1)), dtype=dtype)
+    # ignored letters are set in an extra column for each position which is then removed
+    columns = codes.astype(np.int64) + np.arange(num_cols, dtype=np.int64) * (num_letters + 1)
+    arr[np.arange(num_rows)[:, None], columns] = 1
+    return arr.reshape(num_rows, num_cols, num_letters + 1)[:, :, :num_letters].reshape(num_rows, num_cols * num_letters)
+
+
+def joint_counts(codes, num_letters, weights=None, chunk_rows=None):
+    """
+        Count the occurrences of every pair of letters at every pair of positions
+
+        Args:
+            codes (np array uint8): rows are sequences, columns are positions. Values are 0..num_letters - 1 (num_letters is ignored)
+            num_letters (int): number of letters
+            weights (np array, default=None): weight of each sequence (must be >= 0)
+            chunk_rows (int, default=None): number of sequences encoded at a time (defaults to MAX_ONE_HOT_CELLS cells)
+
+        Returns:
+            counts (np array): (positions x letters) x (positions x letters). counts[i * num_letters + x, j * num_letters + y] is the number of
+            sequences with letter x at position i and letter y at position j. int64 unless weights are provided
+    """
+    (num_rows, num_cols) = codes.shape
+    size = num_cols * num_letters
+    if chunk_rows is None:
+        chunk_rows = max(1, MAX_ONE_HOT_CELLS // max(size, 1))
+    counts = np.zeros((size, size), dtype=np.float64)
+    for c in range(0, num_rows, chunk_rows):
+        # counts within a chunk are exact in float32, weighted products are calculated in float64
+        block = one_hot(codes[c:c + chunk_rows], num_letters, np.float32 if weights is None else np.float64)
+        if weights is not None:
+            block *= np.sqrt(np.asarray(weights[c:c + chunk_rows], dtype=np.float64))[:, None]
+        counts += block.T @ block
+    return np.rint(counts).astype(np.int64) if weights is None else counts
+
+
+def mutual_information(counts, num_letters, apc=False):
+    """
+        Calculate the mutual information (bits) between every pair of positions from the output of joint_counts. Sequences with an ignored
+        letter at either position of a pair are not used for that pair
+
+        Args:
+            counts (np array): output of joint_counts
+            num_letters (int): number of letters
+            apc (bool, default=False): apply the average product correction: MI(i, j) - mean(MI(i, :)) * mean(MI(:, j)) / mean(MI). Nothing is
+                subtracted when mean(MI) is 0
+
+        Returns:
+            np array: positions x positions. The diagonal is the entropy of each position (NaN when apc is True)
+    """
+    num_cols = counts.shape[0] // num_letters
+    joint = counts.reshape(num_cols, num_letters, num_cols, num_letters)
+    mi = np.zeros((num_cols, num_cols), dtype=np.float64)
+    # positions are processed in blocks to limit the size of temporary arrays
+    block_size = max(1, MAX_ONE_HOT_CELLS // max(joint[0].size, 1))
+    for b in range(0, num_cols, block_size):
+        block = joint[b:b + block_size].astype(np.float64)
+        total = block.sum(axis=(1, 3))[:, None, :, None]
+        row_totals = block.sum(axis=3, keepdims=True)
+        col_totals = block.sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            terms = (block / total) * np.log2((block * total) / (row_totals * col_totals))
+        mi[b:b + block_size] = np.where(block > 0, terms, 0).sum(axis=(1, 3))
+    if apc:
+        np.fill_diagonal(mi, np.nan)
+        mean_mi = np.nanmean(mi) if num_cols > 1 else 0
+        # positions that share no information need no correction (and would divide by zero)
+        if mean_mi > 0:
+            position_means = np.nanmean(mi, axis=1)
+            mi = mi - np.outer(position_means, position_means) / mean_mi
+    return mi
@@ -0,0 +1,290 @@
+import numpy as np
+import pandas as pd
+from .seq_tables import seqtable
+from .seq_table_util import dna_alphabet, aa_alphabet, bincount_2d
+from .library_utils import codon_table
+
+"""
+seqtables that store each letter as a small integer (its position in the NT or AA alphabet) instead of its ascii value
+"""
+
+ALPHABETS = {
+    'NT': np.frombuffer(''.join(dna_alphabet).encode(), dtype=np.uint8),
+    'AA': np.frombuffer(''.join(aa_alphabet).encode(), dtype=np.uint8)
+}
+
+
+def build_alphabet(seqtype, arr=None):
+    """
+        Returns the letters (ascii values) of an alphabet. Letters found in arr that are not part of the NT/AA alphabet are added to the end
+
+        Args:
+            seqtype ('NT' or 'AA'): defines the alphabet (seq_table_util.dna_alphabet or seq_table_util.aa_alphabet)
+            arr (np array uint8, default=None): ascii values that must be represented by the alphabet
+    """
+    alphabet = ALPHABETS[seqtype]
+    if arr is not None and arr.size:
+        present = np.flatnonzero(np.bincount(arr.ravel(), minlength=256))
+        extra = np.setdiff1d(present, alphabet).astype(np.uint8)
+        alphabet = np.concatenate([alphabet, extra])
+    return alphabet
+
+
+def alphabet_lookup(alphabet):
+    """
+        Returns a table converting ascii values into codes (position in alphabet). Letters not in the alphabet are assigned 255
+    """
+    lookup = np.full(256, 255, dtype=np.uint8)
+    lookup[alphabet] = np.arange(alphabet.shape[0], dtype=np.uint8)
+    return lookup
+
+
+def codon_lookup(nt_alphabet, aa_alphabet):
+    """
+        Returns a table converting the codes of a codon (c1 * k ** 2 + c2 * k + c3, where k is the size of the NT alphabet) into the code of an amino acid
+
+        Codons that are not in library_utils.codon_table (i.e. most degenerate codons) are translated as X
+    """
+    k = nt_alphabet.shape[0]
+    aa_codes = alphabet_lookup(aa_alphabet)
+    lookup = np.full(k ** 3, aa_codes[ord('X')], dtype=np.uint8)
+    nt_codes = alphabet_lookup(nt_alphabet)
+    for codon, aa in codon_table.items():
+        c = nt_codes[np.frombuffer(codon.encode(), dtype=np.uint8)].astype(np.int64)
+        if (c != 255).all():
+            lookup[c[0] * k * k + c[1] * k + c[2]] = aa_codes[ord(aa)]
+    return lookup
+
+
+class encoded_seqtable(seqtable):
+    """
+    A seqtable that stores letters as dense codes 0..k-1, where k is the size of the NT (seq_table_util.dna_alphabet) or AA (seq_table_util.aa_alphabet)
+    alphabet. Letters outside of the alphabet are added to the end of the alphabet of this table.
+
+    get_seq_dist, compare_to_reference, hamming_distance and translate work directly on the codes, using bincounts of size k per position and
+    lookup tables of size k (or k ** 3 for codons). Letters are only decoded when seq_table is accessed (it is decoded on every access) or when
+    results are returned.
+
+    Args:
+        Identical to seqtable
+
+    Attributes:
+        codes (np array uint8): position of each letter in alphabet
+        alphabet (np array uint8): ascii value of each code
+
+    Examples:
+        >>> st = encoded_seqtable(['ACGTAA', 'ACGTTT'])
+        >>> st.get_seq_dist()
+        >>> st.translate().get_seq_dist()
+    """
+    def __init__(self, seqdata=None, qualitydata=None, start=1, index=None, seqtype='NT', **kwargs):
+        self.alphabet = ALPHABETS.get(seqtype, ALPHABETS['NT'])
+        self.codes = np.zeros((0, 0), dtype=np.uint8)
+        self._index = None
+        self._columns = pd.Index([], dtype=np.int64)
+        seqtable.__init__(self, seqdata, qualitydata, start, index, seqtype, **kwargs)
+
+    @staticmethod
+    def from_seqtable(st):
+        """
+            Create an encoded copy of an existing seqtable
+        """
+        new_member = encoded_seqtable(
+            start=st.start, seqtype=st.seqtype, phred_adjust=st.phred_adjust, null_qual=st.null_qual,
+            encode_letters=st.encoding_setting[0], encoding=st.encoding_setting[1]
+        )
+        new_member.seq_table = st.seq_table
+        new_member.qual_table = st.qual_table
+        new_member.counts = st.counts
+        new_member.mate_columns = st.mate_columns
+        return new_member
+
+    def decode(self):
+        """
+            Returns a regular seqtable containing the same sequences
+        """
+        new_member = seqtable(
+            seqtype=self.seqtype, start=self.start, phred_adjust=self.phred_adjust, null_qual=self.null_qual,
+            encode_letters=self.encoding_setting[0], encoding=self.encoding_setting[1]
+        )
+        new_member.seq_table = self.seq_table
+        new_member.qual_table = self.qual_table
+        new_member.index = self.index
+        new_member.counts = self.counts
+        new_member.mate_columns = self.mate_columns
+        return new_member
+
+    def _new_encoded(self, codes, alphabet, index, columns, seqtype=None):
+        """
+            Create a new table from codes that are already encoded
+
+            .. important::Private function
+
+                This function is not for public use
+        """
+        new_member = self.__class__.__new__(self.__class__)
+        new_member.__dict__.update(self.__dict__)
+        new_member.codes = codes
+        new_member.alphabet = alphabet
+        new_member._index = index
+        new_member._columns = columns
+        new_member._seq_df = None
+        if seqtype is not None:
+            new_member.seqtype = seqtype
+            new_member.fillna_val = 'N' if seqtype == 'NT' else 'X'
+        new_member.loc, new_member.iloc, new_member.ix = [type(self.loc)(new_member, m) for m in ['loc', 'iloc', 'ix']]
+        return new_member
+
+    def copy(self):
+        new_member = self._new_encoded(self.codes.copy(), self.alphabet, self._index, self._columns)
+        new_member.qual_table = self.qual_table.copy() if self.qual_table is not None else None
+        new_member.counts = self.counts.copy() if self.counts is not None else None
+        return new_member
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def columns(self):
+        return self._columns
+
+    @property
+    def index(self):
+        return self._index
+
+    @index.setter
+    def index(self, value):
+        self._index = pd.Index(value) if value is not None else None
+
+    @property
+    def seq_table(self):
+        return pd.DataFrame(self.alphabet[self.codes], index=self._index, columns=self._columns, copy=False)
+
+    @seq_table.setter
+    def seq_table(self, value):
+        arr = np.asarray(value.values, dtype=np.uint8)
+        self.alphabet = build_alphabet(self.seqtype, arr)
+        self.codes = alphabet_lookup(self.alphabet)[arr]
+        self._index = value.index
+        self._columns = value.columns
+        self._seq_df = None
+
+    def slice_object(self, method, params):
+        if method == 'iloc' and not isinstance(params, tuple):
+            # selecting rows only requires slicing the codes
+            try:
+                rows = np.arange(len(self))[params]
+            except (IndexError, TypeError, ValueError):
+                rows = None
+            if rows is not None and np.ndim(rows) == 1:
+                new_member = self._new_encoded(self.codes[rows], self.alphabet, self._index[rows], self._columns)
+                new_member.qual_table = self.qual_table.iloc[rows] if self.qual_table is not None else None
+                new_member.counts = self.counts.iloc[rows] if self.counts is not None else None
+                return new_member
+        return self.decode().slice_object(method, params)
+
+    def __getitem__(self, key):
+        return self.decode().__getitem__(key)
+
+    def _encoded_positions(self, positions):
+        """
+            Convert positions (column names) into 0-based offsets within the codes
+        """
+        offsets = self._columns.get_indexer(list(positions))
+        if (offsets < 0).any():
+            raise KeyError('The following positions are not in the table: {0}'.format([p for p, o in zip(positions, offsets) if o < 0]))
+        return offsets
+
+    def _encode_reference(self, reference_array):
+        """
+            Convert reference letters into codes (255 for letters that are not found in any sequence)
+        """
+        return alphabet_lookup(self.alphabet)[reference_array]
+
+    def compare_to_reference(
+            self, reference_seq, positions=None, ref_start=0, flip=False,
+            set_diff=False, ignore_characters=[], treat_as_true=[], return_num_bases=False
+    ):
+        """
+            Calculate which positions within a reference are not equal in all sequences in dataframe (see seqtable.compare_to_reference)
+
+            When ignore_characters or treat_as_true are used the sequences are decoded first
+        """
+        if ignore_characters or treat_as_true:
+            return seqtable.compare_to_reference(
+                self, reference_seq, positions, ref_start, flip, set_diff, ignore_characters, treat_as_true, return_num_bases
+            )
+        reference_array, positions = self._reference_positions(reference_seq, positions, ref_start, set_diff)
+        cols = self._encoded_positions(positions)
+        diffs = self.codes[:, cols] == self._encode_reference(reference_array)
+        if flip:
+            diffs = ~diffs
+        df = pd.DataFrame(diffs, index=self._index, dtype=bool, columns=positions)
+        if return_num_bases:
+            return df, np.full(len(self), len(positions))
+        return df
+
+    def hamming_distance(self, reference_seq, positions=None, ref_start=0, set_diff=False, ignore_characters=[], normalized=False, chunk_rows=2 ** 18):
+        """
+            Determine hamming distance of all sequences in dataframe to a reference sequence (see seqtable.hamming_distance)
+        """
+        if ignore_characters or normalized:
+            return seqtable.hamming_distance(self, reference_seq, positions, ref_start, set_diff, ignore_characters, normalized)
+        reference_array, positions = self._reference_positions(reference_seq, positions, ref_start, set_diff)
+        cols = self._encoded_positions(positions)
+        ref_codes = self._encode_reference(reference_array)
+        dist = np.empty(len(self), dtype=np.int64)
+        for c in range(0, len(self), chunk_rows):
+            dist[c:c + chunk_rows] = (self.codes[c:c + chunk_rows, cols] != ref_codes).sum(axis=1)
+        return pd.Series(dist, index=self._index)
+
+    def get_seq_dist(self, positions=None, method='counts', ignore_characters=[], weight_by=None, chunk_rows=2 ** 12):
+        """
+            Returns the distribution of letters at each position (see seqtable.get_seq_dist). Counts are calculated with bincount_2d using
+            keys of size (positions x alphabet size)
+        """
+        weight_by = self._validate_weights(weight_by)
+        column_names = pd.Index(positions) if positions else self._columns
+        cols = self._encoded_positions(column_names)
+        if cols.shape[0] == self.codes.shape[1] and (cols == np.arange(cols.shape[0])).all():
+            # avoid copying the codes when all positions are requested
+            cols = slice(None)
+        counts = bincount_2d(self.codes[:, cols], weight_by, self.alphabet.shape[0], chunk_rows)
+        # report letters in the same order as seqtable.get_seq_dist (sorted by ascii value)
+        order = np.argsort(self.alphabet)
+        order = order[counts[order].any(axis=1)]
+        dist = pd.DataFrame(
+            counts[order], index=self.alphabet[order], columns=range(counts.shape[1])
+        )
+        return self._format_seq_dist(dist, column_names, method, ignore_characters)
+
+    def translate(self, frame=0):
+        """
+            Translate nucleotide sequences into amino acids using library_utils.codon_table. Codons are converted using a lookup table indexed by
+            the codes of their three bases. Codons that are not in the codon table are translated as X
+
+            Args:
+                frame (int, default=0): number of bases to skip before the first codon
+
+            Returns:
+                encoded_seqtable of amino acids (quality scores are not kept)
+        """
+        if self.seqtype != 'NT':
+            raise Exception('Only nucleotide sequences can be translated')
+        k = self.alphabet.shape[0]
+        aa_alphabet_codes = ALPHABETS['AA']
+        num_codons = (self.codes.shape[1] - frame) // 3
+        codons = self.codes[:, frame:frame + 3 * num_codons].astype(np.int64).reshape(len(self), num_codons, 3)
+        aa_codes = codon_lookup(self.alphabet, aa_alphabet_codes)[codons[:, :, 0] * k * k + codons[:, :, 1] * k + codons[:, :, 2]]
+        new_member = self._new_encoded(aa_codes, aa_alphabet_codes, self._index, pd.RangeIndex(1, num_codons + 1), seqtype='AA')
+        new_member.start = 1
+        new_member.qual_table = None
+        new_member.counts = self.counts
+        new_member.mate_columns = None
+        return new_member
@@ -0,0 +1,210 @@
+import copy
+import numpy as np
+import pandas as pd
+from .seq_tables import seqtable, _axis_positions
+from .parse_util import DEFAULT_BUFFER_SIZE, CARRIAGE_RETURN, fastq_record_index, gather_matrix, matrix_to_strings
+
+"""
+seqtables backed by a memory mapped file. Rows of seq_table and qual_table are only decoded from the file when they are needed
+"""
+
+
+class lazy_fastq_seqtable(seqtable):
+    """
+    A seqtable whose sequences and qualities remain in an uncompressed fastq file. The file is memory mapped and an index storing the offset of every
+    read is built in a single pass. seq_table, qual_table and seq_df are decoded from the file the first time they are accessed.
+
+    Methods that only need a subset of the data (iloc, subsample, get_seq_dist with positions) only read the rows and positions they use, so a
+    file much larger than available memory can still be explored.
+
+    Args:
+        input_file (str): path to an uncompressed fastq file
+        record_index (dict, default=None): index returned by parse_util.fastq_record_index. If None then the file is indexed
+        rows (np array of ints, default=None): the reads (i.e. record numbers in the file) represented by this table. If None then all reads are used
+        cols (np array of ints, default=None): the 0-based positions within each read represented by this table. If None then all positions are used
+        use_header_as_index (bool, default=True): If True, the header of each read is used as the index, otherwise the record number is used
+
+    Examples:
+        >>> st = read_fastq('run.fastq', lazy=True)
+        >>> st.iloc[:1000].get_seq_dist()
+        >>> st.subsample(10000).get_consensus()
+        >>> st.get_seq_dist(positions=range(10, 20))
+    """
+    def __init__(
+        self, input_file, record_index=None, rows=None, cols=None, start=1, phred_adjust=33, null_qual='!',
+        use_header_as_index=True, buffer_size=DEFAULT_BUFFER_SIZE, **kwargs
+    ):
+        seqtable.__init__(self, start=start, seqtype='NT', phred_adjust=phred_adjust, null_qual=null_qual, **kwargs)
+        self.input_file = input_file
+        self.use_header_as_index = use_header_as_index
+        self.record_index = record_index if record_index is not None else fastq_record_index(input_file, buffer_size)
+        self.mmap = np.memmap(input_file, dtype=np.uint8, mode='r')
+        num_reads = self.record_index['seq_len'].shape[0]
+        width = int(self.record_index['seq_len'].max()) if num_reads else 0
+        self.rows = np.arange(num_reads, dtype=np.int64) if rows is None else np.asarray(rows, dtype=np.int64)
+        self.cols = np.arange(width, dtype=np.int64) if cols is None else np.asarray(cols, dtype=np.int64)
+        self._seq_table = None
+        self._qual_table = None
+        self._index = None
+
+    def __len__(self):
+        return self.rows.shape[0]
+
+    def __deepcopy__(self, memo):
+        # the memory map and record index are never modified, so they can be shared between copies
+        new_member = copy.copy(self)
+        for attr in ['rows', 'cols', '_seq_table', '_qual_table', '_seq_df', '_index']:
+            setattr(new_member, attr, copy.deepcopy(getattr(self, attr), memo))
+        new_member.loc, new_member.iloc, new_member.ix = [type(self.loc)(new_member, m) for m in ['loc', 'iloc', 'ix']]
+        return new_member
+
+    def shape(self):
+        return (self.rows.shape[0], self.cols.shape[0])
+
+    @property
+    def columns(self):
+        return pd.Index(self.cols + self.start)
+
+    @property
+    def index(self):
+        if self._seq_table is not None:
+            # keep in sync with a decoded table that has been modified (i.e. quality_filter)
+            return self._seq_table.index
+        if self._index is None:
+            if self.use_header_as_index:
+                self._index = pd.Index(matrix_to_strings(self._decode_headers(self.rows)))
+            else:
+                self._index = pd.Index(self.rows)
+        return self._index
+
+    @index.setter
+    def index(self, value):
+        self._index = value
+
+    @property
+    def seq_table(self):
+        if self._seq_table is None:
+            self._seq_table = self._decode_table('seq_start', self.rows, self.cols, self.fillna_val, 0)
+        return self._seq_table
+
+    @seq_table.setter
+    def seq_table(self, value):
+        self._seq_table = value
+
+    @property
+    def qual_table(self):
+        if self._qual_table is None:
+            self._qual_table = self._decode_table('qual_start', self.rows, self.cols, self.null_qual, self.phred_adjust)
+        return self._qual_table
+
+    @qual_table.setter
+    def qual_table(self, value):
+        self._qual_table = value
+
+    def _decode_headers(self, rows):
+        """
+            Read the header of each read (without the '@') from the file
+        """
+        header_start = self.record_index['header_start'][rows] + 1
+        header_end = self.record_index['seq_start'][rows] - 1
+        has_cr = (header_end > header_start) & (self.mmap[np.maximum(header_end - 1, 0)] == CARRIAGE_RETURN)
+        header_end[has_cr] -= 1
+        lengths = header_end - header_start
+        width = int(lengths.max()) if lengths.shape[0] else 0
+        return gather_matrix(self.mmap, header_start, lengths, np.arange(width), 0)
+
+    def _decode_table(self, track, rows, cols, fillvalue, adjust, index=None):
+        """
+            Read the requested rows and 0-based columns of either the sequences (track='seq_start') or qualities (track='qual_start') from the file.
+            If index is None then the index of this table is used (which decodes the headers when use_header_as_index is True)
+
+            .. important::Private function
+
+                This function is not for public use
+        """
+        arr = gather_matrix(self.mmap, self.record_index[track][rows], self.record_index['seq_len'][rows], cols, fillvalue)
+        if adjust:
+            arr -= adjust
+        return pd.DataFrame(arr, index=self.index if index is None else index, columns=cols + self.start, copy=False)
+
+    def copy_lazy(self, rows=None, cols=None):
+        """
+            Return a new lazy table that uses the same file and record index but only represents the provided rows and columns (no data is read)
+
+            Args:
+                rows (np array of ints, default=None): positions (relative to this table) of the rows to keep
+                cols (np array of ints, default=None): positions (relative to this table) of the columns to keep
+        """
+        new_rows = self.rows if rows is None else self.rows[rows]
+        new_cols = self.cols if cols is None else self.cols[cols]
+        return lazy_fastq_seqtable(
+            self.input_file, self.record_index, np.atleast_1d(new_rows), np.atleast_1d(new_cols), start=self.start,
+            phred_adjust=self.phred_adjust, null_qual=self.null_qual, use_header_as_index=self.use_header_as_index
+        )
+
+    def materialize(self):
+        """
+            Read all rows and columns represented by this table into memory and return a regular seqtable
+        """
+        new_member = seqtable(seqtype=self.seqtype, start=self.start, phred_adjust=self.phred_adjust, null_qual=self.null_qual)
+        new_member.seq_table = self.seq_table
+        new_member.qual_table = self.qual_table
+        new_member.seq_df = self._seq_df
+        new_member.index = self.index
+        new_member.mate_columns = self.mate_columns
+        return new_member
+
+    def copy(self):
+        return self.materialize()
+
+    def slice_object(self, method, params):
+        if method == 'iloc':
+            # only positional slicing can be resolved without reading the file
+            (row_params, col_params) = params if isinstance(params, tuple) else (params, None)
+            try:
+                rows = np.arange(len(self))[row_params]
+                cols = np.arange(self.cols.shape[0])[col_params] if col_params is not None else None
+            except (IndexError, TypeError, ValueError):
+                rows = None
+            if rows is not None:
+                return self.copy_lazy(rows, cols)
+        return self.materialize().slice_object(method, params)
+
+    def __getitem__(self, key):
+        # selecting positions (columns) does not need to read the file
+        return self.copy_lazy(cols=np.arange(self.cols.shape[0])[_axis_positions(self.columns, key, 'loc')])
+
+    def subsample(self, numseqs):
+        """
+            Return a random sample of sequences as a new object. Only the index of the sampled reads is stored; no data is read from the file
+
+            Args:
+                numseqs (int): How many sequences to sample
+
+            Returns:
+                lazy_fastq_seqtable Object
+        """
+        return self.copy_lazy(rows=np.random.choice(len(self), numseqs, replace=False))
+
+    def quality_filter(self, q, p, inplace=False, ignore_null_qual=True):
+        """
+            Filter out sequences based on their qualities (see seqtable.quality_filter). The result only stores the record numbers of the reads that
+            pass, so the table stays lazy (also when inplace is True)
+        """
+        filtered = seqtable.quality_filter(self, q, p, False, ignore_null_qual)
+        if inplace is False:
+            return filtered
+        self.rows = filtered.rows
+        self._seq_table, self._qual_table, self._index, self._seq_df = None, None, None, None
+
+    def get_seq_dist(self, positions=None, method='counts', ignore_characters=[], weight_by=None):
+        """
+            Returns the distribution of bases at each position. If positions are provided then only those positions are read from the file
+            (headers are not decoded)
+        """
+        if positions is not None and self._seq_table is None:
+            table = self[list(positions)]
+            # counts do not depend on the index, so rows are labelled by their position
+            table.seq_table = table._decode_table('seq_start', table.rows, table.cols, table.fillna_val, 0, index=pd.RangeIndex(len(table)))
+            return seqtable.get_seq_dist(table, None, method, ignore_characters, weight_by)
+        return seqtable.get_seq_dist(self, positions, method, ignore_characters, weight_by)
@@ -3,7 +3,11 @@
 """
 
 import re
-from Bio import SeqIO
+try:
+	from Bio import SeqIO
+except ImportError:
+	# only required by open_fasta
+	SeqIO = None
 
 codon_table = {
 	'AAA': 'K',
@@ -0,0 +1,354 @@
+import numpy as np
+import pandas as pd
+from .seq_tables import seqtable
+
+"""
+seqtables that store nucleotides using 2 bits per base. Letters other than A, C, G and T (N, IUPAC codes from seq_table_util.degen_to_base, gaps)
+are stored separately as a sparse list of exceptions
+"""
+
+PACKED_BASES = b'ACGT'
+
+# ascii value -> 2 bit code (255 = must be stored as an exception)
+_base_to_code = np.full(256, 255, dtype=np.uint8)
+_base_to_code[np.frombuffer(PACKED_BASES, dtype=np.uint8)] = np.arange(4, dtype=np.uint8)
+_code_to_base = np.frombuffer(PACKED_BASES, dtype=np.uint8)
+
+# number of mismatching bases represented by each value of ((a ^ b) | ((a ^ b) >> 1)) & 0x55
+_popcount = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+# _slot_onehot[byte, slot, code] is 1 if the base stored in slot (0-3) of byte has the given 2 bit code
+_slot_onehot = np.eye(4, dtype=np.float64)[(np.arange(256)[:, None] >> (2 * np.arange(4))[None, :]) & 3]
+
+
+def pack_nucleotides(arr, chunk_rows=2 ** 20):
+    """
+        Convert a table of ascii values into a table storing 4 bases per byte
+
+        Args:
+            arr (np array uint8): rows are sequences, columns are positions
+            chunk_rows (int, default=2**20): number of rows converted at a time (limits temporary memory)
+
+        Returns:
+            packed (np array uint8): table of shape (rows, ceil(columns / 4)). Position i is stored in bits 2 * (i % 4) of byte i // 4
+            exceptions (dict of np arrays): row, col and char of every letter that is not A, C, G or T (stored as A in packed)
+    """
+    num_rows, length = arr.shape
+    width = (length + 3) // 4
+    packed = np.zeros((num_rows, width), dtype=np.uint8)
+    exc_rows, exc_cols, exc_chars = [], [], []
+    for c in range(0, num_rows, chunk_rows):
+        chunk = arr[c:c + chunk_rows]
+        codes = np.zeros((chunk.shape[0], width * 4), dtype=np.uint8)
+        codes[:, :length] = _base_to_code[chunk]
+        rows, cols = np.nonzero(codes == 255)
+        exc_rows.append(rows + c)
+        exc_cols.append(cols)
+        exc_chars.append(chunk[rows, cols])
+        codes[rows, cols] = 0
+        codes = codes.reshape(-1, width, 4)
+        packed[c:c + chunk_rows] = codes[:, :, 0] | (codes[:, :, 1] << 2) | (codes[:, :, 2] << 4) | (codes[:, :, 3] << 6)
+    exceptions = {
+        'row': np.concatenate(exc_rows).astype(np.int64) if exc_rows else np.zeros(0, dtype=np.int64),
+        'col': np.concatenate(exc_cols).astype(np.int32) if exc_cols else np.zeros(0, dtype=np.int32),
+        'char': np.concatenate(exc_chars).astype(np.uint8) if exc_chars else np.zeros(0, dtype=np.uint8)
+    }
+    return packed, exceptions
+
+
+def unpack_nucleotides(packed, exceptions, cols, rows=None):
+    """
+        Decode the requested 0-based positions (and rows) of a packed table into a table of ascii values
+    """
+    cols = np.asarray(cols, dtype=np.int64)
+    subset = packed if rows is None else packed[rows]
+    arr = _code_to_base[(subset[:, cols // 4] >> (2 * (cols % 4)).astype(np.uint8)) & 3]
+    exc = select_exceptions(exceptions, cols, rows, packed.shape[0])
+    arr[exc['row'], exc['col']] = exc['char']
+    return arr
+
+
+def select_exceptions(exceptions, cols=None, rows=None, num_rows=None):
+    """
+        Returns the exceptions found in the requested rows and 0-based positions. Rows and cols of the result are relative to the selection
+    """
+    keep = np.ones(exceptions['row'].shape[0], dtype=bool)
+    new_row = exceptions['row']
+    new_col = exceptions['col'].astype(np.int64)
+    if cols is not None:
+        col_lookup = np.full(int(max(new_col.max() + 1 if new_col.shape[0] else 0, np.max(cols) + 1 if len(cols) else 0)), -1, dtype=np.int64)
+        col_lookup[cols] = np.arange(len(cols))
+        new_col = col_lookup[new_col]
+        keep &= new_col >= 0
+    if rows is not None:
+        row_lookup = np.full(num_rows, -1, dtype=np.int64)
+        row_lookup[rows] = np.arange(np.arange(num_rows)[rows].shape[0])
+        new_row = row_lookup[new_row]
+        keep &= new_row >= 0
+    return {'row': new_row[keep], 'col': new_col[keep], 'char': exceptions['char'][keep]}
+
+
+class packed_seqtable(seqtable):
+    """
+    A nucleotide seqtable that stores A, C, G and T using 2 bits per base (a quarter of the memory used by seq_table). All other letters are stored
+    in a sparse list of exceptions, so tables should mostly contain A, C, G and T (the 'N' used to pad shorter reads are also exceptions).
+
+    compare_to_reference, hamming_distance and get_seq_dist work directly on the packed bytes. Every other method decodes seq_table when it is
+    accessed. seq_table is decoded on every access and is never stored, so changes must be made by assigning a new table (st.seq_table = df).
+
+    Args:
+        Identical to seqtable (seqtype must be 'NT')
+
+    Examples:
+        >>> st = packed_seqtable(['ACGTN', 'ACCTA'])
+        >>> st = packed_seqtable.from_seqtable(read_fastq('run.fastq'))
+        >>> st.hamming_distance('ACGTA')
+    """
+    def __init__(self, seqdata=None, qualitydata=None, start=1, index=None, seqtype='NT', **kwargs):
+        if seqtype != 'NT':
+            raise Exception('Only nucleotide sequences can be packed')
+        self.packed = np.zeros((0, 0), dtype=np.uint8)
+        self.exceptions = {'row': np.zeros(0, dtype=np.int64), 'col': np.zeros(0, dtype=np.int32), 'char': np.zeros(0, dtype=np.uint8)}
+        self.length = 0
+        self._index = None
+        self._columns = pd.Index([], dtype=np.int64)
+        seqtable.__init__(self, seqdata, qualitydata, start, index, seqtype, **kwargs)
+
+    @staticmethod
+    def from_seqtable(st):
+        """
+            Create a packed copy of an existing seqtable
+        """
+        new_member = packed_seqtable(
+            start=st.start, phred_adjust=st.phred_adjust, null_qual=st.null_qual,
+            encode_letters=st.encoding_setting[0], encoding=st.encoding_setting[1]
+        )
+        new_member.seq_table = st.seq_table
+        new_member.qual_table = st.qual_table
+        new_member.counts = st.counts
+        new_member.mate_columns = st.mate_columns
+        return new_member
+
+    def unpack(self):
+        """
+            Returns a regular seqtable containing the same sequences
+        """
+        new_member = seqtable(
+            seqtype=self.seqtype, start=self.start, phred_adjust=self.phred_adjust, null_qual=self.null_qual,
+            encode_letters=self.encoding_setting[0], encoding=self.encoding_setting[1]
+        )
+        new_member.seq_table = self.seq_table
+        new_member.qual_table = self.qual_table
+        new_member.index = self.index
+        new_member.counts = self.counts
+        new_member.mate_columns = self.mate_columns
+        return new_member
+
+    def copy(self):
+        new_member = self.__class__.__new__(self.__class__)
+        new_member.__dict__.update(self.__dict__)
+        new_member.exceptions = {k: v.copy() for k, v in self.exceptions.items()}
+        new_member.packed = self.packed.copy()
+        new_member.qual_table = self.qual_table.copy() if self.qual_table is not None else None
+        new_member._seq_df = None
+        new_member.loc, new_member.iloc, new_member.ix = [type(self.loc)(new_member, m) for m in ['loc', 'iloc', 'ix']]
+        return new_member
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def __len__(self):
+        return self.packed.shape[0]
+
+    def shape(self):
+        return (self.packed.shape[0], self.length)
+
+    @property
+    def columns(self):
+        return self._columns
+
+    @property
+    def index(self):
+        return self._index
+
+    @index.setter
+    def index(self, value):
+        self._index = pd.Index(value) if value is not None else None
+
+    @property
+    def seq_table(self):
+        arr = unpack_nucleotides(self.packed, self.exceptions, np.arange(self.length))
+        return pd.DataFrame(arr, index=self._index, columns=self._columns, copy=False)
+
+    @seq_table.setter
+    def seq_table(self, value):
+        self.packed, self.exceptions = pack_nucleotides(np.ascontiguousarray(value.values, dtype=np.uint8))
+        self.length = value.shape[1]
+        self._index = value.index
+        self._columns = value.columns
+        self._seq_df = None
+
+    def slice_object(self, method, params):
+        if method == 'iloc' and not isinstance(params, tuple):
+            # selecting rows only requires slicing the packed bytes and exceptions
+            try:
+                rows = np.arange(len(self))[params]
+            except (IndexError, TypeError, ValueError):
+                rows = None
+            if rows is not None and np.ndim(rows) == 1:
+                # only the selected rows are copied (the new table is built from the attributes of this table, like ragged_seqtable._select_rows)
+                new_member = self.__class__.__new__(self.__class__)
+                new_member.__dict__.update(self.__dict__)
+                new_member.packed = self.packed[rows]
+                new_member.exceptions = select_exceptions(self.exceptions, None, rows, len(self))
+                new_member._index = self._index[rows]
+                new_member.qual_table = self.qual_table.iloc[rows] if self.qual_table is not None else None
+                new_member.counts = self.counts.iloc[rows] if self.counts is not None else None
+                new_member._seq_df = None
+                new_member.loc, new_member.iloc, new_member.ix = [type(self.loc)(new_member, m) for m in ['loc', 'iloc', 'ix']]
+                return new_member
+        return self.unpack().slice_object(method, params)
+
+    def __getitem__(self, key):
+        return self.unpack().__getitem__(key)
+
+    def _packed_positions(self, positions):
+        """
+            Convert positions (column names) into 0-based offsets within the packed table
+        """
+        offsets = self._columns.get_indexer(list(positions))
+        if (offsets < 0).any():
+            raise KeyError('The following positions are not in the table: {0}'.format([p for p, o in zip(positions, offsets) if o < 0]))
+        return offsets.astype(np.int64)
+
+    def compare_to_reference(
+            self, reference_seq, positions=None, ref_start=0, flip=False,
+            set_diff=False, ignore_characters=[], treat_as_true=[], return_num_bases=False
+    ):
+        """
+            Calculate which positions within a reference are not equal in all sequences in dataframe (see seqtable.compare_to_reference)
+
+            Letters are compared using their 2 bit codes. When ignore_characters or treat_as_true are used the sequences are decoded first
+        """
+        if ignore_characters or treat_as_true:
+            # decode once instead of on every access of seq_table
+            return self.unpack().compare_to_reference(
+                reference_seq, positions, ref_start, flip, set_diff, ignore_characters, treat_as_true, return_num_bases
+            )
+        reference_array, positions = self._reference_positions(reference_seq, positions, ref_start, set_diff)
+        cols = self._packed_positions(positions)
+        # a reference letter that is not packed (255) can only be equal to an exception
+        ref_codes = _base_to_code[reference_array]
+        diffs = ((self.packed[:, cols // 4] >> (2 * (cols % 4)).astype(np.uint8)) & 3) == ref_codes
+        diffs &= ref_codes != 255
+        exc = select_exceptions(self.exceptions, cols)
+        diffs[exc['row'], exc['col']] = exc['char'] == reference_array[exc['col']]
+        if flip:
+            diffs = ~diffs
+        df = pd.DataFrame(diffs, index=self._index, dtype=bool, columns=positions)
+        if return_num_bases:
+            return df, np.full(len(self), len(positions))
+        return df
+
+    def hamming_distance(self, reference_seq, positions=None, ref_start=0, set_diff=False, ignore_characters=[], normalized=False, chunk_rows=2 ** 18):
+        """
+            Determine hamming distance of all sequences in dataframe to a reference sequence (see seqtable.hamming_distance)
+
+            Distances are calculated 4 bases at a time by XOR-ing the packed bytes with the packed reference and counting the mismatched bases
+        """
+        if ignore_characters or normalized:
+            return self.unpack().hamming_distance(reference_seq, positions, ref_start, set_diff, ignore_characters, normalized)
+        reference_array, positions = self._reference_positions(reference_seq, positions, ref_start, set_diff)
+        cols = self._packed_positions(positions)
+        ref_codes = _base_to_code[reference_array]
+        is_packed = ref_codes != 255
+        # pack the reference and create a mask of the bits that should be compared
+        width = self.packed.shape[1]
+        ref_packed = np.zeros(width, dtype=np.uint8)
+        mask = np.zeros(width, dtype=np.uint8)
+        np.bitwise_or.at(ref_packed, cols[is_packed] // 4, (ref_codes[is_packed] << (2 * (cols[is_packed] % 4))).astype(np.uint8))
+        np.bitwise_or.at(mask, cols[is_packed] // 4, (1 << (2 * (cols[is_packed] % 4))).astype(np.uint8))
+
+        dist = np.empty(len(self), dtype=np.int64)
+        for c in range(0, len(self), chunk_rows):
+            x = self.packed[c:c + chunk_rows] ^ ref_packed
+            dist[c:c + chunk_rows] = _popcount[(x | (x >> 1)) & mask].sum(axis=1)
+        # every packed base is different from a reference letter that is not A, C, G or T
+        dist += int((~is_packed).sum())
+
+        # correct the positions where the sequence contains an exception (stored as an A in the packed bytes)
+        exc = select_exceptions(self.exceptions, cols)
+        counted = np.where(is_packed[exc['col']], ref_codes[exc['col']] != 0, True)
+        actual = exc['char'] != reference_array[exc['col']]
+        np.add.at(dist, exc['row'], actual.astype(np.int64) - counted)
+        return pd.Series(dist, index=self._index)
+
+    def mutation_profile(self, reference_seq, positions=None, ref_start=0, set_diff=False, ignore_characters=[], treat_as_true=[], normalized=False):
+        """
+            Return the type of mutation rates observed between the reference sequence and sequences in table (see seqtable.mutation_profile)
+
+            Every letter that is not the reference letter at its position is a mutation, so mutations are counted from the packed distribution of
+            letters at each position (get_seq_dist) and the letters are never decoded. When treat_as_true is used the sequences are decoded once
+        """
+        if treat_as_true:
+            return self.unpack().mutation_profile(reference_seq, positions, ref_start, set_diff, ignore_characters, treat_as_true, normalized)
+        reference_array, positions = self._reference_positions(reference_seq, positions, ref_start, set_diff)
+        if len(positions) == 0:
+            return pd.Series()
+        dist = self.get_seq_dist(positions=list(positions))
+        # rows are reference letters, columns are the observed letters
+        combos = dist.T.groupby(pd.Index([chr(c) for c in reference_array], name='ref')).sum()
+        combos.columns.name = 'mut'
+        mutation_counts = combos.stack()
+        is_mutation = (mutation_counts.index.get_level_values('ref') != mutation_counts.index.get_level_values('mut')) & (mutation_counts.values > 0)
+        mutation_counts = mutation_counts[is_mutation]
+        if len(mutation_counts) == 0:
+            return pd.Series()
+        # same index as seqtable.mutation_profile (only the observed letters are levels)
+        mut_index = pd.MultiIndex.from_tuples(list(mutation_counts.index), names=['ref', 'mut'])
+        mutation_counts = pd.Series(index=mut_index, data=mutation_counts.values).astype(float).sort_index()
+
+        if ignore_characters:
+            mutation_counts = mutation_counts.unstack().drop(ignore_characters, axis=1, errors='ignore').drop(ignore_characters, axis=0, errors='ignore').stack()
+
+        if normalized is True:
+            mutation_counts = mutation_counts / (mutation_counts.sum())
+
+        return mutation_counts
+
+    def get_seq_dist(self, positions=None, method='counts', ignore_characters=[], weight_by=None, chunk_rows=2 ** 16):
+        """
+            Returns the distribution of bases at each position (see seqtable.get_seq_dist)
+
+            Each packed byte is counted once and then split into the 4 bases it represents, so the letters are never decoded
+        """
+        weight_by = self._validate_weights(weight_by)
+        column_names = pd.Index(positions) if positions else self._columns
+        cols = self._packed_positions(column_names)
+        byte_cols = np.unique(cols // 4)
+        num_bytes = byte_cols.shape[0]
+
+        # counts of every byte value in each byte column
+        byte_counts = np.zeros(num_bytes * 256, dtype=np.float64)
+        offsets = np.arange(num_bytes, dtype=np.int64) * 256
+        for c in range(0, len(self), chunk_rows):
+            keys = (self.packed[c:c + chunk_rows, byte_cols].astype(np.int64) + offsets).ravel()
+            w = None if weight_by is None else np.repeat(np.asarray(weight_by[c:c + chunk_rows], dtype=np.float64), num_bytes)
+            byte_counts += np.bincount(keys, weights=w, minlength=num_bytes * 256)
+        # (byte column, slot, code) -> count of each code at each position
+        code_counts = np.einsum('wb,bsc->wsc', byte_counts.reshape(num_bytes, 256), _slot_onehot)
+        lookup = np.searchsorted(byte_cols, cols // 4)
+        code_counts = code_counts[lookup, cols % 4]
+
+        counts = np.zeros((256, cols.shape[0]), dtype=np.float64)
+        counts[_code_to_base] = code_counts.T
+        # exceptions were counted as A
+        exc = select_exceptions(self.exceptions, cols)
+        w = np.ones(exc['row'].shape[0]) if weight_by is None else np.asarray(weight_by, dtype=np.float64)[exc['row']]
+        np.add.at(counts, (np.full(exc['col'].shape[0], ord('A')), exc['col']), -w)
+        np.add.at(counts, (exc['char'].astype(np.int64), exc['col']), w)
+
+        letters = np.flatnonzero(counts.any(axis=1))
+        counts = counts[letters]
+        dist = pd.DataFrame(counts if weight_by is not None else counts.astype(np.int64), index=letters, columns=range(cols.shape[0]))
+        return self._format_seq_dist(dist, column_names, method, ignore_characters)
@@ -0,0 +1,860 @@
+import io
+import os
+import gzip
+import zlib
+import struct
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+Low level methods for parsing raw bytes from NGS files directly into uint8 arrays (used by read_sequences)
+"""
+
+# ascii codes used when scanning raw buffers
+NEWLINE = ord('\n')
+CARRIAGE_RETURN = ord('\r')
+FASTQ_HEADER = ord('@')
+FASTQ_SEPARATOR = ord('+')
+
+# default number of bytes read from a file at a time
+DEFAULT_BUFFER_SIZE = 2 ** 26
+
+# number of characters copied at a time by fill_matrix (limits its int64 temporary arrays to a few MB)
+FILL_CHUNK_SIZE = 2 ** 18
+
+# gzip/bgzf constants
+GZIP_MAGIC = b'\x1f\x8b'
+BGZF_HEADER_SIZE = 18
+
+
+def iter_file_buffers(input_file, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+        Read a file in large binary chunks
+
+        Args:
+            input_file (str or file object): path to the file or an already opened binary file object
+            buffer_size (int): number of bytes to read at a time
+
+        Returns:
+            generator of bytes objects
+    """
+    if hasattr(input_file, 'read'):
+        handle = input_file
+        close_handle = False
+    else:
+        handle = open(input_file, 'rb')
+        close_handle = True
+    try:
+        while True:
+            data = handle.read(buffer_size)
+            if not data:
+                break
+            yield data
+    finally:
+        if close_handle:
+            handle.close()
+
+
+def detect_compression(input_file):
+    """
+        Determine whether a file is uncompressed, gzip compressed, or BGZF compressed (blocked gzip used by bgzip/samtools)
+
+        Returns:
+            compression (str): None, 'gzip' or 'bgzf'
+    """
+    if hasattr(input_file, 'read'):
+        return None
+    with open(input_file, 'rb') as r:
+        header = r.read(BGZF_HEADER_SIZE)
+    if header[:2] != GZIP_MAGIC:
+        return None
+    # bgzf files are gzip files whose FEXTRA field contains a BC subfield storing the size of the block
+    if len(header) == BGZF_HEADER_SIZE and header[3] & 4 and header[12:14] == b'BC':
+        return 'bgzf'
+    return 'gzip'
+
+
+def iter_bgzf_raw_blocks(handle):
+    """
+        Read successive BGZF blocks from a file without decompressing them
+
+        Returns:
+            generator of (file offset of block, deflated data, size of data after inflating)
+    """
+    while True:
+        offset = handle.tell()
+        header = handle.read(BGZF_HEADER_SIZE)
+        if not header:
+            return
+        if len(header) < BGZF_HEADER_SIZE or header[:2] != GZIP_MAGIC:
+            raise Exception('Invalid BGZF block found at position {0}'.format(offset))
+        xlen = struct.unpack('<H', header[10:12])[0]
+        extra = header[12:] + handle.read(xlen - 6)
+        bsize = None
+        pos = 0
+        while pos < xlen:
+            si, slen = extra[pos:pos + 2], struct.unpack('<H', extra[pos + 2:pos + 4])[0]
+            if si == b'BC':
+                bsize = struct.unpack('<H', extra[pos + 4:pos + 6])[0]
+            pos += 4 + slen
+        if bsize is None:
+            raise Exception('Invalid BGZF block found at position {0}, block size is missing'.format(offset))
+        remainder = handle.read(bsize - xlen - 19 + 8)
+        data = remainder[:-8]
+        isize = struct.unpack('<I', remainder[-4:])[0]
+        yield offset, data, isize
+
+
+def inflate_bgzf_block(data):
+    """
+        Decompress the deflated data of a single BGZF block (zlib releases the GIL, so this can be run on multiple threads)
+    """
+    return zlib.decompress(data, -15)
+
+
+def iter_bgzf_buffers(input_file, buffer_size=DEFAULT_BUFFER_SIZE, threads=None, start_offset=0):
+    """
+        Decompress a BGZF file using a pool of threads. Independent blocks are inflated concurrently and returned in their original order
+
+        Args:
+            input_file (str): path to a BGZF compressed file
+            buffer_size (int): approximate number of compressed bytes handed to the thread pool at a time
+            threads (int, default=None): number of threads to use. If None then uses the number of cpus
+            start_offset (int, default=0): file offset of the first block to read
+
+        Returns:
+            generator of bytes objects
+    """
+    threads = threads or os.cpu_count() or 1
+    with open(input_file, 'rb') as handle, ThreadPoolExecutor(max_workers=threads) as pool:
+        handle.seek(start_offset)
+        # the next group of blocks is inflated in the background while the previous group is being parsed
+        pending = []
+        group = []
+        group_size = 0
+        for _, data, _ in iter_bgzf_raw_blocks(handle):
+            group.append(pool.submit(inflate_bgzf_block, data))
+            group_size += len(data)
+            if group_size >= buffer_size:
+                if pending:
+                    yield b''.join([f.result() for f in pending])
+                pending = group
+                group = []
+                group_size = 0
+        for futures in [pending, group]:
+            if futures:
+                yield b''.join([f.result() for f in futures])
+
+
+def iter_gzip_buffers(input_file, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+        Decompress a gzip file (which may have multiple members) in chunks of buffer_size bytes
+    """
+    with gzip.open(input_file, 'rb') as handle:
+        for data in iter_file_buffers(handle, buffer_size):
+            yield data
+
+
+def iter_buffers(input_file, buffer_size=DEFAULT_BUFFER_SIZE, threads=None):
+    """
+        Read an uncompressed, gzip or BGZF file as successive chunks of uncompressed bytes
+
+        Args:
+            input_file (str): path to the file
+            buffer_size (int): approximate number of bytes to read at a time
+            threads (int, default=None): number of threads used to decompress BGZF blocks
+    """
+    compression = detect_compression(input_file)
+    if compression == 'bgzf':
+        return iter_bgzf_buffers(input_file, buffer_size, threads)
+    elif compression == 'gzip':
+        return iter_gzip_buffers(input_file, buffer_size)
+    return iter_file_buffers(input_file, buffer_size)
+
+
+class BufferReader(io.RawIOBase):
+    """
+        File-like object over a generator of bytes so that decompressed data can be passed into pandas.read_csv
+    """
+    def __init__(self, buffers):
+        self.buffers = iter(buffers)
+        self.current = b''
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self.pos >= len(self.current):
+            try:
+                self.current = next(self.buffers)
+            except StopIteration:
+                return 0
+            self.pos = 0
+        n = min(len(b), len(self.current) - self.pos)
+        b[:n] = self.current[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+
+def open_text(input_file, buffer_size=DEFAULT_BUFFER_SIZE, threads=None):
+    """
+        Open an uncompressed, gzip or BGZF file as a text stream
+    """
+    return io.TextIOWrapper(io.BufferedReader(BufferReader(iter_buffers(input_file, buffer_size, threads)), buffer_size=2 ** 20))
+
+
+def line_bounds(buf, newlines=None):
+    """
+        Find the start and end of every complete line in a buffer using a vectorized search for newline characters
+
+        Args:
+            buf (np array uint8): raw bytes
+            newlines (np array int, default=None): positions of newline characters if they were already calculated
+
+        Returns:
+            starts (np array int64): position of the first character in each line
+            ends (np array int64): position AFTER the last character in each line (trailing carriage returns are excluded)
+    """
+    if newlines is None:
+        newlines = np.flatnonzero(buf == NEWLINE)
+    starts = np.empty(newlines.shape[0], dtype=np.int64)
+    starts[:1] = 0
+    starts[1:] = newlines[:-1] + 1
+    ends = newlines.astype(np.int64)
+    # windows style line endings
+    if ends.shape[0] and buf.shape[0]:
+        has_cr = (ends > starts) & (buf[np.maximum(ends - 1, 0)] == CARRIAGE_RETURN)
+        ends[has_cr] -= 1
+    return starts, ends
+
+
+def fill_matrix(buf, starts, lengths, fillvalue, width=None):
+    """
+        Copy a set of substrings from a buffer into the rows of a preallocated uint8 matrix
+
+        Args:
+            buf (np array uint8): raw bytes
+            starts (np array int): position of each substring within buf
+            lengths (np array int): length of each substring
+            fillvalue (int or char): value used to pad rows shorter than width
+            width (int, default=None): number of columns in the matrix. If None then the longest substring defines the width
+
+        Returns:
+            matrix (np array uint8): each row is a substring padded with fillvalue
+    """
+    if isinstance(fillvalue, str):
+        fillvalue = ord(fillvalue)
+    lengths = lengths.astype(np.int64)
+    num_rows = lengths.shape[0]
+    if width is None:
+        width = int(lengths.max()) if num_rows else 0
+    matrix = np.full((num_rows, width), fillvalue, dtype=np.uint8)
+    lengths = np.minimum(lengths, width)
+    starts = np.asarray(starts, dtype=np.int64)
+    flat = matrix.reshape(-1)
+    # rows are copied in groups of about FILL_CHUNK_SIZE characters so that the index arrays do not grow with the number of reads
+    row_ends = np.cumsum(lengths)
+    boundaries = np.searchsorted(row_ends, np.arange(FILL_CHUNK_SIZE, int(row_ends[-1]) if num_rows else 0, FILL_CHUNK_SIZE), side='right')
+    for (r0, r1) in zip(np.concatenate([[0], boundaries]), np.concatenate([boundaries, [num_rows]])):
+        chunk_lengths = lengths[r0:r1]
+        total = int(chunk_lengths.sum())
+        if total == 0:
+            continue
+        # position of every copied character relative to the start of its row
+        cols = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(chunk_lengths) - chunk_lengths, chunk_lengths)
+        flat[np.repeat(np.arange(r0, r1, dtype=np.int64) * width, chunk_lengths) + cols] = buf[np.repeat(starts[r0:r1], chunk_lengths) + cols]
+    return matrix
+
+
+def pad_matrix(matrix, width, fillvalue):
+    """
+        Add columns of fillvalue to the right of a matrix so that it has the defined width
+    """
+    if matrix.shape[1] == width:
+        return matrix
+    if isinstance(fillvalue, str):
+        fillvalue = ord(fillvalue)
+    padded = np.full((matrix.shape[0], width), fillvalue, dtype=matrix.dtype)
+    padded[:, :matrix.shape[1]] = matrix
+    return padded
+
+
+def stack_matrices(matrices, fillvalue):
+    """
+        Concatenate matrices with different numbers of columns by padding them to the widest matrix. The output is allocated once and each
+        matrix is copied into it (narrower matrices are not padded first)
+    """
+    if len(matrices) == 0:
+        return np.zeros((0, 0), dtype=np.uint8)
+    builder = MatrixBuilder(fillvalue, sum(m.shape[0] for m in matrices), max(m.shape[1] for m in matrices), matrices[0].dtype)
+    for m in matrices:
+        builder.append(m)
+    return builder.result()
+
+
+class MatrixBuilder():
+    """
+        Append blocks of rows (of any width) to a single matrix padded with fillvalue, instead of keeping every block and concatenating them
+
+        Rows are added to a preallocated matrix. When it is full, its number of rows grows by half in place (ndarray.resize) so that
+        the blocks are never held in memory together with the result. A new matrix is only allocated when a block is wider than every previous block
+
+        Args:
+            fillvalue (int or char): value used to pad rows shorter than the widest block
+            capacity (int, default=0): number of rows allocated at first
+            width (int, default=0): number of columns allocated at first
+    """
+    def __init__(self, fillvalue, capacity=0, width=0, dtype=np.uint8):
+        self.fillvalue = ord(fillvalue) if isinstance(fillvalue, str) else fillvalue
+        self.matrix = np.full((capacity, width), self.fillvalue, dtype=dtype)
+        self.num_rows = 0
+
+    def _reserve(self, num_rows, width):
+        (capacity, current_width) = self.matrix.shape
+        if width > current_width:
+            matrix = np.full((max(capacity, num_rows), width), self.fillvalue, dtype=self.matrix.dtype)
+            matrix[:self.num_rows, :current_width] = self.matrix[:self.num_rows]
+            self.matrix = matrix
+        elif num_rows > capacity:
+            self.matrix.resize((max(num_rows, capacity + capacity // 2), current_width), refcheck=False)
+            self.matrix[capacity:] = self.fillvalue
+
+    def append(self, block):
+        self._reserve(self.num_rows + block.shape[0], block.shape[1])
+        self.matrix[self.num_rows:self.num_rows + block.shape[0], :block.shape[1]] = block
+        self.num_rows += block.shape[0]
+
+    def result(self):
+        """
+            Returns the matrix (rows that were allocated but not used are released)
+        """
+        if self.matrix.shape[0] != self.num_rows:
+            self.matrix.resize((self.num_rows, self.matrix.shape[1]), refcheck=False)
+        return self.matrix
+
+
+def matrix_to_ragged(matrix, fillvalue=0):
+    """
+        Concatenate the rows of a padded matrix without their padding. fillvalue must only be found after the end of each row
+
+        Returns:
+            buf (np array uint8): all rows joined together
+            lengths (np array int64): length of each row
+    """
+    present = matrix != fillvalue
+    return matrix[present], present.sum(axis=1).astype(np.int64)
+
+
+def matrix_to_strings(matrix):
+    """
+        Convert the rows of a uint8 matrix padded with null characters into an array of python strings
+    """
+    if matrix.shape[1] == 0:
+        return np.array([''] * matrix.shape[0], dtype=object)
+    return np.ascontiguousarray(matrix).view('S' + str(matrix.shape[1])).ravel().astype('U').astype(object)
+
+
+def fastq_record_bounds(buf):
+    """
+        Find all complete fastq records (4 lines per read) in a buffer
+
+        Args:
+            buf (np array uint8): raw bytes from a fastq file, starting at the beginning of a record
+
+        Returns:
+            starts (np array int64, shape num_reads x 4): start position of the header, sequence, separator and quality line of each read
+            ends (np array int64, shape num_reads x 4): end position of each line
+            consumed (int): number of bytes in buf that belong to complete records
+    """
+    newlines = np.flatnonzero(buf == NEWLINE)
+    num_reads = newlines.shape[0] // 4
+    newlines = newlines[:num_reads * 4]
+    starts, ends = line_bounds(buf, newlines)
+    consumed = int(newlines[-1]) + 1 if num_reads else 0
+    starts = starts.reshape(-1, 4)
+    ends = ends.reshape(-1, 4)
+    if num_reads and not (buf[starts[:, 0]] == FASTQ_HEADER).all():
+        raise Exception('The provided file is not formatted as a fastq file. Every read must span exactly four lines and the first line must start with "@"')
+    return starts, ends, consumed
+
+
+def parse_fastq_buffer(buf, seq_fill='N', qual_fill='!'):
+    """
+        Convert all complete fastq records in a buffer into uint8 matrices
+
+        Returns:
+            headers (np array uint8): header of each read (without the "@"), padded with null characters
+            seqs (np array uint8): sequence of each read padded with seq_fill
+            quals (np array uint8): quality string of each read padded with qual_fill
+            consumed (int): number of bytes in buf used by these records
+    """
+    starts, ends, consumed = fastq_record_bounds(buf)
+    header_start = starts[:, 0] + 1
+    headers = fill_matrix(buf, header_start, ends[:, 0] - header_start, 0)
+    seqs = fill_matrix(buf, starts[:, 1], ends[:, 1] - starts[:, 1], seq_fill)
+    quals = fill_matrix(buf, starts[:, 3], ends[:, 3] - starts[:, 3], qual_fill)
+    return headers, seqs, quals, consumed
+
+
+def iter_fastq_blocks(buffers, limit=None, seq_fill='N', qual_fill='!'):
+    """
+        Parse a stream of raw fastq bytes block by block
+
+        Args:
+            buffers (iterable of bytes): successive chunks of the fastq file
+            limit (int, default=None): stop after this many reads
+
+        Returns:
+            generator of (headers, seqs, quals) uint8 matrices. Each block only contains complete records
+    """
+    leftover = b''
+    remaining = limit
+    for data in buffers:
+        data = leftover + data if leftover else data
+        buf = np.frombuffer(data, dtype=np.uint8)
+        headers, seqs, quals, consumed = parse_fastq_buffer(buf, seq_fill, qual_fill)
+        leftover = data[consumed:]
+        if seqs.shape[0] == 0:
+            continue
+        if remaining is not None:
+            if seqs.shape[0] >= remaining:
+                yield headers[:remaining], seqs[:remaining], quals[:remaining]
+                return
+            remaining -= seqs.shape[0]
+        yield headers, seqs, quals
+
+    if leftover.strip():
+        # the last record in the file may not end with a newline
+        buf = np.frombuffer(leftover + b'\n', dtype=np.uint8)
+        headers, seqs, quals, consumed = parse_fastq_buffer(buf, seq_fill, qual_fill)
+        if consumed < buf.shape[0]:
+            raise Exception('The fastq file is truncated, the last read does not contain four lines')
+        if remaining is not None:
+            headers, seqs, quals = headers[:remaining], seqs[:remaining], quals[:remaining]
+        yield headers, seqs, quals
+
+
+def read_fastq_arrays(buffers, limit=None, seq_fill='N', qual_fill='!'):
+    """
+        Parse an entire fastq stream into three uint8 matrices (headers, sequences, qualities)
+    """
+    # each parsed block is copied into the result as soon as it is parsed
+    builders = [MatrixBuilder(0), MatrixBuilder(seq_fill), MatrixBuilder(qual_fill)]
+    for block in iter_fastq_blocks(buffers, limit, seq_fill, qual_fill):
+        for builder, matrix in zip(builders, block):
+            builder.append(matrix)
+    return tuple(builder.result() for builder in builders)
+
+
+def fastq_record_index(input_file, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+        Build a compact index of where every read is found in an uncompressed fastq file. The file is memory mapped and scanned once
+
+        Args:
+            input_file (str): path to an uncompressed fastq file
+            buffer_size (int): number of bytes scanned at a time
+
+        Returns:
+            record_index (dict of np arrays):
+
+                1. header_start (int64): file offset of the '@' of each read
+                2. seq_start (int64): file offset of the first base of each read
+                3. qual_start (int64): file offset of the first quality character of each read
+                4. seq_len (uint32): number of bases in each read
+    """
+    if os.path.getsize(input_file) == 0:
+        raise Exception('The provided fastq file is empty')
+    mm = np.memmap(input_file, dtype=np.uint8, mode='r')
+    size = mm.shape[0]
+    pending = np.zeros(0, dtype=np.int64)
+    record_start = 0
+    index = {'header_start': [], 'seq_start': [], 'qual_start': [], 'seq_len': []}
+
+    def add_records(newlines, record_start):
+        starts = np.empty(newlines.shape[0], dtype=np.int64)
+        starts[0] = record_start
+        starts[1:] = newlines[:-1] + 1
+        starts = starts.reshape(-1, 4)
+        seq_end = newlines[1::4].copy()
+        has_cr = (seq_end > starts[:, 1]) & (mm[np.maximum(seq_end - 1, 0)] == CARRIAGE_RETURN)
+        seq_end[has_cr] -= 1
+        if not (mm[starts[:, 0]] == FASTQ_HEADER).all():
+            raise Exception('The provided file is not formatted as a fastq file. Every read must span exactly four lines and the first line must start with "@"')
+        index['header_start'].append(starts[:, 0])
+        index['seq_start'].append(starts[:, 1])
+        index['qual_start'].append(starts[:, 3])
+        index['seq_len'].append((seq_end - starts[:, 1]).astype(np.uint32))
+        return int(newlines[-1]) + 1
+
+    for offset in range(0, size, buffer_size):
+        newlines = np.concatenate([pending, np.flatnonzero(mm[offset:offset + buffer_size] == NEWLINE) + offset])
+        num_reads = newlines.shape[0] // 4
+        pending = newlines[num_reads * 4:]
+        if num_reads:
+            record_start = add_records(newlines[:num_reads * 4], record_start)
+
+    if record_start < size and mm[record_start:].tobytes().strip():
+        # the last record in the file does not end with a newline
+        if pending.shape[0] != 3:
+            raise Exception('The fastq file is truncated, the last read does not contain four lines')
+        add_records(np.concatenate([pending, [size]]), record_start)
+
+    return {k: np.concatenate(v) if v else np.zeros(0, dtype=np.uint32 if k == 'seq_len' else np.int64) for k, v in index.items()}
+
+
+def gather_matrix(buf, starts, lengths, cols, fillvalue, chunk_rows=2 ** 16):
+    """
+        Copy specific columns of a set of substrings found in a buffer into a uint8 matrix. Only the bytes at the requested columns are read from buf
+
+        Args:
+            buf (np array uint8): raw bytes (i.e. a memory mapped file)
+            starts (np array int): position of each substring within buf
+            lengths (np array int): length of each substring
+            cols (np array int): 0-based columns to extract from every substring
+            fillvalue (int or char): value used when a substring is shorter than a requested column
+            chunk_rows (int): number of rows gathered at a time (limits the size of temporary index arrays)
+    """
+    if isinstance(fillvalue, str):
+        fillvalue = ord(fillvalue)
+    cols = np.asarray(cols, dtype=np.int64)
+    matrix = np.full((starts.shape[0], cols.shape[0]), fillvalue, dtype=np.uint8)
+    for r in range(0, starts.shape[0], chunk_rows):
+        s = starts[r:r + chunk_rows].astype(np.int64)
+        valid = cols[None, :] < lengths[r:r + chunk_rows].astype(np.int64)[:, None]
+        positions = s[:, None] + cols[None, :]
+        matrix[r:r + chunk_rows][valid] = buf[positions[valid]]
+    return matrix
+
+
+def find_fastq_record_start(buf, prev_byte=NEWLINE, limit=None):
+    """
+        Find the first position in a buffer where a fastq record begins. A record begins at the start of a line starting with '@' whose
+        second following line starts with '+' (a quality line can start with '@', but then the second following line would be a sequence)
+
+        Args:
+            buf (np array uint8): raw bytes from somewhere within a fastq file
+            prev_byte (int): the byte found in the file right before buf
+            limit (int, default=None): only report records that start before this position
+
+        Returns:
+            position (int): position of the first record in buf or None if no record start could be confirmed
+    """
+    newlines = np.flatnonzero(buf == NEWLINE)
+    starts = np.concatenate([[0], newlines + 1]) if prev_byte == NEWLINE else newlines + 1
+    if limit is not None:
+        starts = starts[starts < limit]
+    # a start can only be confirmed if the first character of the second following line is present
+    line_end = np.searchsorted(newlines, starts)
+    confirmable = line_end + 1 < newlines.shape[0]
+    starts, line_end = starts[confirmable], line_end[confirmable]
+    third_line = newlines[line_end + 1] + 1
+    confirmable = third_line < buf.shape[0]
+    starts, third_line = starts[confirmable], third_line[confirmable]
+    found = np.flatnonzero((buf[starts] == FASTQ_HEADER) & (buf[third_line] == FASTQ_SEPARATOR))
+    return int(starts[found[0]]) if found.shape[0] else None
+
+
+def fastq_byte_ranges(input_file, num_ranges, window=2 ** 20):
+    """
+        Split an uncompressed fastq file into byte ranges whose boundaries are realigned to the start of a record
+
+        Returns:
+            ranges (list of tuples): (start, end) file offsets of each range
+    """
+    size = os.path.getsize(input_file)
+    boundaries = [0]
+    with open(input_file, 'rb') as handle:
+        for i in range(1, num_ranges):
+            pos = max(int(size * i / num_ranges), boundaries[-1], 1)
+            found = None
+            read_size = window
+            while found is None and pos < size:
+                handle.seek(pos - 1)
+                data = handle.read(read_size + 1)
+                buf = np.frombuffer(data[1:], dtype=np.uint8)
+                found = find_fastq_record_start(buf, data[0])
+                if found is None:
+                    if pos + read_size >= size:
+                        pos = size
+                    read_size *= 2
+            boundaries.append(pos + found if found is not None else size)
+    boundaries.append(size)
+    return [(s, e) for s, e in zip(boundaries[:-1], boundaries[1:]) if e > s]
+
+
+def parse_fastq_range(input_file, start, end, buffer_size=DEFAULT_BUFFER_SIZE, seq_fill='N', qual_fill='!'):
+    """
+        Parse all fastq records found between two offsets of an uncompressed file (used by worker processes)
+    """
+    def range_buffers():
+        with open(input_file, 'rb') as handle:
+            handle.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                data = handle.read(min(buffer_size, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+    return read_fastq_arrays(range_buffers(), None, seq_fill, qual_fill)
+
+
+def bgzf_block_offsets(input_file):
+    """
+        Return the file offset of every BGZF block (only block headers are read)
+    """
+    offsets = []
+    with open(input_file, 'rb') as handle:
+        size = os.fstat(handle.fileno()).st_size
+        offset = 0
+        while offset < size:
+            handle.seek(offset)
+            header = handle.read(BGZF_HEADER_SIZE)
+            xlen = struct.unpack('<H', header[10:12])[0]
+            extra = header[12:] + handle.read(xlen - 6)
+            pos = 0
+            bsize = None
+            while pos < xlen:
+                slen = struct.unpack('<H', extra[pos + 2:pos + 4])[0]
+                if extra[pos:pos + 2] == b'BC':
+                    bsize = struct.unpack('<H', extra[pos + 4:pos + 6])[0]
+                pos += 4 + slen
+            if bsize is None:
+                raise Exception('Invalid BGZF block found at position {0}, block size is missing'.format(offset))
+            offsets.append(offset)
+            offset += bsize + 1
+    return offsets
+
+
+def parse_fastq_bgzf_range(input_file, prev_block, start_block, end_block, seq_fill='N', qual_fill='!'):
+    """
+        Parse the fastq records that START within a range of BGZF blocks (used by worker processes)
+
+        The range is realigned to record boundaries after decompression: records that begin in an earlier range are skipped and the
+        last record is completed using data from the following blocks
+
+        Args:
+            prev_block (int): offset of the block before start_block (None for the first range in the file)
+            start_block (int): offset of the first block in the range
+            end_block (int): offset of the first block AFTER the range (None for the last range in the file)
+    """
+    with open(input_file, 'rb') as handle:
+        prev_byte = NEWLINE
+        if prev_block is not None:
+            handle.seek(prev_block)
+            prev_data = inflate_bgzf_block(next(iter_bgzf_raw_blocks(handle))[1])
+            prev_byte = prev_data[-1] if prev_data else NEWLINE
+        handle.seek(start_block)
+        blocks = iter_bgzf_raw_blocks(handle)
+        own = []
+        for offset, data, _ in blocks:
+            own.append(inflate_bgzf_block(data))
+            if end_block is not None and handle.tell() >= end_block:
+                break
+        own = b''.join(own)
+        # read ahead until the last record starting in this range is complete
+        extra = []
+        extra_newlines = 0
+        at_eof = True
+        if end_block is not None:
+            for offset, data, _ in blocks:
+                extra.append(inflate_bgzf_block(data))
+                extra_newlines += extra[-1].count(b'\n')
+                if extra_newlines >= 4:
+                    at_eof = False
+                    break
+    full = own + b''.join(extra)
+    buf = np.frombuffer(full, dtype=np.uint8)
+    first = find_fastq_record_start(buf, prev_byte, limit=len(own)) if prev_block is not None else 0
+    if first is None or len(own) == 0:
+        return np.zeros((0, 0), dtype=np.uint8), np.zeros((0, 0), dtype=np.uint8), np.zeros((0, 0), dtype=np.uint8)
+    if at_eof:
+        # the last record of the file may not end with a newline
+        headers, seqs, quals = read_fastq_arrays([full[first:]], None, seq_fill, qual_fill)
+    else:
+        headers, seqs, quals, _ = parse_fastq_buffer(buf[first:], seq_fill, qual_fill)
+    # only keep records that start within this range
+    newlines = np.flatnonzero(buf[first:] == NEWLINE)
+    record_starts = np.concatenate([[0], newlines[3::4] + 1])[:seqs.shape[0]] + first
+    keep = int((record_starts < len(own)).sum())
+    return headers[:keep], seqs[:keep], quals[:keep]
+
+
+def parallel_fastq_ranges(input_file, num_ranges):
+    """
+        Split a fastq file into ranges that can be parsed independently, returns the function used to parse each range and its arguments
+    """
+    compression = detect_compression(input_file)
+    if compression == 'bgzf':
+        offsets = bgzf_block_offsets(input_file)
+        step = max(1, int(np.ceil(len(offsets) / float(num_ranges))))
+        jobs = []
+        for i in range(0, len(offsets), step):
+            prev_block = offsets[i - 1] if i > 0 else None
+            end_block = offsets[i + step] if i + step < len(offsets) else None
+            jobs.append((input_file, prev_block, offsets[i], end_block))
+        return parse_fastq_bgzf_range, jobs
+    elif compression == 'gzip':
+        raise Exception('Gzip files cannot be split into independent ranges. Recompress the file using bgzip to read it in parallel')
+    return parse_fastq_range, [(input_file, s, e) for s, e in fastq_byte_ranges(input_file, num_ranges)]
+
+
+def rechunk_blocks(blocks, chunk_rows, fillvalues):
+    """
+        Regroup a stream of parsed blocks (tuples of matrices with the same number of rows) into blocks of exactly chunk_rows rows (except the last block)
+
+        Args:
+            blocks (iterable of tuples of np arrays): i.e. the (headers, seqs, quals) blocks from iter_fastq_blocks
+            chunk_rows (int): number of rows in each returned block
+            fillvalues (list): value used to pad each matrix in the tuple when blocks of different widths are stacked
+    """
+    pending = []
+    count = 0
+    for block in blocks:
+        offset = 0
+        num_rows = block[0].shape[0]
+        while offset < num_rows:
+            take = min(chunk_rows - count, num_rows - offset)
+            pending.append(tuple(m[offset:offset + take] for m in block))
+            count += take
+            offset += take
+            if count == chunk_rows:
+                yield tuple(stack_matrices([p[i] for p in pending], f) for i, f in enumerate(fillvalues))
+                pending = []
+                count = 0
+    if pending:
+        yield tuple(stack_matrices([p[i] for p in pending], f) for i, f in enumerate(fillvalues))
+
+
+def strings_to_buffer(strings, encoding='utf-8'):
+    """
+        Concatenate a list of strings into a single uint8 buffer
+
+        Returns:
+            buf (np array uint8): all strings joined together
+            offsets (np array int64): position of each string within buf
+            lengths (np array int64): length of each string
+    """
+    strings = [s.encode(encoding) if isinstance(s, str) else bytes(s) for s in strings]
+    lengths = np.array([len(s) for s in strings], dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    return np.frombuffer(b''.join(strings), dtype=np.uint8), offsets, lengths
+
+
+FASTA_HEADER = ord('>')
+
+# converts lowercase ascii letters to uppercase
+_to_upper = np.arange(256, dtype=np.uint8)
+_to_upper[ord('a'):ord('z') + 1] -= 32
+
+
+def parse_fasta_buffer(buf, final=False, seq_fill='N'):
+    """
+        Convert all complete fasta records in a buffer into uint8 matrices. Records can span any number of lines
+
+        Args:
+            buf (np array uint8): raw bytes from a fasta file, starting at the beginning of a record
+            final (bool): If True, buf contains the end of the file, so the last record is complete
+
+        Returns:
+            headers (np array uint8): header of each record (without the ">"), padded with null characters
+            seqs (np array uint8): uppercase sequence of each record padded with seq_fill
+            consumed (int): number of bytes in buf used by these records
+    """
+    at_line_start = np.concatenate([[True], buf[:-1] == NEWLINE]) if buf.shape[0] else np.zeros(0, dtype=bool)
+    header_start = np.flatnonzero(at_line_start & (buf == FASTA_HEADER))
+    if not final:
+        # the last record may continue in the next buffer
+        consumed = int(header_start[-1]) if header_start.shape[0] else 0
+        header_start = header_start[:-1]
+    else:
+        consumed = buf.shape[0]
+    record_end = np.concatenate([header_start[1:], [consumed]]).astype(np.int64)
+    newlines = np.flatnonzero(buf == NEWLINE)
+    # a header without a trailing newline is a record without a sequence
+    header_end = newlines[np.minimum(np.searchsorted(newlines, header_start), max(newlines.shape[0] - 1, 0))] if newlines.shape[0] else record_end
+    header_end = np.minimum(header_end, record_end) if header_start.shape[0] else np.zeros(0, dtype=np.int64)
+    seq_start = np.minimum(header_end + 1, record_end)
+
+    header_len = header_end - header_start - 1
+    has_cr = (header_len > 0) & (buf[np.maximum(header_end - 1, 0)] == CARRIAGE_RETURN)
+    headers = fill_matrix(buf, header_start + 1, header_len - has_cr, 0)
+
+    # label every byte with the record it belongs to, then drop header lines, whitespace and bytes from incomplete records
+    label = np.zeros(buf.shape[0], dtype=np.int32)
+    label[header_start] = 1
+    label = np.cumsum(label, out=label) - 1
+    header_line = np.zeros(buf.shape[0] + 1, dtype=np.int8)
+    header_line[header_start] = 1
+    header_line[seq_start] -= 1
+    # whitespace and control characters are all <= ' '
+    keep = (buf > ord(' ')) & (label >= 0) & (np.cumsum(header_line[:-1], dtype=np.int8) == 0)
+    keep[consumed:] = False
+    positions = np.flatnonzero(keep)
+    record = label[positions]
+    lengths = np.bincount(record, minlength=header_start.shape[0])
+    width = int(lengths.max()) if lengths.shape[0] else 0
+    seqs = np.full((header_start.shape[0], width), ord(seq_fill), dtype=np.uint8)
+    cols = np.arange(positions.shape[0], dtype=np.int64) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    seqs.ravel()[record.astype(np.int64) * width + cols] = _to_upper[buf[positions]]
+    return headers, seqs, consumed
+
+
+def iter_fasta_blocks(buffers, limit=None, seq_fill='N'):
+    """
+        Parse a stream of raw fasta bytes block by block
+
+        Returns:
+            generator of (headers, seqs) uint8 matrices. Each block only contains complete records
+    """
+    leftover = b''
+    remaining = limit
+    pending = True
+    buffers = iter(buffers)
+    while pending:
+        try:
+            data = leftover + next(buffers) if leftover else next(buffers)
+            final = False
+        except StopIteration:
+            data = leftover
+            final = True
+            pending = False
+        buf = np.frombuffer(data, dtype=np.uint8)
+        headers, seqs, consumed = parse_fasta_buffer(buf, final, seq_fill)
+        leftover = data[consumed:]
+        if seqs.shape[0] == 0:
+            continue
+        if remaining is not None:
+            if seqs.shape[0] >= remaining:
+                yield headers[:remaining], seqs[:remaining]
+                return
+            remaining -= seqs.shape[0]
+        yield headers, seqs
+
+
+def read_name_lengths(headers):
+    """
+        Length of the read name within each fastq header: the text before the first whitespace, ignoring a trailing /1 or /2 mate suffix
+
+        Args:
+            headers (np array uint8): headers padded with null characters (see parse_fastq_buffer)
+    """
+    width = headers.shape[1]
+    if width == 0:
+        return np.zeros(headers.shape[0], dtype=np.int64)
+    # position of the first space, tab or null character
+    is_end = (headers == 0) | (headers == ord(' ')) | (headers == ord('\t'))
+    lengths = np.where(is_end.any(axis=1), is_end.argmax(axis=1), width).astype(np.int64)
+    rows = np.arange(headers.shape[0])
+    has_suffix = (lengths >= 2) & (headers[rows, np.maximum(lengths - 2, 0)] == ord('/')) & np.isin(headers[rows, np.maximum(lengths - 1, 0)], [ord('1'), ord('2')])
+    return lengths - 2 * has_suffix
+
+
+def mask_after(matrix, lengths, fillvalue=0):
+    """
+        Replace every value at or beyond the given length of each row with fillvalue
+    """
+    matrix = matrix.copy()
+    matrix[np.arange(matrix.shape[1])[None, :] >= lengths[:, None]] = fillvalue
+    return matrix
@@ -0,0 +1,371 @@
+import numpy as np
+import pandas as pd
+from .seq_tables import seqtable, is_uint8_matrix
+from .parse_util import fill_matrix, strings_to_buffer
+
+"""
+seqtables that store reads of different lengths without padding. All sequences are concatenated into a single buffer and the length of each read
+is stored separately. Statistics only use the positions that are actually present in each read
+"""
+
+
+def gather_ragged(buf, offsets, lengths):
+    """
+        Concatenate the substrings of buf found at offsets (with the given lengths) into a new buffer
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    total = int(lengths.sum())
+    within = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return buf[np.repeat(np.asarray(offsets, dtype=np.int64), lengths) + within]
+
+
+class ragged_seqtable(seqtable):
+    """
+    A seqtable for reads with different lengths. Sequences (and qualities) are concatenated into a single uint8 buffer and the length of each read
+    is stored in the lengths attribute, so a few long reads do not increase the memory used by every other read.
+
+    Positions past the end of a read are not treated as letters: get_seq_dist, get_consensus, hamming_distance, quality_filter and
+    convert_low_bases_to_null only use the positions present in each read, compare_to_reference returns NaN past the end of a read,
+    and the frequencies at each position are relative to the number of reads that cover that position.
+
+    seq_table and qual_table are padded tables (using fillna_val and null_qual) decoded on every access; other methods use them as a fallback.
+    Use pad() to create a regular seqtable.
+
+    Args:
+        Identical to seqtable
+
+    Examples:
+        >>> st = ragged_seqtable(['ACGTACGT', 'ACG', 'ACGTA'])
+        >>> st.get_seq_dist()
+        >>> st = read_fastq('trimmed.fastq', ragged=True)
+    """
+    def __init__(self, seqdata=None, qualitydata=None, start=1, index=None, seqtype='NT', **kwargs):
+        self.seq_buffer = np.zeros(0, dtype=np.uint8)
+        self.qual_buffer = None
+        self.lengths = np.zeros(0, dtype=np.int64)
+        self.offsets = np.zeros(0, dtype=np.int64)
+        self._index = None
+        seqtable.__init__(self, seqdata, qualitydata, start, index, seqtype, **kwargs)
+
+    @staticmethod
+    def from_buffers(seq_buffer, lengths, qual_buffer=None, index=None, start=1, seqtype='NT', phred_adjust=33, **kwargs):
+        """
+            Create a table from concatenated sequences
+
+            Args:
+                seq_buffer (np array uint8): all sequences concatenated
+                lengths (np array int): length of each sequence
+                qual_buffer (np array uint8, default=None): all quality strings (ascii values) concatenated
+        """
+        new_member = ragged_seqtable(start=start, seqtype=seqtype, phred_adjust=phred_adjust, **kwargs)
+        new_member._set_buffers(seq_buffer, lengths, qual_buffer - np.uint8(phred_adjust) if qual_buffer is not None else None, index)
+        return new_member
+
+    @staticmethod
+    def from_seqtable(st, lengths=None):
+        """
+            Create a ragged copy of an existing seqtable
+
+            Args:
+                lengths (np array int, default=None): length of each sequence. If None, then every sequence uses all positions in the table
+        """
+        seqs = np.ascontiguousarray(st.seq_table.values)
+        lengths = np.full(seqs.shape[0], seqs.shape[1], dtype=np.int64) if lengths is None else np.minimum(np.asarray(lengths, dtype=np.int64), seqs.shape[1])
+        keep = np.arange(seqs.shape[1])[None, :] < lengths[:, None]
+        new_member = ragged_seqtable(
+            start=st.start, seqtype=st.seqtype, phred_adjust=st.phred_adjust, null_qual=st.null_qual,
+            encode_letters=st.encoding_setting[0], encoding=st.encoding_setting[1]
+        )
+        new_member._set_buffers(seqs[keep], lengths, st.qual_table.values[keep] if st.qual_table is not None else None, st.seq_table.index)
+        new_member.counts = st.counts
+        new_member.mate_columns = st.mate_columns
+        return new_member
+
+    def _set_buffers(self, seq_buffer, lengths, qual_buffer, index):
+        """
+            Store concatenated sequences and qualities (already adjusted by phred_adjust)
+
+            .. important::Private function
+
+                This function is not for public use
+        """
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.offsets = np.cumsum(self.lengths) - self.lengths
+        self.seq_buffer = seq_buffer
+        self.qual_buffer = qual_buffer
+        self._index = pd.RangeIndex(self.lengths.shape[0]) if index is None else pd.Index(index)
+        self._seq_df = None
+
+    def pad(self):
+        """
+            Returns a regular seqtable in which shorter reads are padded with fillna_val (and null_qual)
+        """
+        new_member = seqtable(
+            seqtype=self.seqtype, start=self.start, phred_adjust=self.phred_adjust, null_qual=self.null_qual,
+            encode_letters=self.encoding_setting[0], encoding=self.encoding_setting[1]
+        )
+        new_member.seq_table = self.seq_table
+        new_member.qual_table = self.qual_table
+        new_member.index = self.index
+        new_member.counts = self.counts
+        new_member.mate_columns = self.mate_columns
+        return new_member
+
+    def copy(self):
+        new_member = self.__class__.__new__(self.__class__)
+        new_member.__dict__.update(self.__dict__)
+        new_member.seq_buffer = self.seq_buffer.copy()
+        new_member.qual_buffer = self.qual_buffer.copy() if self.qual_buffer is not None else None
+        new_member.counts = self.counts.copy() if self.counts is not None else None
+        new_member._seq_df = None
+        new_member.loc, new_member.iloc, new_member.ix = [type(self.loc)(new_member, m) for m in ['loc', 'iloc', 'ix']]
+        return new_member
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def __len__(self):
+        return self.lengths.shape[0]
+
+    def shape(self):
+        return (len(self), self.width)
+
+    @property
+    def width(self):
+        return int(self.lengths.max()) if self.lengths.shape[0] else 0
+
+    @property
+    def columns(self):
+        return pd.RangeIndex(self.start, self.start + self.width)
+
+    @property
+    def index(self):
+        return self._index
+
+    @index.setter
+    def index(self, value):
+        self._index = pd.Index(value) if value is not None else None
+
+    @property
+    def seq_table(self):
+        arr = fill_matrix(self.seq_buffer, self.offsets, self.lengths, self.fillna_val, self.width)
+        return pd.DataFrame(arr, index=self._index, columns=self.columns, copy=False)
+
+    @seq_table.setter
+    def seq_table(self, value):
+        seqs = np.ascontiguousarray(value.values, dtype=np.uint8)
+        if seqs.shape == (len(self), self.width):
+            # a table with the same shape replaces the letters of each read, which keeps its length and its qualities
+            keep = np.arange(seqs.shape[1])[None, :] < self.lengths[:, None]
+            (seq_buffer, lengths) = (seqs[keep], self.lengths)
+        elif self.qual_buffer is not None:
+            raise Exception(
+                'The assigned table ({0} x {1}) does not have the shape of this table ({2} x {3}) so its qualities cannot be kept. '
+                'Set qual_table to None first'.format(seqs.shape[0], seqs.shape[1], len(self), self.width)
+            )
+        else:
+            # a table of another shape does not define where each read ends, so all positions are used
+            (seq_buffer, lengths) = (seqs.ravel(), np.full(seqs.shape[0], seqs.shape[1]))
+        self.start = value.columns[0] if value.shape[1] else self.start
+        self._set_buffers(seq_buffer, lengths, self.qual_buffer, value.index)
+
+    @property
+    def qual_table(self):
+        if self.qual_buffer is None:
+            return None
+        arr = fill_matrix(self.qual_buffer, self.offsets, self.lengths, ord(self.null_qual) - self.phred_adjust, self.width)
+        return pd.DataFrame(arr, index=self._index, columns=self.columns, copy=False)
+
+    @qual_table.setter
+    def qual_table(self, value):
+        if value is None:
+            self.qual_buffer = None
+        else:
+            quals = np.asarray(value.values, dtype=np.uint8)
+            self.qual_buffer = quals[np.arange(quals.shape[1])[None, :] < self.lengths[:, None]]
+
+    def _seq_to_table(self, seqlist):
+        """
+            Concatenate the provided sequences without padding
+
+            .. important::Private function
+
+                This function is not for public use
+        """
+        if is_uint8_matrix(seqlist):
+            self._set_buffers(np.ascontiguousarray(seqlist).ravel(), np.full(seqlist.shape[0], seqlist.shape[1]), None, self._index)
+        else:
+            (buf, _, lengths) = strings_to_buffer(seqlist, self.encoding_setting[1])
+            self._set_buffers(buf, lengths, None, self._index)
+
+    def qual_to_table(self, qualphred, phred_adjust=33, return_table=False):
+        """
+            Store the quality of each base. Every quality string must have the same length as its sequence
+        """
+        if is_uint8_matrix(qualphred):
+            (buf, lengths) = (np.ascontiguousarray(qualphred).ravel(), np.full(qualphred.shape[0], qualphred.shape[1]))
+        else:
+            (buf, _, lengths) = strings_to_buffer(qualphred, self.encoding_setting[1])
+        if not np.array_equal(lengths, self.lengths):
+            raise Exception("The provided quality list does not match the format of the sequence list. Every quality string must have the same length as its sequence")
+        self.qual_buffer = buf - np.uint8(self.phred_adjust)
+        self._seq_df = None
+        if return_table:
+            return self.qual_table
+
+    def _iter_chunks(self, chunk_reads=2 ** 18):
+        """
+            Iterate over groups of reads, returns the read number and 0-based position of every base in the group and the slice of the buffers it uses
+
+            .. important::Private function
+
+                This function is not for public use
+        """
+        for c in range(0, len(self), chunk_reads):
+            lengths = self.lengths[c:c + chunk_reads]
+            if lengths.shape[0] == 0:
+                continue
+            buffer_slice = slice(int(self.offsets[c]), int(self.offsets[c] + lengths.sum()))
+            reads = np.repeat(np.arange(c, c + lengths.shape[0], dtype=np.int64), lengths)
+            positions = np.arange(buffer_slice.stop - buffer_slice.start, dtype=np.int64) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            yield reads, positions, buffer_slice
+
+    def _select_rows(self, rows):
+        """
+            Create a new table containing the reads at the provided positions
+
+            .. important::Private function
+
+                This function is not for public use
+        """
+        new_member = self.__class__.__new__(self.__class__)
+        new_member.__dict__.update(self.__dict__)
+        new_member._set_buffers(
+            gather_ragged(self.seq_buffer, self.offsets[rows], self.lengths[rows]), self.lengths[rows],
+            gather_ragged(self.qual_buffer, self.offsets[rows], self.lengths[rows]) if self.qual_buffer is not None else None, self._index[rows]
+        )
+        new_member.counts = self.counts.iloc[rows] if self.counts is not None else None
+        new_member.loc, new_member.iloc, new_member.ix = [type(self.loc)(new_member, m) for m in ['loc', 'iloc', 'ix']]
+        return new_member
+
+    def slice_object(self, method, params):
+        if method == 'iloc' and not isinstance(params, tuple):
+            # selecting reads only requires gathering their part of the buffers
+            try:
+                rows = np.arange(len(self))[params]
+            except (IndexError, TypeError, ValueError):
+                rows = None
+            if rows is not None and np.ndim(rows) == 1:
+                return self._select_rows(rows)
+        return self.pad().slice_object(method, params)
+
+    def __getitem__(self, key):
+        return self.pad().__getitem__(key)
+
+    def subsample(self, numseqs):
+        return self._select_rows(np.random.choice(len(self), numseqs, replace=False))
+
+    def get_seq_dist(self, positions=None, method='counts', ignore_characters=[], weight_by=None):
+        """
+            Returns the distribution of bases or amino acids at each position. Only reads that reach a position are counted at that position
+        """
+        weight_by = self._validate_weights(weight_by)
+        column_names = pd.Index(positions) if positions else self.columns
+        cols = self.columns.get_indexer(column_names)
+        if (cols < 0).any():
+            raise KeyError('The following positions are not in the table: {0}'.format(list(column_names[cols < 0])))
+        width = self.width
+        counts = np.zeros(width * 256, dtype=np.float64)
+        for reads, pos, buffer_slice in self._iter_chunks():
+            w = None if weight_by is None else np.asarray(weight_by, dtype=np.float64)[reads]
+            counts += np.bincount(pos * 256 + self.seq_buffer[buffer_slice], weights=w, minlength=width * 256)
+        counts = counts.reshape(width, 256).T[:, cols]
+        letters = np.flatnonzero(counts.any(axis=1))
+        counts = counts[letters]
+        dist = pd.DataFrame(counts if weight_by is not None else counts.astype(np.int64), index=letters, columns=range(cols.shape[0]))
+        return self._format_seq_dist(dist, column_names, method, ignore_characters)
+
+    def compare_to_reference(
+            self, reference_seq, positions=None, ref_start=0, flip=False,
+            set_diff=False, ignore_characters=[], treat_as_true=[], return_num_bases=False
+    ):
+        """
+            Calculate which positions within a reference are not equal in all sequences in dataframe (see seqtable.compare_to_reference)
+
+            Positions past the end of a read are NaN (the datatype becomes float when any read is shorter than the compared positions)
+        """
+        df = seqtable.compare_to_reference(self, reference_seq, positions, ref_start, flip, set_diff, ignore_characters, treat_as_true, False)
+        past_end = (self.columns.get_indexer(df.columns)[None, :] >= self.lengths[:, None])
+        if past_end.any():
+            values = df.values.astype(float)
+            values[past_end] = np.nan
+            df = pd.DataFrame(values, index=df.index, columns=df.columns)
+        if return_num_bases:
+            return df, df.notnull().values.sum(axis=1)
+        return df
+
+    def hamming_distance(self, reference_seq, positions=None, ref_start=0, set_diff=False, ignore_characters=[], normalized=False):
+        """
+            Determine hamming distance of all sequences to a reference sequence (see seqtable.hamming_distance). Only positions present in a read are compared,
+            so when normalized is True the distance is divided by the number of positions compared in each read
+        """
+        reference_array, positions = self._reference_positions(reference_seq, positions, ref_start, set_diff)
+        ref_lookup = np.full(self.width, -1, dtype=np.int16)
+        ref_lookup[self.columns.get_indexer(positions)] = reference_array
+        if not isinstance(ignore_characters, list):
+            ignore_characters = [ignore_characters]
+        ignore = np.array([ord(c) for c in ignore_characters], dtype=np.int16)
+
+        dist = np.zeros(len(self), dtype=np.float64)
+        bases = np.zeros(len(self), dtype=np.float64)
+        for reads, pos, buffer_slice in self._iter_chunks():
+            ref = ref_lookup[pos]
+            seq = self.seq_buffer[buffer_slice]
+            used = ref >= 0
+            if ignore.shape[0]:
+                used &= ~np.isin(seq, ignore) & ~np.isin(ref, ignore)
+            dist += np.bincount(reads, weights=used & (seq != ref), minlength=len(self))
+            bases += np.bincount(reads, weights=used, minlength=len(self))
+        if normalized:
+            return pd.Series(dist / bases, index=self._index)
+        return pd.Series(dist.astype(np.int64), index=self._index)
+
+    def quality_filter(self, q, p, inplace=False, ignore_null_qual=True):
+        """
+            Filter out sequences based on their average qualities at each base/position. The percentage is calculated using the bases present in each read
+        """
+        if self.qual_buffer is None:
+            raise Exception("You have not passed in any quality data for these sequences")
+        total_bases = np.zeros(len(self), dtype=np.float64)
+        above = np.zeros(len(self), dtype=np.float64)
+        for reads, pos, buffer_slice in self._iter_chunks():
+            quals = self.qual_buffer[buffer_slice]
+            total_bases += np.bincount(reads, weights=quals > (ord(self.null_qual) - self.phred_adjust) if ignore_null_qual else None, minlength=len(self))
+            above += np.bincount(reads, weights=quals >= q, minlength=len(self))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percent_above = (100 * above) / total_bases
+        filtered = self._select_rows(np.flatnonzero(percent_above >= p))
+        if inplace is False:
+            return filtered
+        self.__dict__.update(filtered.__dict__)
+        self.loc, self.iloc, self.ix = [type(self.loc)(self, m) for m in ['loc', 'iloc', 'ix']]
+
+    def convert_low_bases_to_null(self, q, replace_with='N', inplace=False):
+        """
+            This will convert all letters whose corresponding quality is below a cutoff to the value replace_with
+        """
+        if self.qual_buffer is None:
+            raise Exception("You have not passed in any quality data for these sequences")
+        replace_with = ord(replace_with) if replace_with is not None else ord(self.fillna_val)
+        new_buffer = np.where(self.qual_buffer < q, np.uint8(replace_with), self.seq_buffer)
+        if inplace is True:
+            meself = self
+        else:
+            # the quality buffer and lengths are not modified so they are shared with the new table
+            meself = self.__class__.__new__(self.__class__)
+            meself.__dict__.update(self.__dict__)
+            meself.loc, meself.iloc, meself.ix = [type(self.loc)(meself, m) for m in ['loc', 'iloc', 'ix']]
+        meself.seq_buffer = new_buffer
+        meself._seq_df = None
+        if inplace is False:
+            return meself
@@ -1,9 +1,24 @@
 from .seq_tables import seqtable
+from .lazy_seqtable import lazy_fastq_seqtable
+from .ragged_seqtable import ragged_seqtable
 import pandas as pd
+import numpy as np
 from .__init__ import bio_installed, SeqIO
 import gc
 import warnings
+from concurrent.futures import ProcessPoolExecutor
 from .insilica_sequences import generate_sequence, generate_library, add_quality_scores
+from .parse_util import (
+    DEFAULT_BUFFER_SIZE, iter_buffers, read_fastq_arrays, matrix_to_strings, detect_compression, open_text,
+    stack_matrices, MatrixBuilder, parallel_fastq_ranges, iter_fastq_blocks, rechunk_blocks, strings_to_buffer, fill_matrix
+)
+from .cigar_util import parse_cigar_strings, project_to_reference, softclip_bounds, insertions_to_dataframe
+from .parse_util import iter_bgzf_buffers, iter_fasta_blocks, read_name_lengths, mask_after, pad_matrix, matrix_to_ragged
+from .bam_util import (
+    parse_bam_header, bam_record_offsets, decode_bam_records, concat_bam_records, filter_bam_records, reference_lengths,
+    read_bai, region_chunks, read_bgzf_virtual_range, parse_region, read_names
+)
+import os
 
 """
 methods for converting files from NGS into seqtables
@@ -36,17 +51,82 @@ def create_scratch_data(num_seqs, seq_len, ss_pos=[], error_prone_rate=0.01):
     return seqtable(lib, qual, seq_type='NT'), wt_seq
 
 
-def read_fastq(input_file, limit=None, chunk_size=10000, use_header_as_index=True, use_pandas=True, ignore_quotes=True):
+def read_fastq(
+    input_file, limit=None, chunk_size=10000, use_header_as_index=True, use_pandas=None, ignore_quotes=True,
+    method='native', buffer_size=DEFAULT_BUFFER_SIZE, threads=None, lazy=False, processes=None, ragged=False
+):
     """
         Load a fastq file as class SeqTable
+
+        Args:
+            input_file (str): path to the fastq file. The file can be uncompressed, gzip compressed, or BGZF compressed (bgzip)
+            limit (int, default=None): only load the first N reads
+            chunk_size (int, default=10000): number of lines read at a time when method='pandas'
+            use_header_as_index (bool, default=True): If True, the header of each read is used as the index of the seqtable
+            use_pandas (bool, default=None): deprecated, if True then method='pandas', if False then method='biopython'
+            ignore_quotes (bool, default=True): only used when method='pandas'
+            method ('native', 'pandas' or 'biopython'):
+
+                .. note:: method='native'
+
+                    The file is read in large binary buffers (buffer_size bytes at a time), record boundaries are found using a vectorized search for newlines,
+                    and sequence/quality characters are copied directly into uint8 matrices used by seq_table/qual_table
+
+            buffer_size (int, default=2**26): number of bytes read at a time when method='native'
+            threads (int, default=None): number of threads used to decompress BGZF files. If None then uses the number of cpus
+            lazy (bool, default=False): If True, the file is memory mapped and only indexed. Reads are decoded from the file when a method needs them
+
+                .. note:: lazy=True
+
+                    Only available for uncompressed fastq files. Returns a lazy_fastq_seqtable (see lazy_seqtable module). iloc slicing, subsample and
+                    get_seq_dist(positions=...) only read the rows and positions they use
+
+            processes (int, default=None): If greater than 1, the file is split into byte ranges aligned to record boundaries and each range is parsed by a separate process
+
+                .. note:: processes
+
+                    Only available for uncompressed or BGZF compressed files when method='native'. Reads are returned in their original order.
+                    When limit is set the file is read serially (only its first reads are parsed) and processes is ignored with a warning
+
+            ragged (bool, default=False): If True, reads are stored without padding and a ragged_seqtable is returned (see ragged_seqtable module).
+                Useful for trimmed reads with different lengths. Only available when method='native'
+
+        Returns:
+            seqtable instance
     """
+    if lazy:
+        if detect_compression(input_file):
+            raise Exception('Compressed files cannot be memory mapped. Decompress the file or set lazy to False')
+        st = lazy_fastq_seqtable(input_file, use_header_as_index=use_header_as_index, buffer_size=buffer_size)
+        return st.iloc[:limit] if limit is not None else st
+
+    if use_pandas is not None:
+        method = 'pandas' if use_pandas else 'biopython'
+
+    if ragged:
+        return _read_fastq_ragged(input_file, limit, use_header_as_index, buffer_size, threads)
+
+    if method == 'native':
+        if processes is not None and processes > 1 and limit is not None:
+            warnings.warn('processes is ignored when limit is set, the first {0} reads are read serially'.format(limit))
+        if processes is not None and processes > 1 and limit is None:
+            headers, seqs, quals = _read_fastq_parallel(input_file, processes, buffer_size)
+        else:
+            headers, seqs, quals = read_fastq_arrays(iter_buffers(input_file, buffer_size, threads), limit)
+        header = matrix_to_strings(headers) if use_header_as_index else None
+        del headers
+        st = seqtable(seqs, quals, index=header, seqtype='NT')
+        del seqs, quals, header
+        gc.collect()
+        return st
+
     def group_fastq(index):
         return index % 4
 
     # limit refers to reads, fastq file is 4 lines per read
     line_limit = limit * 4 if limit else None
 
-    if use_pandas:
+    if method == 'pandas':
         header = []
         seqs = []
         quals = []
@@ -67,7 +147,7 @@ def read_fastq(input_file, limit=None, chunk_size=10000, use_header_as_index=Tru
             header.extend(list(tmp.get_group(0)[0].apply(lambda x: x[1:].strip())))
             seqs.extend(list(tmp.get_group(1)[0].apply(lambda x: x.strip())))
             quals.extend(list(tmp.get_group(3)[0].apply(lambda x: x.strip())))
-    else:
+    elif method == 'biopython':
         if bio_installed is False:
             raise Exception("You do not have BIOPYTHON installed and therefore must use pandas to read the fastq (set use_pandas parameter to True). If you would like to use biopython then please install")
         seqs = []
@@ -81,18 +161,253 @@ def read_fastq(input_file, limit=None, chunk_size=10000, use_header_as_index=Tru
             quals.append(r[3])
             if limit is not None and l > limit:
                 break
+    else:
+        raise Exception('The provided method, {0}, is not valid. We only allow method to be "native", "pandas" or "biopython"'.format(method))
     st = seqtable(seqs, quals, index=header, seqtype='NT')
     del seqs, quals, header
     gc.collect()
     return st
 
 
-def read_sam(input_file, limit=None, chunk_size=100000, cleave_softclip=False, use_header_as_index=True, ignore_quotes=True):
+def read_fasta(input_file, limit=None, use_header_as_index=True, seqtype='NT', buffer_size=DEFAULT_BUFFER_SIZE, threads=None):
+    """
+        Load a fasta file as class SeqTable. Records can span multiple lines. The file is parsed in large binary buffers and sequences are copied
+        directly into the uint8 matrix used by seq_table (biopython is not required)
+
+        Args:
+            input_file (str): path to the fasta file (uncompressed, gzip or BGZF)
+            limit (int, default=None): only load the first N records
+            use_header_as_index (bool, default=True): If True, the header of each record is used as the index of the seqtable
+            seqtype (string of 'AA' or 'NT', default='NT'): type of sequences in the file
+
+        Returns:
+            seqtable instance (sequences are converted to uppercase)
+    """
+    fillvalue = 'N' if seqtype == 'NT' else 'X'
+    headers, seqs = [], []
+    for h, s in iter_fasta_blocks(iter_buffers(input_file, buffer_size, threads), limit, fillvalue):
+        headers.append(h)
+        seqs.append(s)
+    header = matrix_to_strings(stack_matrices(headers, 0)) if use_header_as_index else None
+    seqs = stack_matrices(seqs, fillvalue)
+    st = seqtable(seqs, index=header, seqtype=seqtype)
+    del seqs, headers, header
+    gc.collect()
+    return st
+
+
+def _read_fastq_ragged(input_file, limit, use_header_as_index, buffer_size, threads):
+    """
+        Parse a fastq file block by block and concatenate the reads of every block without padding
+    """
+    headers, seq_buffers, qual_buffers, lengths = [], [], [], []
+    # null characters are never found in a fastq file, so they mark positions past the end of each read
+    for block_headers, seqs, quals in iter_fastq_blocks(iter_buffers(input_file, buffer_size, threads), limit, seq_fill=0, qual_fill=0):
+        (seq_buffer, seq_lens) = matrix_to_ragged(seqs)
+        (qual_buffer, qual_lens) = matrix_to_ragged(quals)
+        if not np.array_equal(seq_lens, qual_lens):
+            raise Exception('The length of the quality string does not match the length of the sequence for at least one read')
+        if use_header_as_index:
+            headers.append(block_headers)
+        seq_buffers.append(seq_buffer)
+        qual_buffers.append(qual_buffer)
+        lengths.append(seq_lens)
+    index = matrix_to_strings(stack_matrices(headers, 0)) if use_header_as_index else None
+    return ragged_seqtable.from_buffers(
+        np.concatenate(seq_buffers) if seq_buffers else np.zeros(0, dtype=np.uint8),
+        np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.int64),
+        np.concatenate(qual_buffers) if qual_buffers else np.zeros(0, dtype=np.uint8),
+        index=index, seqtype='NT'
+    )
+
+
+def read_fastq_paired(
+    r1_file, r2_file, limit=None, combine=False, validate_names=True, chunk_reads=2 ** 18, buffer_size=DEFAULT_BUFFER_SIZE, threads=None
+):
+    """
+        Load the two files of a paired-end run. Both files are parsed in lockstep and the read names of the mates are compared without creating python strings
+
+        Args:
+            r1_file (str): fastq file containing the first mate of each pair (uncompressed, gzip or BGZF)
+            r2_file (str): fastq file containing the second mate of each pair
+            limit (int, default=None): only load the first N pairs
+            combine (bool, default=False): defines how the pairs are returned
+
+                .. note:: combine
+
+                    If False, then two seqtables are returned whose rows are aligned (both use the read name as the index).
+                    If True, then a single seqtable is returned. R1 bases are found in columns 1 to L1 and R2 bases are found in the following columns.
+                    The columns belonging to each mate are stored in the attribute mate_columns ({'R1': [...], 'R2': [...]}). Filters such as quality_filter
+                    then keep or remove both mates of a pair together
+
+            validate_names (bool, default=True): If True, raise an exception if the names of the mates (text before the first whitespace, ignoring /1 and /2) do not match
+            chunk_reads (int, default=2**18): number of pairs compared at a time
+
+        Returns:
+            (seqtable, seqtable) if combine is False otherwise seqtable
+    """
+    blocks = [
+        rechunk_blocks(iter_fastq_blocks(iter_buffers(f, buffer_size, threads), limit), chunk_reads, [0, 'N', '!'])
+        for f in [r1_file, r2_file]
+    ]
+    names, mates = [], [[], []]
+    num_pairs = 0
+    while True:
+        chunk1, chunk2 = next(blocks[0], None), next(blocks[1], None)
+        if chunk1 is None or chunk2 is None:
+            if chunk1 is not None or chunk2 is not None:
+                raise Exception('The paired files do not contain the same number of reads')
+            break
+        if chunk1[0].shape[0] != chunk2[0].shape[0]:
+            raise Exception('The paired files do not contain the same number of reads')
+        name_lens = read_name_lengths(chunk1[0])
+        name1 = mask_after(chunk1[0], name_lens)
+        if validate_names:
+            name_lens2 = read_name_lengths(chunk2[0])
+            width = max(name1.shape[1], chunk2[0].shape[1])
+            name2 = mask_after(chunk2[0], name_lens2)
+            mismatched = np.flatnonzero((name_lens != name_lens2) | (pad_matrix(name1, width, 0) != pad_matrix(name2, width, 0)).any(axis=1))
+            if mismatched.shape[0]:
+                raise Exception('The read names of pair {0} do not match. All reads in both files must be in the same order'.format(num_pairs + int(mismatched[0]) + 1))
+        names.append(name1)
+        mates[0].append(chunk1[1:])
+        mates[1].append(chunk2[1:])
+        num_pairs += name1.shape[0]
+
+    index = matrix_to_strings(stack_matrices(names, 0))
+    tables = [
+        (stack_matrices([m[0] for m in mate], 'N'), stack_matrices([m[1] for m in mate], '!'))
+        for mate in mates
+    ]
+    del mates, names
+
+    if not combine:
+        return tuple(seqtable(seqs, quals, index=index, seqtype='NT') for seqs, quals in tables)
+
+    r1_len = tables[0][0].shape[1]
+    st = seqtable(
+        np.concatenate([tables[0][0], tables[1][0]], axis=1), np.concatenate([tables[0][1], tables[1][1]], axis=1), index=index, seqtype='NT'
+    )
+    columns = list(st.seq_table.columns)
+    st.mate_columns = {'R1': columns[:r1_len], 'R2': columns[r1_len:]}
+    return st
+
+
+def iter_fastq(input_file, chunk_reads=1000000, limit=None, use_header_as_index=True, buffer_size=DEFAULT_BUFFER_SIZE, threads=None):
+    """
+        Read a fastq file as a series of seqtables with at most chunk_reads reads each. Only one chunk is held in memory at a time,
+        so arbitrarily large files can be streamed through methods such as quality_filter, get_seq_dist or mutation_profile
+
+        Args:
+            input_file (str): path to the fastq file (uncompressed, gzip or BGZF)
+            chunk_reads (int, default=1000000): number of reads in each seqtable
+            limit (int, default=None): stop after this many reads
+
+        Returns:
+            generator of seqtable instances
+
+            .. note:: table widths
+
+                Each chunk is only padded to the longest read within that chunk, so the number of columns can differ between chunks
+
+        Examples:
+            >>> dist = None
+            >>> for st in iter_fastq('run.fastq.gz', chunk_reads=500000):
+            >>>     d = st.quality_filter(20, 90).get_seq_dist()
+            >>>     dist = d if dist is None else dist.add(d, fill_value=0)
+    """
+    blocks = iter_fastq_blocks(iter_buffers(input_file, buffer_size, threads), limit)
+    for headers, seqs, quals in rechunk_blocks(blocks, chunk_reads, [0, 'N', '!']):
+        header = matrix_to_strings(headers) if use_header_as_index else None
+        yield seqtable(seqs, quals, index=header, seqtype='NT')
+
+
+def iter_sam(input_file, chunk_reads=1000000, use_header_as_index=True, ignore_quotes=True, threads=None, cleave_softclip=False, project_cigar=False):
+    """
+        Read a SAM file as a series of seqtables with at most chunk_reads reads each (see iter_fastq)
+
+        Args:
+            input_file (str): path to the SAM file (uncompressed, gzip or BGZF)
+            chunk_reads (int, default=1000000): number of reads in each seqtable
+            cleave_softclip (bool, default=False): see read_sam
+            project_cigar (bool, default=False): see read_sam. Each chunk starts at the leftmost reference position found in that chunk
+
+        Returns:
+            generator of seqtable instances
+    """
+    compression = detect_compression(input_file)
+
+    skiplines = 0
+    with open_text(input_file, threads=threads) if compression else open(input_file) as r:
+        for i in r:
+            if i[0] == '@':
+                skiplines += 1
+            else:
+                break
+
+    cols_to_use = [9, 10]
+    if use_header_as_index:
+        cols_to_use.append(0)
+        index_col = 0
+    else:
+        index_col = None
+
+    if cleave_softclip or project_cigar:
+        cols_to_use.extend([2, 3, 5])
+
+    sam_input = open_text(input_file, threads=threads) if compression else input_file
+    read_params = {'quotechar': '\x07'} if ignore_quotes else {}
+    for df in pd.read_csv(sam_input, sep='\t', header=None, index_col=index_col, usecols=cols_to_use, skiprows=skiplines, chunksize=chunk_reads, **read_params):
+        yield _sam_frame_to_seqtable(df, cleave_softclip, project_cigar)
+
+
+def _read_fastq_parallel(input_file, processes, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+        Parse independent ranges of a fastq file in separate processes and concatenate the resulting matrices in their original order
+
+        .. important::Private function
+
+            This function is not for public use
+    """
+    # use more ranges than processes so that a slow range does not hold up the rest
+    parse_range, jobs = parallel_fastq_ranges(input_file, processes * 4)
+    # results are yielded in their original order, and each one is copied into the output (and released) as soon as it is yielded
+    builders = [MatrixBuilder(0), MatrixBuilder('N'), MatrixBuilder('!')]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for result in pool.map(parse_range, *zip(*jobs)):
+            for builder, matrix in zip(builders, result):
+                builder.append(matrix)
+            del result
+    return tuple(builder.result() for builder in builders)
+
+
+def read_sam(
+    input_file, limit=None, chunk_size=100000, cleave_softclip=False, use_header_as_index=True, ignore_quotes=True, threads=None,
+    project_cigar=False, return_insertions=False
+):
     """
         Load a SAM file into class SeqTable
+
+        Args:
+            input_file (str): path to the SAM file. The file can be uncompressed, gzip compressed, or BGZF compressed (bgzip)
+            cleave_softclip (bool, default=False): If True, remove soft clipped bases (defined by the CIGAR string) from the start and end of each read
+            threads (int, default=None): number of threads used to decompress BGZF files. If None then uses the number of cpus
+            project_cigar (bool, default=False): If True, use the POS and CIGAR columns to place every base at its reference position
+
+                .. note:: project_cigar=True
+
+                    Columns of seq_table become reference coordinates. Soft clipped bases and insertions are removed, deleted positions are
+                    filled with '-' (with a null quality), and positions not covered by a read are filled with 'N'
+
+            return_insertions (bool, default=False): If True and project_cigar is True, also return a dataframe of the inserted bases removed from each read
+
+        Returns:
+            seqtable instance (and a dataframe of insertions if return_insertions is True)
     """
+    compression = detect_compression(input_file)
+
     skiplines = 0
-    with open(input_file) as r:
+    with open_text(input_file, threads=threads) if compression else open(input_file) as r:
         for i in r:
             if i[0] == '@':
                 skiplines += 1
@@ -106,10 +421,158 @@ def read_sam(input_file, limit=None, chunk_size=100000, cleave_softclip=False, u
     else:
         index_col = None
 
+    if cleave_softclip or project_cigar:
+        cols_to_use.extend([2, 3, 5])
+
+    # decompress in memory rather than writing an uncompressed copy to disk
+    sam_input = open_text(input_file, threads=threads) if compression else input_file
+
+    df = pd.read_csv(sam_input, sep='\t', header=None, index_col=index_col, usecols=cols_to_use, skiprows=skiplines, nrows=limit, quotechar='\x07') if ignore_quotes else pd.read_csv(sam_input, sep='\t', header=None, index_col=index_col, usecols=cols_to_use, skiprows=skiplines, nrows=limit)
+
+    return _sam_frame_to_seqtable(df, cleave_softclip, project_cigar, return_insertions)
+
+
+def read_bam(
+    input_file, region=None, index_file=None, use_header_as_index=True, cleave_softclip=False, project_cigar=False,
+    return_insertions=False, buffer_size=DEFAULT_BUFFER_SIZE, threads=None
+):
+    """
+        Load a BAM file into class SeqTable. Records are decoded from the BGZF blocks directly into uint8 arrays (4-bit packed bases and binary
+        qualities are unpacked using vectorized lookups), without converting the file to SAM text
+
+        Args:
+            input_file (str): path to the BAM file
+            region (str, default=None): only load reads overlapping this region, samtools format ('chr1', 'chr1:100-200', 1-based inclusive)
+
+                .. note:: index
+
+                    If a BAI index is found, then only the BGZF blocks listed in the index for the region are read. Otherwise the entire file is scanned
+
+            index_file (str, default=None): path to the BAI index. If None then looks for input_file + '.bai' or the same name ending with '.bai'
+            cleave_softclip (bool, default=False): see read_sam
+            project_cigar (bool, default=False): see read_sam
+            return_insertions (bool, default=False): see read_sam
+            threads (int, default=None): number of threads used to decompress BGZF blocks
+
+        Returns:
+            seqtable instance (and a dataframe of insertions if return_insertions is True)
+    """
+    buffers = iter_bgzf_buffers(input_file, buffer_size, threads)
+    data = b''
+    references, header_size = None, None
+    for chunk in buffers:
+        data += chunk
+        references, header_size = parse_bam_header(data)
+        if references is not None:
+            break
+    if references is None:
+        raise Exception('The BAM file is truncated, the header is incomplete')
+
+    blocks = []
+    region_bounds = parse_region(region, references) if region is not None else None
+    if index_file is None and region is not None:
+        for candidate in [input_file + '.bai', os.path.splitext(input_file)[0] + '.bai']:
+            if os.path.exists(candidate):
+                index_file = candidate
+                break
+
+    if region is not None and index_file is not None:
+        # only decompress the blocks that the index lists for this region
+        buffers.close()
+        ref_id, beg, end = region_bounds
+        for voffset_beg, voffset_end in region_chunks(read_bai(index_file)[ref_id], beg, end):
+            chunk = read_bgzf_virtual_range(input_file, voffset_beg, voffset_end, threads)
+            offsets, _ = bam_record_offsets(chunk)
+            blocks.append(decode_bam_records(chunk, offsets))
+    else:
+        if region is not None:
+            warnings.warn('No BAI index was found for {0}, the entire file will be scanned for reads in the region'.format(input_file))
+        start = header_size
+        while True:
+            offsets, consumed = bam_record_offsets(data, start)
+            blocks.append(decode_bam_records(data, offsets))
+            data = data[consumed:]
+            start = 0
+            try:
+                data += next(buffers)
+            except StopIteration:
+                break
+        if data:
+            raise Exception('The BAM file is truncated, the last record is incomplete')
+
+    records = concat_bam_records(blocks)
+    del blocks
+
+    if region_bounds is not None:
+        ref_id, beg, end = region_bounds
+        # positions are 1-based, region is 0-based half open
+        overlaps = (records['ref_id'] == ref_id) & (records['pos'] - 1 < end) & (records['pos'] - 1 + np.maximum(reference_lengths(records), 1) > beg)
+        records = filter_bam_records(records, overlaps)
+
+    index = read_names(records) if use_header_as_index else None
+    seq_lens = records['seq_lens']
+    offsets = np.cumsum(seq_lens) - seq_lens
+    read_idx, ops, lens = records['cigar']
+    num_reads = seq_lens.shape[0]
+
+    if project_cigar:
+        if np.unique(records['ref_id'][records['ref_id'] >= 0]).shape[0] > 1:
+            raise Exception('Reads are aligned to more than one reference. Use the region parameter to select a single reference before projecting reads onto reference coordinates')
+        projected = project_to_reference(
+            records['seqs'], offsets, records['quals'], offsets, records['pos'], read_idx, ops, lens, num_reads,
+            return_insertions=return_insertions, seq_lens=seq_lens
+        )
+        st = seqtable(projected[0], projected[1], start=projected[2], index=index, seqtype='NT')
+        if return_insertions:
+            return st, insertions_to_dataframe(projected[3], index if index is not None else np.arange(num_reads))
+        return st
+
     if cleave_softclip:
-        cols_to_use.append(5)
+        lead, trail = softclip_bounds(read_idx, ops, lens, num_reads, seq_lens)
+    else:
+        lead, trail = 0, 0
+    seqs = fill_matrix(records['seqs'], offsets + lead, seq_lens - lead - trail, 'N')
+    quals = fill_matrix(records['quals'], offsets + lead, seq_lens - lead - trail, '!')
+    return seqtable(seqs, quals, index=index, seqtype='NT')
+
+
+def _sam_frame_to_seqtable(df, cleave_softclip=False, project_cigar=False, return_insertions=False):
+    """
+        Convert the columns loaded from a SAM file into a seqtable
 
-    df = pd.read_csv(input_file, sep='\t', header=None, index_col=index_col, usecols=cols_to_use, skiprows=skiplines, quotechar='\x07') if ignore_quotes else pd.read_csv(input_file, sep='\t', header=None, index_col=index_col, usecols=cols_to_use, skiprows=skiplines)
+        .. important::Private function
 
+            This function is not for public use
+    """
     index = df.index
-    return seqtable(df[9], df[10], index=index, seq_type='NT')
+    if not (cleave_softclip or project_cigar):
+        return seqtable(df[9], df[10], index=index, seqtype='NT')
+
+    # a sequence of '*' means bases were not stored (e.g. secondary alignments)
+    seqs = np.array(df[9], dtype=object)
+    seqs[seqs == '*'] = ''
+    seq_buf, seq_offsets, seq_lens = strings_to_buffer(seqs)
+    # a quality of '*' means quality scores were not stored
+    quals = np.array(df[10], dtype=object)
+    missing = quals == '*'
+    if missing.any():
+        quals[missing] = ['!' * len(s) for s in seqs[missing]]
+    qual_buf, qual_offsets, qual_lens = strings_to_buffer(quals)
+    read_idx, ops, lens = parse_cigar_strings(df[5])
+
+    if project_cigar:
+        if df[2][df[2] != '*'].nunique() > 1:
+            raise Exception('Reads are aligned to more than one reference. Split the reads by reference before projecting them onto reference coordinates')
+        projected = project_to_reference(
+            seq_buf, seq_offsets, qual_buf, qual_offsets, df[3].values, read_idx, ops, lens, df.shape[0],
+            return_insertions=return_insertions, seq_lens=seq_lens
+        )
+        st = seqtable(projected[0], projected[1], start=projected[2], index=index, seqtype='NT')
+        if return_insertions:
+            return st, insertions_to_dataframe(projected[3], index)
+        return st
+
+    lead, trail = softclip_bounds(read_idx, ops, lens, df.shape[0], seq_lens)
+    seqs = fill_matrix(seq_buf, seq_offsets + lead, seq_lens - lead - trail, 'N')
+    quals = fill_matrix(qual_buf, qual_offsets + lead, np.maximum(qual_lens - lead - trail, 0), '!', width=seqs.shape[1])
+    return seqtable(seqs, quals, index=index, seqtype='NT')
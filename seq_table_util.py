@@ -31,8 +31,77 @@ dna_alphabet = list('ACTG') + sorted(list(set(sorted(degen_to_base.values())) -
 aa_alphabet = list('ACDEFGHIKLMNPQRSTVWYX*Z-.')
 
 
+def degenerate_consensus(base_counts, cutoffs, fillvalue='N'):
+    """
+        Returns the IUPAC code (seq_table_util.degen_to_base) of the fewest bases whose combined counts are greater than the cutoff at each position
+
+        Args:
+            base_counts (np array): 4 x positions. Counts of A, C, G and T at each position
+            cutoffs (np array): the combined counts of the bases must be greater than the cutoff
+            fillvalue (char, default='N'): letter used when all four bases together do not pass the cutoff
+
+        Returns:
+            np array uint8: ascii value of the IUPAC code at each position
+    """
+    lookup = np.full(16, ord(fillvalue), dtype=np.uint8)
+    for bases, code in degen_to_base.items():
+        lookup[sum(1 << 'ACGT'.index(b) for b in bases)] = ord(code)
+    # add bases from the most to the least frequent until the cutoff is passed
+    order = np.argsort(-base_counts, axis=0, kind='stable')
+    cumulative = np.cumsum(np.take_along_axis(base_counts, order, axis=0), axis=0)
+    num_bases = (cumulative <= cutoffs).sum(axis=0) + 1
+    bits = ((np.arange(4)[:, None] < num_bases) * (1 << order)).sum(axis=0)
+    consensus = lookup[bits]
+    consensus[cumulative[-1] <= cutoffs] = ord(fillvalue)
+    return consensus
+
+
+def weighted_percentile(values, weights, percentiles):
+    """
+        Returns the same result as np.percentile(np.repeat(values, weights), percentiles) without repeating the values (weights should be integers)
+    """
+    order = np.argsort(values, kind='stable')
+    values = values[order]
+    cum_weights = np.cumsum(weights[order])
+    # position of each percentile within the repeated values, and the value found at the positions before and after it
+    h = (cum_weights[-1] - 1) * np.asarray(percentiles, dtype=float) / 100.0
+    below = np.floor(h)
+    above = np.minimum(below + 1, cum_weights[-1] - 1)
+    v_below = values[np.searchsorted(cum_weights, below, side='right')].astype(float)
+    v_above = values[np.searchsorted(cum_weights, above, side='right')].astype(float)
+    return v_below + (h - below) * (v_above - v_below)
+
+
+def bincount_2d(arr, weights=None, num_values=None, chunk_rows=2 ** 12):
+    """
+        Count the occurrences of every value in every column of a 2D array of non-negative ints. Each value is combined with its column into a
+        single key (column * num_values + value) so that all columns are counted by one bincount per chunk of rows
+
+        Args:
+            arr (np array of ints): rows are sequences and columns are positions
+            weights (np array, default=None): weight of each row
+            num_values (int, default=None): values are between 0 and num_values - 1 (defaults to arr.max() + 1)
+            chunk_rows (int, default=4096): number of rows counted at a time. Small chunks keep the keys (and repeated weights) in cache
+
+        Returns:
+            counts (np array): rows are values, columns are the columns of arr. int64 unless weights are provided
+    """
+    (num_rows, num_cols) = arr.shape
+    if num_values is None:
+        num_values = int(arr.max()) + 1 if arr.size else 1
+    num_keys = num_cols * num_values
+    # use the smallest integer type that can hold every key
+    offsets = (np.arange(num_cols, dtype=np.int64) * num_values).astype(np.uint16 if num_keys <= 2 ** 16 else np.int64)
+    counts = np.zeros(num_keys, dtype=np.int64 if weights is None else np.float64)
+    for c in range(0, num_rows, chunk_rows):
+        keys = (arr[c:c + chunk_rows] + offsets).ravel()
+        w = None if weights is None else np.repeat(np.asarray(weights[c:c + chunk_rows], dtype=np.float64), num_cols)
+        counts += np.bincount(keys, weights=w, minlength=num_keys)
+    return counts.reshape(num_cols, num_values).T
+
+
 def get_quality_dist(
-    qual_df, bins='fastqc', percentiles=[10, 25, 50, 75, 90], exclude_null_quality=True, sample=None, plotly_sampledata_size=20,
+    qual_df, bins='fastqc', percentiles=[10, 25, 50, 75, 90], exclude_null_quality=True, sample=None, plotly_sampledata_size=20, weights=None
 ):
     """
         Returns the distribution of quality across the given sequence, similar to FASTQC quality seq report.
@@ -56,6 +125,8 @@ def get_quality_dist(
 
                     note the minimum value for a sampledata size is 10
 
+            weights (np array, default=None): number of reads represented by each row of qual_df (i.e. the counts of a collapsed seqtable)
+
         Returns:
             data (DataFrame): contains the distribution information at every bin (min value, max value, desired precentages and quartiles)
             graphs (plotly object): contains plotly graph objects for generating plots of the data afterwards
@@ -79,12 +150,72 @@ def get_quality_dist(
             # using outside of ipython
             >>> plotly.plot(graphs)
     """
-    from collections import OrderedDict
+    if sample and weights is not None:
+        # sample reads rather than rows
+        qual_df = qual_df.sample(sample, weights=weights, replace=True)
+        weights = None
+    elif sample:
+        qual_df = qual_df.sample(sample)
+
+    # quality scores are small integers so every bin is summarized from one histogram of the scores at each position
+    hist = quality_histogram(qual_df.values, weights)
+    return quality_dist_from_histogram(hist, qual_df.columns, bins, percentiles, exclude_null_quality, plotly_sampledata_size)
+
+
+def quality_histogram(qual_values, weights=None, num_values=94):
+    """
+        Count how many times each quality score is found at each position
+
+        Args:
+            qual_values (np array of ints): quality scores (rows are sequences, columns are positions)
+            weights (np array, default=None): number of reads represented by each row
+            num_values (int, default=94): number of quality scores (0-93 for phred+33). Increased if higher scores are found
+
+        Returns:
+            np array: quality scores x positions
+    """
+    num_values = max(num_values, int(qual_values.max()) + 1 if qual_values.size else 0)
+    return bincount_2d(qual_values, weights, num_values)
 
-    # current base positions in dataframe
-    col_names = set(qual_df.columns)
 
-    if bins is 'fastqc':
+def quality_dist_from_histogram(hist, columns, bins='fastqc', percentiles=[10, 25, 50, 75, 90], exclude_null_quality=True, plotly_sampledata_size=20):
+    """
+        Returns the same distribution as get_quality_dist using the number of times each quality score is found at each position (see quality_histogram)
+        instead of the quality scores. Percentiles and means are calculated exactly from the cumulative counts of each bin
+
+        Args:
+            hist (np array): quality scores x positions
+            columns (list): position of each column of hist
+            Other arguments are identical to get_quality_dist
+    """
+    binnames = _quality_bins(bins, columns)
+    col_lookup = {c: i for i, c in enumerate(columns)}
+    values = np.arange(hist.shape[0])
+
+    def bin_statistics(binned_cols, per):
+        sel_cols = [col_lookup[c] for c in range(binned_cols[0], binned_cols[1] + 1) if c in col_lookup]
+        counts = hist[:, sel_cols].sum(axis=1)
+        if exclude_null_quality:
+            counts[0] = 0
+        found = counts > 0
+        return (weighted_percentile(values[found], counts[found], per), (values * counts).sum() / counts.sum())
+
+    return _quality_dist_report(binnames, bin_statistics, percentiles, plotly_sampledata_size)
+
+
+def _quality_bins(bins, columns):
+    """
+        Returns the name and the (first position, last position) of each bin used by get_quality_dist. Bins that do not contain any of the columns
+        (i.e. fastqc bins past the end of the reads) are not reported
+
+        .. important::Private function
+
+            This function is not for public use
+    """
+    from collections import OrderedDict
+
+    columns = list(columns)
+    if isinstance(bins, str) and bins == 'fastqc':
         # use default bins as defined by fastqc report
         bins = [
             1, 2, 3, 4, 5, 6, 7, 8, 9,
@@ -92,31 +223,51 @@ def get_quality_dist(
             (65, 69), (70, 74), (80, 84), (85, 89), (90, 94), (95, 99),
             (100, 104), (105, 109), (110, 114), (115, 119), (120, 124), (125, 129), (130, 134), (135, 139), (140, 144), (145, 149), (150, 154), (155, 159), (160, 164), (165, 169), (170, 174), (175, 179), (180, 184), (185, 189), (190, 194), (195, 199),
             (200, 204), (205, 209), (210, 214), (215, 219), (220, 224), (225, 229), (230, 234), (235, 239), (240, 244), (245, 249), (250, 254), (255, 259), (260, 264), (265, 269), (270, 274), (275, 279), (280, 284), (285, 289), (290, 294), (295, 299),
-            (300, qual_df.shape[1])
+            (300, len(columns))
         ]
         bins = [x if isinstance(x, int) else (x[0], x[1]) for x in bins]
-    elif bins is 'even':
+    elif isinstance(bins, str) and bins == 'even':
         # create an equal set of 10 bins based on df shape
-        binsize = int(qual_df.shape[1] / 10)
+        binsize = int(len(columns) / 10)
         bins = []
-        for x in range(0, qual_df.shape[1], binsize):
-            c1 = qual_df.columns[x]
-            c2 = qual_df.columns[min(x + binsize - 1, qual_df.shape[1] - 1)]
+        for x in range(0, len(columns), binsize):
+            c1 = columns[x]
+            c2 = columns[min(x + binsize - 1, len(columns) - 1)]
             bins.append((c1, c2))
     else:
         # just in case its a generator (i.e. range function)
         # convert floats to ints, otherwise keep original
         bins = [int(x) if isinstance(x, float) else x for x in bins]
 
+    col_names = set(columns)
     binnames = OrderedDict()
     for b in bins:
         # create names for each bin
         if isinstance(b, int):
-            binnames[str(b)] = (b, b)
+            (name, b) = (str(b), (b, b))
         elif len(b) == 2:
-            binnames[str(b[0]) + '-' + str(b[1])] = (b[0], b[1])
+            name = str(b[0]) + '-' + str(b[1])
+        else:
+            continue
+        if col_names & set(range(b[0], b[1] + 1)):
+            binnames[name] = (b[0], b[1])
+    return binnames
+
+
+def _quality_dist_report(binnames, bin_statistics, percentiles, plotly_sampledata_size):
+    """
+        Create the output of get_quality_dist
+
+        .. important::Private function
 
-    temp = qual_df.sample(sample) if sample else qual_df
+            This function is not for public use
+
+        Args:
+            binnames (OrderedDict): output of _quality_bins
+            bin_statistics (function): takes the (first position, last position) of a bin and a list of percentiles and returns the value of each
+                percentile and the mean quality within the bin
+    """
+    from collections import OrderedDict
 
     # define the quantile percentages we will return for each quality bin
     percentiles = [round(p, 0) for p in percentiles]
@@ -124,7 +275,6 @@ def get_quality_dist(
     # ensure that the following percentiles will ALWAYS be present
     program_required = [0, 10, 25, 50, 75, 90, 100]
     to_add_manually = set(program_required) - set(per)
-    program_added_values = {f: str(int(f)) + '%' for f in to_add_manually}
     # update percentil list
     per = sorted(per + list(to_add_manually))
 
@@ -132,24 +282,11 @@ def get_quality_dist(
     binned_data = OrderedDict()
     graphs = []  # for storing plotly graphs
 
-    plotlychosendata = pd.DataFrame(0, index=list(binnames.keys()), columns=['min', 'max', 'mean', 'median'])
+    plotlychosendata = pd.DataFrame(0.0, index=list(binnames.keys()), columns=['min', 'max', 'mean', 'median'])
 
     for name, binned_cols in binnames.items():
-        if isinstance(binned_cols, int):
-            # not binning together multiple positions in sequence
-            binned_cols = (binned_cols, binned_cols)
-        # create a list of all column/base positions listed within this bin
-        set_cols = set(list(range(binned_cols[0], binned_cols[1] + 1)))
-        # identify columns in dataframe that intersect with columns listed above
-        sel_cols = list(col_names & set_cols)
-        # select qualities within bin, unwind list into a single list
-        bin_qual = temp[sel_cols].values.ravel()
-        if exclude_null_quality:
-            quantile_res = np.percentile(bin_qual[bin_qual > 0], per)
-            plotlychosendata.loc[name, 'mean'] = bin_qual[bin_qual > 0].mean()
-        else:
-            quantile_res = np.percentile(bin_qual, per)
-            plotlychosendata.loc[name, 'mean'] = bin_qual.mean()
+        (quantile_res, mean) = bin_statistics(binned_cols, per)
+        plotlychosendata.loc[name, 'mean'] = mean
 
         storevals = []
         userchosen = {}
@@ -4,40 +4,82 @@ and accessing specific positions of an aligned sequence**
 """
 
 import gc
+import os
 import copy
+import json
+import time
 import warnings
 import pandas as pd
 import math
 import numpy as np
-import itertools
 from collections import defaultdict
 
 # from collections import defaultdict
 from .seq_logo import draw_seqlogo_barplots, get_bits, get_plogo, shannon_info, relative_entropy
-from .seq_table_util import get_quality_dist  # , degen_to_base, dna_alphabet, aa_alphabet
+from .seq_table_util import get_quality_dist, bincount_2d, degenerate_consensus  # , degen_to_base, dna_alphabet, aa_alphabet
+from .storage_util import write_arrays, read_arrays, pack_strings, unpack_strings
+from .substring_util import count_kmers, count_gapped_substrings, encode_letters
+from .covariation_util import joint_counts, mutual_information
 
 
 def strseries_to_bytearray(series, fillvalue, use_encoded_value=True, encoding='utf-8'):
-    max_len = series.apply(len).max()
-    if use_encoded_value:
-        series = series.apply(lambda x: x.decode().ljust(max_len, fillvalue).encode(encoding))
+    """
+    Convert a list of strings (str or bytes) into a table of ascii values. Shorter strings are padded with fillvalue
+
+    Strings are copied into a fixed width numpy bytes array in a single call and padding is applied to the resulting uint8 table,
+    so no python code is run for each string
+
+    Returns:
+        series (np array of bytes, or str if use_encoded_value is False): the padded strings (a view of seq_as_int)
+        seq_as_int (np array uint8): rows are strings, columns are positions
+    """
+    values = series.values if isinstance(series, pd.Series) else series
+    try:
+        fixed_width = np.asarray(values, dtype='S')
+    except UnicodeEncodeError:
+        fixed_width = np.char.encode(np.asarray(values, dtype='U'), encoding)
+    fixed_width = fixed_width.reshape(-1)
+    if fixed_width.dtype.itemsize == 0 or fixed_width.shape[0] == 0:
+        return (fixed_width, np.zeros((fixed_width.shape[0], 0), dtype=np.uint8))
+    seq_as_int = fixed_width.view(np.uint8).reshape(fixed_width.shape[0], -1)
+    # numpy pads shorter strings with null bytes
+    seq_as_int[seq_as_int == 0] = ord(fillvalue)
+    (padded, seq_as_int) = bytearray_to_strseries(seq_as_int, use_encoded_value)
+    return (padded, seq_as_int)
+
+
+def is_uint8_matrix(data):
+    """
+    Returns True if data is a 2D numpy array of uint8 values (rows are sequences, columns are ascii values at each position)
+    """
+    return isinstance(data, np.ndarray) and data.dtype == np.uint8 and len(data.shape) == 2
+
+
+def bytearray_to_strseries(arr, use_encoded_value=True):
+    """
+    Opposite of strseries_to_bytearray: converts a 2D uint8 array into a list of strings while using the array itself as the table
+    """
+    arr = np.ascontiguousarray(arr)
+    if arr.shape[1] == 0:
+        series = np.array([b''] * arr.shape[0], dtype='S')
     else:
-        series = series.apply(lambda x: x.decode().ljust(max_len, fillvalue))
-    seq_as_int = np.array(list(series), dtype='S').view('S1').reshape((series.size, -1)).view('uint8')
-    return (series, seq_as_int)
+        series = arr.view('S' + str(arr.shape[1])).ravel()
+    if use_encoded_value is False:
+        series = series.astype('U')
+    return (series, arr)
 
 
 def pandas_value_counts(df):
     """
     Simply apply the value_counts function to every column in a dataframe
     """
-    return df.apply(pd.value_counts).fillna(0)
+    return df.apply(lambda column: column.value_counts()).fillna(0)
 
 
 def numpy_value_counts_bin_count(arr, weights=None):
     """
     Use the 'bin count' function in numpy to calculate the unique values in every column of a dataframe
-    clocked at about 3-4x faster than pandas_value_counts (df.apply(pd.value_counts))
+    All columns are counted in a single pass using bincount_2d (about 2-3x faster than a bincount per column followed by pd.concat)
 
     Args:
         arr (dataframe, or np array): Should represent rows as sequences and columns as positions. All values should be int
@@ -51,23 +93,280 @@ def numpy_value_counts_bin_count(arr, weights=None):
         # its a ONE D array, lets make it two D
         arr = arr.reshape(-1, 1)
 
-    bins = [np.bincount(arr[:, x], weights=weights) for x in range(arr.shape[1])]  # returns an array of length equal to the the max value in array + 1. each element represents number of times an integer appeared in array.
-    indices = [np.nonzero(x)[0] for x in bins]  # only look at non zero bins
-    series = [pd.Series(y[x], index=x) for (x, y) in zip(indices, bins)]
-    return pd.concat(series, axis=1).fillna(0)
+    counts = bincount_2d(arr, weights)
+    indices = np.flatnonzero(counts.any(axis=1))  # only keep values that appear in at least one column
+    return pd.DataFrame(counts[indices], index=indices)
+
+
+def custom_numpy_count(df, weights=None, chunk_rows=255 * 64):
+    """
+    count all unique members in a numpy array and then using unique values, count occurrences at each position (one comparison per unique value)
+    Without weights, comparisons are summed as uint8 over blocks of 255 rows, which makes this the fastest method for small alphabets (i.e. nucleotides)
+    """
+    val = df.values if isinstance(df, pd.DataFrame) else df
+    if len(val.shape) == 1:
+        val = val.reshape(-1, 1)
+    if weights is None:
+        # find the unique values in a sample of rows, and only look at every row if the sample missed a value (the counts of every column
+        # must then add up to exactly the number of rows)
+        un = np.unique(val[::max(1, val.shape[0] // 4096)])
+        counts = _compare_counts(val, un, weights, chunk_rows)
+        if (counts.sum(axis=0) != val.shape[0]).any():
+            un = _unique_values(val)
+            counts = _compare_counts(val, un, weights, chunk_rows)
+    else:
+        # sums of weights cannot show that a value is missing, so the values are found using every row
+        un = _unique_values(val)
+        counts = _compare_counts(val, un, weights, chunk_rows)
+    return pd.DataFrame(counts, index=un)
+
+
+def _unique_values(val):
+    """
+    Sorted unique values of an array (a bincount rather than a sort for small unsigned ints such as ascii values)
+    """
+    if val.dtype in (np.uint8, np.uint16):
+        return np.flatnonzero(np.bincount(val.ravel(), minlength=1)).astype(val.dtype)
+    return np.unique(val)
+
+
+def _compare_counts(val, values, weights=None, chunk_rows=255 * 64):
+    """
+    Count the occurrences of each value in values at every column of val by comparing each chunk of rows to each value
+    """
+    counts = np.zeros((values.shape[0], val.shape[1]), dtype=np.int64 if weights is None else np.float64)
+    for c in range(0, val.shape[0], chunk_rows):
+        chunk = val[c:c + chunk_rows]
+        full_blocks = (chunk.shape[0] // 255) * 255
+        for i, u in enumerate(values):
+            if weights is None:
+                # a block of 255 rows cannot overflow a uint8
+                equal = (chunk == u).view(np.uint8)
+                counts[i] += equal[:full_blocks].reshape(-1, 255, equal.shape[1]).sum(axis=1, dtype=np.uint8).sum(axis=0, dtype=np.int64)
+                counts[i] += equal[full_blocks:].sum(axis=0, dtype=np.int64)
+            else:
+                counts[i] += np.asarray(weights[c:c + chunk_rows], dtype=np.float64) @ (chunk == u)
+    return counts
+
+
+COUNT_METHODS = {
+    'pandas': pandas_value_counts,
+    'bincount': numpy_value_counts_bin_count,
+    'compare': custom_numpy_count
+}
+
+COUNT_CALIBRATION_FILE = os.environ.get(
+    'SEQTABLES_COUNT_CALIBRATION', os.path.join(os.path.expanduser('~'), '.cache', 'seqtables', 'count_calibration.json')
+)
+
+# increase when a method in COUNT_METHODS changes so that cached calibrations are not used
+COUNT_CALIBRATION_VERSION = 3
+
+# tables with fewer cells are always counted with bincount (every method takes less than a millisecond)
+MIN_CELLS_TO_DISPATCH = 2 ** 16
+
+# cost models (seconds, see _count_features) used until calibrate_count_methods is run on this machine
+DEFAULT_COUNT_MODELS = {
+    'pandas': [1e-3, 3.3e-4, 5e-9, 0.0],
+    'bincount': [1.7e-4, 0.0, 2.4e-9, 0.0],
+    'compare': [8.5e-3, 0.0, 2.5e-10, 4.8e-10]
+}
+
+_count_models = None
+
+
+def _count_features(num_rows, num_cols, num_values):
+    """
+    Terms of the linear cost model of a counting method: fixed overhead, per column overhead, per cell and per cell per distinct value
+    """
+    cells = float(num_rows) * num_cols
+    return np.array([1.0, float(num_cols), cells, cells * num_values])
+
+
+def _run_count_method(method, arr, weights=None):
+    """
+    Count values in every column of arr using one of COUNT_METHODS and return the result in the format of numpy_value_counts_bin_count
+    (rows are values found in arr, columns are 0..arr.shape[1] - 1)
+    """
+    if method == 'bincount':
+        return numpy_value_counts_bin_count(arr, weights)
+    if method == 'pandas':
+        if weights is not None:
+            raise Exception('pandas_value_counts does not support weights')
+        dist = pandas_value_counts(pd.DataFrame(arr, copy=False))
+    else:
+        dist = COUNT_METHODS[method](arr, weights)
+    dist = dist.fillna(0).sort_index()
+    dist.index = dist.index.astype(np.int64)
+    dist.columns = range(arr.shape[1])
+    dist = dist.loc[(dist.values != 0).any(axis=1)]
+    return dist.astype(np.int64) if weights is None else dist.astype(np.float64)
+
+
+def calibrate_count_methods(path=COUNT_CALIBRATION_FILE, repeats=3):
+    """
+    Time each method in COUNT_METHODS on a few small random tables and fit a linear cost model (see _count_features) for each method.
+    Calibration is never run automatically: until it is run (or a saved calibration is found in COUNT_CALIBRATION_FILE), DEFAULT_COUNT_MODELS are used.
+    Every method returns identical counts, so the calibration only changes the speed of value_counts
+
+    Args:
+        path (str, default=COUNT_CALIBRATION_FILE): where the models are saved. If None, models are only used for this session
+        repeats (int, default=3): the fastest of repeats runs is used for each table
+
+    Returns:
+        models (dict): method name -> coefficients
+    """
+    global _count_models
+    # a private generator so that the random state of the caller is not changed
+    rng = np.random.default_rng(0)
+    shapes = [(r, c, k) for r in [1024, 65536] for c in [8, 64] for k in [4, 24]]
+    features = np.array([_count_features(r, c, k) for (r, c, k) in shapes])
+    timings = defaultdict(list)
+    for (r, c, k) in shapes:
+        arr = rng.integers(65, 65 + k, (r, c), dtype=np.uint8)
+        for method in COUNT_METHODS:
+            elapsed = []
+            for _ in range(repeats):
+                t = time.perf_counter()
+                _run_count_method(method, arr)
+                elapsed.append(time.perf_counter() - t)
+            timings[method].append(min(elapsed))
+    models = {}
+    for method, t in timings.items():
+        coefficients = np.linalg.lstsq(features, np.array(t), rcond=None)[0]
+        models[method] = [max(float(c), 0.0) for c in coefficients]
+    _count_models = {'version': COUNT_CALIBRATION_VERSION, 'numpy_version': np.__version__, 'pandas_version': pd.__version__, 'models': models}
+    if path is not None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as w:
+            json.dump(_count_models, w)
+    return models
+
+
+def _get_count_models():
+    """
+    Return the cost models of each counting method: from memory, else from COUNT_CALIBRATION_FILE, else DEFAULT_COUNT_MODELS
+    """
+    global _count_models
+    if _count_models is None:
+        _count_models = {'models': DEFAULT_COUNT_MODELS}
+        try:
+            with open(COUNT_CALIBRATION_FILE) as r:
+                cached = json.load(r)
+            if (cached.get('version'), cached['numpy_version'], cached['pandas_version']) == (COUNT_CALIBRATION_VERSION, np.__version__, pd.__version__):
+                _count_models = cached
+        except (OSError, ValueError, KeyError):
+            pass
+    return _count_models['models']
+
+
+def choose_count_method(num_rows, num_cols, num_values, weighted=False):
+    """
+    Returns the name of the method in COUNT_METHODS that is predicted to be the fastest for a table of the provided shape
+
+    Args:
+        num_rows (int): number of sequences
+        num_cols (int): number of positions
+        num_values (int): number of distinct letters
+        weighted (bool): whether weights are used. Weighted counts are always calculated with bincount because sums of float weights
+            depend on the order in which they are added, and the result should not depend on the method that was chosen
+    """
+    if weighted or float(num_rows) * num_cols < MIN_CELLS_TO_DISPATCH:
+        return 'bincount'
+    features = _count_features(num_rows, num_cols, num_values)
+    predicted = {method: features.dot(coefficients) for method, coefficients in _get_count_models().items()}
+    return min(predicted, key=predicted.get)
+
+
+def value_counts(arr, weights=None, method='auto'):
+    """
+    Count the occurrences of every value in every column of a table, using the counting method predicted to be the fastest for its shape (see choose_count_method)
+
+    Args:
+        arr (dataframe, or np array): rows are sequences and columns are positions. All values should be int
+        weights (np array, default=None): weight of each row
+        method (str, default='auto'): 'auto' or a key of COUNT_METHODS
+
+    Returns:
+        dataframe in the format of numpy_value_counts_bin_count
+    """
+    if isinstance(arr, pd.DataFrame):
+        arr = arr.values
+    if len(arr.shape) == 1:
+        arr = arr.reshape(-1, 1)
+    if method == 'auto':
+        # estimate the number of distinct values from about 4096 evenly spaced rows
+        num_values = np.count_nonzero(np.bincount(arr[::max(1, arr.shape[0] // 4096)].ravel())) if arr.size else 0
+        method = choose_count_method(arr.shape[0], arr.shape[1], num_values, weights is not None)
+    return _run_count_method(method, arr, weights)
+
 
+def format_seq_dist(dist, column_names, method, ignore_characters, seqtype, num_reads):
+    """
+    Convert a table of counts (rows are ascii values, columns are positions) into the output of seqtable.get_seq_dist
 
-def custom_numpy_count(df, weights=None):
+    Args:
+        dist (dataframe): counts of each letter (rows) at each position (columns)
+        column_names (list): name of each position
+        method ('counts', 'freq' or 'bits'): see seqtable.get_seq_dist
+        ignore_characters (list of chars): letters that are not reported
+        seqtype ('NT' or 'AA'): used by get_bits
+        num_reads (int): number of reads (used by get_bits for the small sample correction)
+    """
+    dist.rename({c: chr(c) for c in list(dist.index)}, inplace=True)
+    drop_values = list(set(ignore_characters) & set(list(dist.index)))
+    dist = dist.drop(drop_values, axis=0)
+    if method == 'freq':
+        dist = dist.astype(float) / dist.sum(axis=0)
+    elif method == 'bits':
+        dist = get_bits(dist.astype(float) / dist.sum(axis=0), seqtype, num_reads)
+    dist.rename(columns={old: new for (old, new) in zip(dist.columns, column_names)}, inplace=True)
+    return dist.fillna(0)
+
+
+def _as_slice(positions):
     """
-    count all unique members in a numpy array and then using unique values, count occurrences at each position
-    This is by far the slowest method (seconds rather than tenths of seconds)
+    Convert an array of positions into a slice if the positions are consecutive (slices of a DataFrame share memory with the original)
+    """
+    if positions.shape[0] == 0:
+        return slice(0, 0)
+    if positions[0] >= 0 and (positions.shape[0] == 1 or (np.diff(positions) == 1).all()):
+        return slice(int(positions[0]), int(positions[-1]) + 1)
+    return positions
+
+
+def _axis_positions(labels, key, method):
+    """
+    Convert the key used to select rows or columns (loc, iloc or ix) into a slice or an array of integer positions
+
+    Args:
+        labels (pd.Index): index or columns of the table
+        key: the key passed to loc/iloc/ix for this axis
+        method (str): 'loc', 'iloc' or 'ix' (treated as loc)
     """
-    val = df.values
-    un = np.unique(val.reshape(-1))
-    if weights:
-        pass
-    r = {u: np.einsum('i, ij->j', weights, (val == u)) if weights is not None else np.einsum('ij->j', (val == u).astype(int)) for u in un}
-    return pd.DataFrame(r).transpose()
+    if isinstance(key, slice):
+        if method == 'iloc':
+            return key
+        return labels.slice_indexer(key.start, key.stop, key.step)
+    if np.isscalar(key):
+        # a single row/column is returned as a table with one row/column
+        if method == 'iloc':
+            return _as_slice(np.arange(labels.shape[0])[[key]])
+        position = labels.get_loc(key)
+        if not isinstance(position, (int, np.integer)):
+            raise KeyError(key)
+        return slice(position, position + 1)
+    key = np.asarray(key)
+    if key.dtype == bool:
+        if key.shape[0] != labels.shape[0]:
+            raise IndexError('Boolean index has wrong length: {0} instead of {1}'.format(key.shape[0], labels.shape[0]))
+        return _as_slice(np.flatnonzero(key))
+    if method == 'iloc':
+        return _as_slice(key.astype(np.int64))
+    positions = labels.get_indexer(key)
+    if (positions < 0).any():
+        raise KeyError('The following labels were not found: {0}'.format(list(key[positions < 0])))
+    return _as_slice(positions)
 
 
 class seqtable():
@@ -96,8 +395,15 @@ class seqtable():
 
     Attributes:
         seq_df (Dataframe): Each row in the dataframe is a sequence. It will always contain a 'seqs' column representing the sequences past in. Optionally it will also contain a 'quals' column representing quality scores
+
+            .. note::Lazy attribute
+
+                Sequences are only stored once, as a uint8 matrix in seq_table (and qual_table). seq_df is built from the tables the first time it is accessed
         seq_table (Dataframe): Dataframe representing sequences as characters in a table. Each row in the dataframe is a sequence. Each column represents the position of a base/residue within the sequence. The 4th position of sequence 2 is found as seq_table.ix[1, 4]
         qual_table (Dataframe, optional): Dataframe representing the quality score for each character in seq_table
+        counts (Series, optional): Number of reads represented by each row (see collapse). When defined, statistics treat each row as counts reads
+        mate_columns (dict, optional): For paired reads stored in a single table (see read_sequences.read_fastq_paired), the columns belonging to each mate
+            ({'R1': [...], 'R2': [...]}). Kept (restricted to the selected columns) by every slice of the table
 
     Examples:
         >>> sq = seq_tables.seqtable(['AAA', 'ACT', 'ACA'])
@@ -106,7 +412,7 @@ class seqtable():
     """
     def __init__(
         self, seqdata=None, qualitydata=None, start=1, index=None,
-        seqtype='NT', phred_adjust=33, null_qual='!', encode_letters=True, encoding='utf-8', **kwargs
+        seqtype='NT', phred_adjust=33, null_qual='!', encode_letters=True, encoding='utf-8', mate_columns=None, **kwargs
     ):
         self.null_qual = null_qual
         self.start = start
@@ -119,6 +425,9 @@ class seqtable():
         self.iloc = seqtable_indexer(self, 'iloc')
         self.ix = seqtable_indexer(self, 'ix')
         self.encoding_setting = (encode_letters, encoding)
+        self._seq_df = None
+        self.counts = None
+        self.mate_columns = mate_columns
         if seqdata is not None:
             self.index = index
             self._seq_to_table(seqdata)
@@ -127,54 +436,141 @@ class seqtable():
                 self.qual_to_table(qualitydata, phred_adjust, return_table=False)
 
     def __len__(self):
-        return self.seq_list.shape[0]
+        return self.seq_table.shape[0]
+
+    @property
+    def seq_df(self):
+        if self._seq_df is None and getattr(self, 'seq_table', None) is not None:
+            self._seq_df = self._build_seq_df()
+        return self._seq_df
+
+    @seq_df.setter
+    def seq_df(self, value):
+        self._seq_df = value
+
+    def _build_seq_df(self):
+        """
+            Create the full length strings in seq_df from seq_table and qual_table
+
+            .. important::Private function
+
+                This function is not for public use
+        """
+        (seq_list, _) = bytearray_to_strseries(self.seq_table.values, self.encoding_setting[0])
+        seq_df = pd.DataFrame({'seqs': list(seq_list)}, index=self.seq_table.index, columns=['seqs'])
+        if self.qual_table is not None:
+            (qual_list, _) = bytearray_to_strseries((self.qual_table.values + self.phred_adjust).astype(np.uint8), self.encoding_setting[0])
+            seq_df['quals'] = list(qual_list)
+        return seq_df
 
     def slice_object(self, method, params):
+        """
+            Select rows and positions (loc, iloc and ix). The new seqtable is a view: consecutive rows and positions share memory with this table
+            (pandas copy-on-write), and seq_df is only rebuilt when it is accessed
+        """
+        (row_params, col_params) = params if isinstance(params, tuple) else (params, slice(None))
+        try:
+            rows = _axis_positions(self.seq_table.index, row_params, method)
+            cols = _axis_positions(self.seq_table.columns, col_params, method)
+        except (KeyError, IndexError, TypeError, ValueError, pd.errors.InvalidIndexError):
+            # let pandas handle anything that cannot be converted to positions (i.e. duplicate labels, callables)
+            return self._slice_object_pandas(method, params)
+        return self._view(rows, cols)
+
+    def _view(self, rows, cols):
+        """
+            Create a new seqtable from the provided positions (slices or arrays of ints) of seq_table and qual_table
+
+            .. important::Private function
+
+                This function is not for public use
+        """
+        new_member = seqtable(
+            seqtype=self.seqtype, start=self.start, phred_adjust=self.phred_adjust, null_qual=self.null_qual,
+            encode_letters=self.encoding_setting[0], encoding=self.encoding_setting[1]
+        )
+        new_member.seq_table = self.seq_table.iloc[rows, cols]
+        new_member.qual_table = self.qual_table.iloc[rows, cols] if self.qual_table is not None else None
+        new_member.index = new_member.seq_table.index
+        if self.counts is not None:
+            new_member.counts = self.counts.iloc[rows]
+        if self._seq_df is not None and isinstance(cols, slice) and cols == slice(None):
+            new_member.seq_df = self._seq_df.iloc[rows]
+        self._copy_mate_columns(new_member)
+        return new_member
+
+    def _copy_mate_columns(self, new_member):
+        """
+            Keep the columns of each mate that are still present in a table created from this table
+
+            .. important::Private function
+
+                This function is not for public use
+        """
+        if self.mate_columns is not None:
+            kept = set(new_member.seq_table.columns)
+            new_member.mate_columns = {mate: [c for c in columns if c in kept] for mate, columns in self.mate_columns.items()}
+
+    def _slice_object_pandas(self, method, params):
+        """
+            Select rows and positions by applying loc, iloc or ix directly to each table
+
+            .. important::Private function
+
+                This function is not for public use
+        """
         if method == 'loc':
             seq_table = self.seq_table.loc[params]
             qual_table = self.qual_table.loc[params] if self.qual_table is not None else None
-            seq_df = self.seq_df.loc[params]
+            seq_df = self._seq_df.loc[params] if self._seq_df is not None else None
         elif method == 'iloc':
             seq_table = self.seq_table.iloc[params]
             qual_table = self.qual_table.iloc[params] if self.qual_table is not None else None
-            seq_df = self.seq_df.iloc[params]
+            seq_df = self._seq_df.iloc[params] if self._seq_df is not None else None
         elif method == 'ix':
             seq_table = self.seq_table.ix[params]
             qual_table = self.qual_table.ix[params] if self.qual_table is not None else None
-            seq_df = self.seq_df.ix[params]
+            seq_df = self._seq_df.ix[params] if self._seq_df is not None else None
         if isinstance(seq_table, pd.Series):
             seq_table = pd.DataFrame(seq_table)
         if isinstance(qual_table, pd.Series):
             qual_table = pd.DataFrame(qual_table)
-        if isinstance(seq_table, pd.Series):
-            seq_table = pd.DataFrame(seq_table)
+        if isinstance(seq_df, pd.Series):
+            seq_df = pd.DataFrame(seq_df)
         try:
             return self.copy_using_template(seq_table, seq_df, qual_table)
         except:
             if isinstance(qual_table, pd.DataFrame):
-                return self.copy_using_template(seq_table.transpose(), seq_df.transpose(), qual_table.transpose())
+                return self.copy_using_template(seq_table.transpose(), seq_df.transpose() if seq_df is not None else None, qual_table.transpose())
             else:
-                return self.copy_using_template(seq_table.transpose(), seq_df.transpose(), None)
+                return self.copy_using_template(seq_table.transpose(), seq_df.transpose() if seq_df is not None else None, None)
 
     def __getitem__(self, key):
-        seq_table = self.seq_table.__getitem__(key)
-        return self.copy_using_template(seq_table)
+        try:
+            cols = _axis_positions(self.seq_table.columns, key, 'loc')
+        except (KeyError, IndexError, TypeError, ValueError, pd.errors.InvalidIndexError):
+            seq_table = self.seq_table.__getitem__(key)
+            return self.copy_using_template(seq_table)
+        return self._view(slice(None), cols)
 
     def copy_using_template(self, template, template_seqdf=None, template_qual=None):
-        new_member = seqtable(seqtype=self.seqtype, phred_adjust=self.phred_adjust, null_qual=self.null_qual)
+        new_member = seqtable(
+            seqtype=self.seqtype, start=self.start, phred_adjust=self.phred_adjust, null_qual=self.null_qual,
+            encode_letters=self.encoding_setting[0], encoding=self.encoding_setting[1]
+        )
         if template_qual is None and self.qual_table is not None:
             qual_table = self.qual_table.loc[template.index, template.columns]
         else:
             qual_table = template_qual
-        if template_seqdf is None:
-            self.slice_sequences(template.columns)
-            seqs = self.slice_sequences(template.columns).loc[template.index]
-        else:
-            seqs = template_seqdf
-        new_member.seq_df = seqs
+        # seq_df is rebuilt from the new tables when it is needed, unless the strings were already sliced for the same rows and positions
+        if template_seqdf is not None and list(template.columns) == list(self.seq_table.columns):
+            new_member.seq_df = template_seqdf
         new_member.seq_table = template
         new_member.qual_table = qual_table
         new_member.index = template.index
+        if self.counts is not None:
+            new_member.counts = self.counts.loc[template.index]
+        self._copy_mate_columns(new_member)
         return new_member
 
     def view_bases(self, as_dataframe=False, side_by_side=False, num_base_show=10):
@@ -184,6 +580,10 @@ class seqtable():
     def shape(self):
         return self.seq_table.shape
 
+    @property
+    def columns(self):
+        return self.seq_table.columns
+
     def __repr__(self):
         return self.seq_df.__repr__()
 
@@ -193,6 +593,134 @@ class seqtable():
     def copy(self):
         return copy.deepcopy(self)
 
+    def save(self, path):
+        """
+            Store the seqtable in a single binary file. seq_table and qual_table are written as raw uint8 arrays so that they can be memory mapped by seqtable.load
+
+            Args:
+                path (str): output file
+
+            Examples:
+                >>> st = read_fastq('run.fastq')
+                >>> st.save('run.seqtable')
+                >>> st = seqtable.load('run.seqtable')
+        """
+        index = self.seq_table.index
+        arrays = {
+            'seq_table': self.seq_table.values,
+            'qual_table': self.qual_table.values if self.qual_table is not None else None,
+            'counts': self.counts.values if self.counts is not None else None
+        }
+        if isinstance(index, pd.RangeIndex):
+            index_info = {'type': 'range', 'start': int(index.start), 'stop': int(index.stop), 'step': int(index.step)}
+        elif pd.api.types.is_integer_dtype(index.dtype):
+            index_info = {'type': 'int'}
+            arrays['index'] = np.asarray(index, dtype=np.int64)
+        else:
+            # names are joined into a single buffer so that they can be split again with one call when the table is loaded
+            is_bytes = len(index) > 0 and isinstance(index[0], bytes)
+            index_info = {'type': 'bytes' if is_bytes else 'str'}
+            arrays['index'], arrays['index_lengths'] = pack_strings(index.tolist() if is_bytes else index.astype(str).tolist())
+        metadata = {
+            'seqtype': self.seqtype,
+            'start': self.start,
+            'phred_adjust': self.phred_adjust,
+            'null_qual': self.null_qual,
+            'encoding_setting': list(self.encoding_setting),
+            'columns': [int(c) for c in self.seq_table.columns],
+            'index': index_info,
+            'mate_columns': {mate: [int(c) for c in columns] for mate, columns in self.mate_columns.items()} if self.mate_columns is not None else None
+        }
+        write_arrays(path, arrays, metadata)
+
+    @staticmethod
+    def load(path, mmap=True, load_index=True):
+        """
+            Load a seqtable created by seqtable.save
+
+            Args:
+                path (str): file created by seqtable.save
+                mmap (bool, default=True): If True, seq_table and qual_table are copy-on-write memory maps of the file (np.memmap). Loading is
+                    nearly instant and data is only read from disk when it is used. Changes to the tables are never written back to the file
+                load_index (bool, default=True): If False, rows are labelled by their position instead of the stored index. Read names are
+                    the only part of the file that has to be converted into python objects, so this avoids creating one string per read
+
+            Returns:
+                seqtable instance
+        """
+        arrays, metadata = read_arrays(path, mmap)
+        index_info = metadata['index']
+        if index_info['type'] == 'range':
+            index = pd.RangeIndex(index_info['start'], index_info['stop'], index_info['step'])
+        elif not load_index:
+            index = pd.RangeIndex(arrays['seq_table'].shape[0])
+        elif index_info['type'] == 'int':
+            index = pd.Index(arrays['index'])
+        else:
+            index = pd.Index(unpack_strings(arrays['index'], arrays['index_lengths'], decode=index_info['type'] == 'str'))
+
+        new_member = seqtable(
+            seqtype=metadata['seqtype'], start=metadata['start'], phred_adjust=metadata['phred_adjust'], null_qual=metadata['null_qual'],
+            encode_letters=metadata['encoding_setting'][0], encoding=metadata['encoding_setting'][1]
+        )
+        columns = metadata['columns']
+        new_member.index = index
+        new_member.seq_table = pd.DataFrame(arrays['seq_table'], index=index, columns=columns, copy=False)
+        if 'qual_table' in arrays:
+            new_member.qual_table = pd.DataFrame(arrays['qual_table'], index=index, columns=columns, copy=False)
+        else:
+            new_member.qual_table = None
+        if 'counts' in arrays:
+            new_member.counts = pd.Series(arrays['counts'], index=index, name='counts')
+        new_member.mate_columns = metadata.get('mate_columns')
+        return new_member
+
+    def collapse(self):
+        """
+            Returns a new seqtable containing every unique sequence once. The number of reads represented by each row is stored in the counts attribute
+            and is used as the weight of each row by get_seq_dist, mutation_profile, get_consensus, get_substrings, pos_entropy and get_quality_dist
+
+            The quality at each position of a unique sequence is the mean quality of its reads (rounded to the nearest integer). Rows are sorted
+            from most to least abundant. Collapsing a table that is already collapsed adds together the counts of rows that become identical
+            (i.e. after selecting a subset of positions)
+
+            Returns:
+                seqtable Object
+
+            Examples:
+                >>> st = read_fastq('amplicons.fastq').collapse()
+                >>> st.counts.head()
+                >>> st.get_seq_dist()
+        """
+        seqs = np.ascontiguousarray(self.seq_table.values)
+        weights = self.counts.values if self.counts is not None else np.ones(seqs.shape[0], dtype=np.int64)
+        keys = seqs.view('V{0}'.format(seqs.shape[1])).ravel() if seqs.shape[1] else np.zeros(seqs.shape[0], dtype=np.uint8)
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        inverse = inverse.ravel()
+        counts = np.bincount(inverse, weights=weights, minlength=first.shape[0])
+        if np.issubdtype(weights.dtype, np.integer):
+            counts = counts.astype(np.int64)
+        # most abundant sequences first (ties are kept in the order they appear in the table)
+        order = np.lexsort((first, -counts))
+        index = pd.RangeIndex(order.shape[0])
+
+        new_member = seqtable(
+            seqtype=self.seqtype, start=self.start, phred_adjust=self.phred_adjust, null_qual=self.null_qual,
+            encode_letters=self.encoding_setting[0], encoding=self.encoding_setting[1]
+        )
+        new_member.index = index
+        new_member.seq_table = pd.DataFrame(seqs[first[order]], index=index, columns=self.seq_table.columns, copy=False)
+        if self.qual_table is not None:
+            quals = self.qual_table.values
+            mean_qual = np.empty((first.shape[0], quals.shape[1]), dtype=np.uint8)
+            for c in range(quals.shape[1]):
+                mean_qual[:, c] = np.round(np.bincount(inverse, weights=quals[:, c] * weights, minlength=first.shape[0]) / counts)
+            new_member.qual_table = pd.DataFrame(mean_qual[order], index=index, columns=self.qual_table.columns, copy=False)
+        else:
+            new_member.qual_table = None
+        new_member.counts = pd.Series(counts[order], index=index, name='counts')
+        return new_member
+
     def subsample(self, numseqs):
         """
             Return a random sample of sequences as a new object
@@ -203,15 +731,9 @@ class seqtable():
             Returns:
                 SeqTable Object
         """
-        random_sequences = self.seq_df.sample(numseqs)
+        return self.iloc[np.random.choice(len(self), numseqs, replace=False)]
 
-        if 'quals' in random_sequences:
-            random_qualities = random_sequences['quals']
-        else:
-            random_qualities = None
-        return seqtable(random_sequences['seqs'], random_qualities, self.start, index=random_sequences.index, seqtype=self.seqtype, phred_adjust=self.phred_adjust)
-
-    def get_substrings(self, word_length, subsample_seqs=None, weights=None):
+    def get_substrings(self, word_length, subsample_seqs=None, weights=None, max_span=None):
         """
             Useful function for counting the occurrences of all possible SUBSTRINGs within a sequence table
 
@@ -227,6 +749,8 @@ class seqtable():
             Args:
                 word_length (int): the length of substrings
                 subsample_seqs (int): If provided, then will take only a random subsampling of the data before performing substring function
+                weights (np array, default=None): weight of each sequence. If None and the table has been collapsed, counts are used
+                max_span (int, default=None): only count combinations whose first and last positions are at most max_span apart (None = all combinations)
 
             Returns:
                 dataframe: rows of dataframe are unique sequences of a given word length, Columns represents a specific combination of charcters in the word
@@ -251,59 +775,138 @@ class seqtable():
                     TTA    0          0         0         1
 
         """
-        def dict_count(arr):
-            dict_words = defaultdict(float)
+        if weights is None and self.counts is not None and subsample_seqs is None:
+            weights = self.counts.values
+        tmp_table = self.seq_table if subsample_seqs is None else self.subsample(subsample_seqs).seq_table
+        # all combinations are counted by substring_util (integer hashes and bincounts), then converted into a table
+        (combos, combo_index, substrings, counts) = count_gapped_substrings(tmp_table.values, word_length, max_span, weights)
+        (unique_substrings, row_index) = np.unique(substrings, return_inverse=True)
+        table = np.zeros((unique_substrings.shape[0], combos.shape[0]), dtype=counts.dtype)
+        table[row_index, combo_index] = counts
+        columns = [tuple(c) for c in np.asarray(tmp_table.columns)[combos].tolist()]
+        substring_counts_df = pd.DataFrame(table, index=unique_substrings, columns=columns)
+        if self.encoding_setting[0] is False:
+            substring_counts_df.index = substring_counts_df.index.map(lambda x: x.decode())
+        return substring_counts_df
 
-            def arr_fxn(a, b):
-                dict_words[a] += float(b)
-                return 0
+    def get_kmers(self, k, weights=None):
+        """
+            Count the contiguous substrings of length k that start at each position. Each substring is hashed into an integer (k multiply-adds
+            over all start positions at once, see substring_util.count_kmers) and the hashes are counted with bincounts
 
-            assert(arr.shape[1] == 2)
+            Args:
+                k (int): length of the substrings
+                weights (np array, default=None): weight of each sequence. If None and the table has been collapsed, counts are used
 
-            np.apply_along_axis(lambda x: arr_fxn(x[0], x[1]), arr=arr, axis=1)
-            return dict_words
+            Returns:
+                Series: number of sequences containing each substring. The index is (position of the first letter, substring); substrings that are
+                not found are not reported
 
-        tmp_table = self.seq_table if subsample_seqs is None else self.subsample(subsample_seqs).seq_table
-        mapper = {c: i for i, c in enumerate(tmp_table.columns)}
-        rev_mapper = {i: c for i, c in enumerate(tmp_table.columns)}
-        substrings = [[mapper[x] for x in i] for i in itertools.combinations(list(tmp_table.columns), word_length)]
-        table_values = tmp_table.values.view('S1')
-        view_value = 'S' + str(word_length)
-
-        dataframes = []
-
-        if weights is None:
-            for s in substrings:
-                [a, b] = np.unique(table_values[:, s].reshape(-1).view(view_value), return_counts=True)
-                dataframes.append(pd.DataFrame(b, index=a, columns=[tuple([rev_mapper[c] for c in s])]))
-            substring_counts_df =  pd.concat(dataframes, axis=1).fillna(0)
-        else:
-            # for s in substrings:
-            #     arr_vals = np.concatenate([table_values[:, s].reshape(-1).view(view_value).reshape(-1, 1), weights.reshape(-1, 1)], axis=1)
-            #     arr_counts = dict_count(arr_vals)
-            #     dataframes.append(pd.DataFrame(arr_counts.values(), index=arr_counts.keys(), columns=[tuple([rev_mapper[c] for c in s])]))
-            for s in substrings:
-                arr = table_values[:, s].reshape(-1).view(view_value)
-                [a, b] = np.unique(arr, return_inverse=True)
-                c = numpy_value_counts_bin_count(b, weights=weights).reset_index().values
-                a = a[c[:, 0].astype(int)]
-                b = c[:, 1]
-                dataframes.append(pd.DataFrame(b, index=a, columns=[tuple([rev_mapper[c] for c in s])]))
-
-            substring_counts_df = pd.concat(dataframes, axis=1).fillna(0)
-            # dfs = pd.concat([
-            #     pd.DataFrame(
-            #         {
-            #             'ss': table_values[:, s].reshape(-1).view(view_value),
-            #             tuple([rev_mapper[c] for c in s]): weights
-            #         }
-            #     )
-            #     for s in substrings
-            # ], axis=0).fillna(0)
-            # return dfs.groupby(by='ss').sum()
+            Examples:
+                >>> st = seq_tables.seqtable(['ACTW', 'ATTA'])
+                >>> st.get_kmers(3)
+        """
+        weights = self._validate_weights(weights)
+        (start, substrings, counts) = count_kmers(self.seq_table.values, k, weights)
         if self.encoding_setting[0] is False:
-            substring_counts_df.index = substring_counts_df.index.map(lambda x: x.decode())
-        return substring_counts_df
+            substrings = substrings.astype('U')
+        index = pd.MultiIndex.from_arrays([np.asarray(self.seq_table.columns)[start], substrings], names=['position', 'substring'])
+        return pd.Series(counts, index=index, name='counts')
+
+    def get_gapped_substrings(self, word_length, max_span, weights=None):
+        """
+            Count the substrings formed by every combination of word_length positions (i.e. pairs or triples) whose first and last positions are at
+            most max_span apart. Unlike get_substrings only the substrings that are found are reported, so this can be used on full length reads
+
+            Args:
+                word_length (int): number of positions in each substring
+                max_span (int): maximum distance between the first and last position of a combination
+                weights (np array, default=None): weight of each sequence. If None and the table has been collapsed, counts are used
+
+            Returns:
+                Series: number of sequences containing each substring. The index is (tuple of positions, substring)
+
+            Examples:
+                >>> st = seq_tables.seqtable(['ACTW', 'ATTA'])
+                >>> st.get_gapped_substrings(2, max_span=2)
+        """
+        weights = self._validate_weights(weights)
+        (combos, combo_index, substrings, counts) = count_gapped_substrings(self.seq_table.values, word_length, max_span, weights)
+        if self.encoding_setting[0] is False:
+            substrings = substrings.astype('U')
+        positions = np.empty(combos.shape[0], dtype=object)
+        positions[:] = [tuple(c) for c in np.asarray(self.seq_table.columns)[combos].tolist()]
+        index = pd.MultiIndex.from_arrays([positions[combo_index], substrings], names=['positions', 'substring'])
+        return pd.Series(counts, index=index, name='counts')
+
+    def _pair_counts(self, positions, weights, ignore_characters, chunk_rows):
+        """
+            Joint letter counts of every pair of positions (see covariation_util.joint_counts)
+
+            .. important::Private function
+
+                This function is not for public use
+
+            Returns:
+                counts (np array), letters (np array uint8), column_names
+        """
+        weights = self._validate_weights(weights)
+        compare = self.seq_table.loc[:, positions] if positions else self.seq_table
+        (codes, alphabet) = encode_letters(compare.values)
+        ignore = np.isin(alphabet, np.frombuffer(''.join(ignore_characters).encode(), dtype=np.uint8))
+        # ignored letters are moved to the end of the alphabet and are not counted
+        order = np.argsort(ignore, kind='stable')
+        lookup = np.empty(alphabet.shape[0], dtype=np.uint8)
+        lookup[order] = np.arange(alphabet.shape[0], dtype=np.uint8)
+        num_letters = int((~ignore).sum())
+        counts = joint_counts(lookup[codes], num_letters, weights, chunk_rows)
+        return (counts, alphabet[order[:num_letters]], compare.columns)
+
+    def pairwise_cooccurrence(self, positions=None, weights=None, ignore_characters=[], chunk_rows=None):
+        """
+            Count how often every pair of letters occurs at every pair of positions. Sequences are one-hot encoded in chunks and the counts of all
+            pairs are calculated as a single matrix product for each chunk
+
+            Args:
+                positions (list, default=None): positions to compare (all positions if None)
+                weights (np array, default=None): weight of each sequence. If None and the table has been collapsed, counts are used
+                ignore_characters (list of chars, default=[]): letters that are not counted (i.e. gaps)
+                chunk_rows (int, default=None): number of sequences encoded at a time
+
+            Returns:
+                dataframe: rows and columns are (position, letter). Each cell is the number of sequences with the row letter at the row position and the
+                column letter at the column position
+
+            Examples:
+                >>> st = seq_tables.seqtable(['ACTW', 'ATTA'])
+                >>> st.pairwise_cooccurrence([1, 2])
+        """
+        (counts, letters, column_names) = self._pair_counts(positions, weights, ignore_characters, chunk_rows)
+        letters = [chr(l) for l in letters]
+        index = pd.MultiIndex.from_product([column_names, letters], names=['position', 'letter'])
+        return pd.DataFrame(counts, index=index, columns=index)
+
+    def mutual_information(self, positions=None, weights=None, apc=False, ignore_characters=[], chunk_rows=None):
+        """
+            Calculate the mutual information (bits) between the letters of every pair of positions (i.e. for epistasis or coevolution analysis)
+
+            Args:
+                positions (list, default=None): positions to compare (all positions if None)
+                weights (np array, default=None): weight of each sequence. If None and the table has been collapsed, counts are used
+                apc (bool, default=False): apply the average product correction (MI(i, j) - mean(MI(i, :)) * mean(MI(:, j)) / mean(MI))
+                ignore_characters (list of chars, default=[]): letters that are not counted. Sequences with these letters at either position of a pair are not used for that pair
+                chunk_rows (int, default=None): number of sequences encoded at a time
+
+            Returns:
+                dataframe: positions x positions. The diagonal is the entropy of each position (NaN when apc is True)
+
+            Examples:
+                >>> st = seq_tables.seqtable(['ACTW', 'ATTA', 'GCTA'])
+                >>> st.mutual_information(apc=True)
+        """
+        (counts, letters, column_names) = self._pair_counts(positions, weights, ignore_characters, chunk_rows)
+        mi = mutual_information(counts, letters.shape[0], apc)
+        return pd.DataFrame(mi, index=column_names, columns=column_names)
 
     def update_seqdf(self):
         """
@@ -311,7 +914,7 @@ class seqtable():
             Sometimes it might be useful to make changes to the seq_table attribute. For example, may you have your own custom code where you change the values of seq_table
             to be '.' or something random. Well you want to make sure that seq_df updates accordingly because the full length strings are the most useful in the end
         """
-        self.seq_df = self.slice_sequences(self.seq_table.columns)
+        self._seq_df = None
 
     def qual_to_table(self, qualphred, phred_adjust=33, return_table=False):
         """
@@ -326,18 +929,20 @@ class seqtable():
                 self.qual_table (Dataframe): each row corresponds to a specific sequence and each column corresponds to
 
         """
-        qual_list = pd.Series(qualphred, dtype='S')
-
-        (qual_list, self.qual_table) = strseries_to_bytearray(
-            qual_list, self.null_qual,
-            self.encoding_setting[0],
-            self.encoding_setting[1]
-        )
+        if is_uint8_matrix(qualphred):
+            # quality strings were already parsed into a table of ascii values (i.e. read_fastq)
+            self.qual_table = np.ascontiguousarray(qualphred)
+        else:
+            (_, self.qual_table) = strseries_to_bytearray(
+                qualphred, self.null_qual,
+                self.encoding_setting[0],
+                self.encoding_setting[1]
+            )
 
-        self.seq_df['quals'] = list(qual_list)
         self.qual_table -= self.phred_adjust
 
-        self.qual_table = pd.DataFrame(self.qual_table, index=self.index, columns=range(self.start, self.qual_table.shape[1] + self.start))
+        self.qual_table = pd.DataFrame(self.qual_table, index=self.index, columns=range(self.start, self.qual_table.shape[1] + self.start), copy=False)
+        self._seq_df = None
 
         if self.qual_table.shape != self.seq_table.shape:
             raise Exception("The provided quality list does not match the format of the sequence list. Shape of sequences {0}, shape of quality {1}".format(str(self.seq_table.shape), str(self.qual_table.shape)))
@@ -351,20 +956,23 @@ class seqtable():
 
                 This function is not for public use
         """
-        seq_list = pd.Series(seqlist, dtype='S')
-        (seq_list, self.seq_table) = strseries_to_bytearray(
-            seq_list, self.fillna_val,
-            self.encoding_setting[0], self.encoding_setting[1]
-        )
-        self.seq_df = pd.DataFrame(list(seq_list), index=self.index, columns=['seqs'])
-
-        self.seq_table = pd.DataFrame(self.seq_table, index=self.index, columns=range(self.start, self.seq_table.shape[1] + self.start))
+        if is_uint8_matrix(seqlist):
+            # sequences were already parsed into a table of ascii values (i.e. read_fastq)
+            seq_arr = np.ascontiguousarray(seqlist)
+        else:
+            (_, seq_arr) = strseries_to_bytearray(
+                seqlist, self.fillna_val,
+                self.encoding_setting[0], self.encoding_setting[1]
+            )
+        # seq_df is created from this table when it is first accessed
+        self._seq_df = None
+        self.seq_table = pd.DataFrame(seq_arr, index=self.index, columns=range(self.start, seq_arr.shape[1] + self.start), copy=False)
 
     def table_to_seq(self, new_name):
         """
             Return the sequence list
         """
-        return self.seq_list
+        return self.seq_df['seqs'].rename(new_name)
 
     def compare_to_reference(
             self, reference_seq, positions=None, ref_start=0, flip=False,
@@ -396,35 +1004,19 @@ class seqtable():
                 Dataframe of boolean variables showing whether base is equal to reference at each position
         """
 
-        # convert reference to numbers
-        # reference_array = np.array(bytearray(reference_seq))[ref_cols]
-        reference_array, compare_column_header = self.adjust_ref_seq(reference_seq, self.seq_table.columns, ref_start, positions, return_as_np=True)
-
-        if set_diff is True:
-            # change positions of interest to be the SET DIFFERENCE of positions parameter
-            if positions is None:
-                raise Exception('You cannot analyze the set-difference of all positions. Returns a non-informative answer (no columns to compare)')
-            positions = sorted(list(set(compare_column_header) - set(positions)))
-        else:
-            # determine which columns we should look at
-            if positions is None:
-                ref_cols = [i for i in range(len(compare_column_header))]
-                positions = compare_column_header
-            else:
-                positions = sorted(list(set(positions) & set(compare_column_header)))
-                ref_cols = [i for i, c in enumerate(compare_column_header) if c in positions]
+        reference_array, positions = self._reference_positions(reference_seq, positions, ref_start, set_diff)
 
         # actually compare distances in each letter (find positions which are equal)
-        diffs = self.seq_table[positions].values == reference_array[ref_cols]  # if flip is False else self.seq_table[positions].values != reference_array
+        diffs = self.seq_table[positions].values == reference_array  # if flip is False else self.seq_table[positions].values != reference_array
 
         if treat_as_true:
             if not isinstance(treat_as_true, list):
                 treat_as_true = [treat_as_true]
             treat_as_true = [ord(let) for let in treat_as_true]
             # now we have to ignore characters that are equal to specific values
-            ignore_pos = (self.seq_table[positions].values == treat_as_true[0]) | (reference_array[ref_cols] == treat_as_true[0])
+            ignore_pos = (self.seq_table[positions].values == treat_as_true[0]) | (reference_array == treat_as_true[0])
             for chr_p in range(1, len(treat_as_true)):
-                ignore_pos = ignore_pos | (self.seq_table[positions].values == treat_as_true[chr_p]) | (reference_array[ref_cols] == treat_as_true[chr_p])
+                ignore_pos = ignore_pos | (self.seq_table[positions].values == treat_as_true[chr_p]) | (reference_array == treat_as_true[chr_p])
 
             # now adjust boolean results to ignore any positions == treat_as_true
             diffs = (diffs | ignore_pos)  # if flip is False else (diffs | ignore_pos)
@@ -437,9 +1029,9 @@ class seqtable():
                 ignore_characters = [ignore_characters]
             ignore_characters = [ord(let) for let in ignore_characters]
             # now we have to ignore characters that are equal to specific values
-            ignore_pos = (self.seq_table[positions].values == ignore_characters[0]) | (reference_array[ref_cols] == ignore_characters[0])
+            ignore_pos = (self.seq_table[positions].values == ignore_characters[0]) | (reference_array == ignore_characters[0])
             for chr_p in range(1, len(ignore_characters)):
-                ignore_pos = ignore_pos | (self.seq_table[positions].values == ignore_characters[chr_p]) | (reference_array[ref_cols] == ignore_characters[chr_p])
+                ignore_pos = ignore_pos | (self.seq_table[positions].values == ignore_characters[chr_p]) | (reference_array == ignore_characters[chr_p])
 
             # OK so we need to FORCE np.nan, we cant do that if the datatype is a bool, so unfortunately we need to change the dattype
             # to be float in this situation
@@ -459,6 +1051,37 @@ class seqtable():
         else:
             return df
 
+    def _reference_positions(self, reference_seq, positions, ref_start, set_diff):
+        """
+            Determine which positions compare_to_reference will analyze and the letter (ascii value) of the reference at each of those positions
+
+            .. important::Private function
+
+                This function is not for public use
+
+            Returns:
+                reference_array (np array uint8): reference letter at each position
+                positions (list): table positions that should be compared
+        """
+        # convert reference to numbers
+        reference_array, compare_column_header = self.adjust_ref_seq(reference_seq, self.columns, ref_start, positions, return_as_np=True)
+
+        if set_diff is True:
+            # change positions of interest to be the SET DIFFERENCE of positions parameter
+            if positions is None:
+                raise Exception('You cannot analyze the set-difference of all positions. Returns a non-informative answer (no columns to compare)')
+            positions = sorted(list(set(compare_column_header) - set(positions)))
+            ref_cols = [i for i, c in enumerate(compare_column_header) if c in positions]
+        else:
+            # determine which columns we should look at
+            if positions is None:
+                ref_cols = [i for i in range(len(compare_column_header))]
+                positions = compare_column_header
+            else:
+                positions = sorted(list(set(positions) & set(compare_column_header)))
+                ref_cols = [i for i, c in enumerate(compare_column_header) if c in positions]
+        return reference_array[ref_cols], positions
+
     def hamming_distance(self, reference_seq, positions=None, ref_start=0, set_diff=False, ignore_characters=[], normalized=False):
         """
             Determine hamming distance of all sequences in dataframe to a reference sequence.
@@ -499,23 +1122,27 @@ class seqtable():
         ).rename(columns={0: 'Ref base'}).transpose()
         # compare all bases/residues to the reference seq (returns a dataframe of boolean vars)
         not_equal_to = self.compare_to_reference(reference_seq, positions, ref_start, flip=True, treat_as_true=treat_as_true, set_diff=set_diff)
+        # positions past the end of a read (NaN in ragged tables) are not mutations
+        mismatches = not_equal_to.values == 1
         # now create a numpy array in which the reference is repeated N times where n = # sequences
         ref = ref[not_equal_to.columns]
         ref_matrix = np.tile(ref, (self.seq_table.shape[0], 1))
         # now create a numpy array of ALL bases in the seq table that were not equal to the reference
         subset = self.seq_table[not_equal_to.columns]
-        var_bases_unique = subset.values[(not_equal_to.values)]
+        var_bases_unique = subset.values[mismatches]
 
         # now create a corresponding numpy array of ALL bases in teh REF TABLE where that base was not equal in the seq table
         # each index in this variable corresponds to the index (seq #, base position) in var_bases_unique
-        ref_bases_unique = ref_matrix[(not_equal_to.values)]
+        ref_bases_unique = ref_matrix[mismatches]
 
         # OK lets do some fancy numpy methods and merge the two arrays, and then convert the 2D into 1D using bit conversion
         # found this at: https://www.reddit.com/r/learnpython/comments/3v9y8u/how_can_i_find_unique_elements_along_one_axis_of/
         mutation_combos = np.array([ref_bases_unique, var_bases_unique]).T.copy().view(np.int16)
 
         # finally count the instances of each mutation we see (use squeeze(1) to ONLY squeeze single dim)
-        counts = np.bincount(mutation_combos.squeeze(1))
+        # rows of a collapsed table represent counts reads
+        mutation_weights = self.counts.values[np.nonzero(mismatches)[0]] if self.counts is not None else None
+        counts = np.bincount(mutation_combos.squeeze(1), weights=mutation_weights)
         unique_mut = np.nonzero(counts)[0]
 
         counts = counts[unique_mut]
@@ -627,17 +1254,19 @@ class seqtable():
         if self.qual_table is None:
             raise Exception("You have not passed in any quality data for these sequences")
 
-        meself = self if inplace is True else copy.deepcopy(self)
-        total_bases = (meself.qual_table.values > (ord(self.null_qual) - self.phred_adjust)).sum(axis=1) if ignore_null_qual else meself.qual_table.shape[1]
-        percent_above = (100 * ((meself.qual_table.values >= q).sum(axis=1))) / total_bases
-
-        meself.qual_table = meself.qual_table[percent_above >= p]
-        meself.seq_table = meself.seq_table.loc[meself.qual_table.index]
-        meself.seq_df = meself.seq_df.loc[meself.qual_table.index]
-        # bases = meself.seq_table.shape[1]
+        total_bases = (self.qual_table.values > (ord(self.null_qual) - self.phred_adjust)).sum(axis=1) if ignore_null_qual else self.qual_table.shape[1]
+        percent_above = (100 * ((self.qual_table.values >= q).sum(axis=1))) / total_bases
 
+        # only the rows that are kept are copied (all tables are shared when every row passes)
+        filtered = self.iloc[np.flatnonzero(percent_above >= p)]
         if inplace is False:
-            return meself
+            return filtered
+        # assigned through the public attributes so that subclasses store the tables in their own format
+        self.seq_table = filtered.seq_table
+        self.qual_table = filtered.qual_table
+        self.counts = filtered.counts
+        self.index = filtered.index
+        self.seq_df = filtered._seq_df
 
     def convert_low_bases_to_null(self, q, replace_with='N', inplace=False):
         """
@@ -651,11 +1280,16 @@ class seqtable():
         if self.qual_table is None:
             raise Exception("You have not passed in any quality data for these sequences")
 
-        meself = self if inplace is True else self.copy()
+        # the new table shares qual_table (and seq_table when no base is converted) with this table
+        meself = self if inplace is True else self.iloc[:]
         replace_with = ord(replace_with) if replace_with is not None else ord('N') if self.seqtype == 'NT' else ord('X')
-        meself.seq_table.values[meself.qual_table.values < q] = replace_with
-        chars = self.seq_table.shape[1]
-        meself.seq_df['seqs'] = list(meself.seq_table.values.copy().view('S' + str(chars)).ravel())
+        low_bases = meself.qual_table.values < q
+        if low_bases.any():
+            seq_table = meself.seq_table
+            # a new array is created, so a table that shares its values (or a read-only copy-on-write array) is never modified
+            new_values = np.where(low_bases, np.uint8(replace_with), seq_table.values)
+            meself.seq_table = pd.DataFrame(new_values, index=seq_table.index, columns=seq_table.columns, copy=False)
+            meself.seq_df = None
         if inplace is False:
             return meself
 
@@ -684,13 +1318,13 @@ class seqtable():
                 before_filter = positions
                 positions = [p for p in positions if p >= ref_start]
                 if len(positions) < len(before_filter):
-                    warnings.warn("Warning: Because the reference starts at a position after the start of sequences we cannot anlayze the following positions: {0}".format(','.join([_ for _ in before_filter[:ref_start]])))
+                    warnings.warn("Warning: Because the reference starts at a position after the start of sequences we cannot anlayze the following positions: {0}".format(','.join([str(_) for _ in before_filter[:ref_start]])))
                 compare_column_header = compare_column_header[ref_start:]
 
             if len(reference_seq) > len(table_columns):
                 reference_seq = reference_seq[:len(table_columns)]
             elif len(reference_seq) < len(table_columns):
-                reference_seq = reference_seq + self.fillna_val * (self.seq_table.shape[1] - len(reference_seq))
+                reference_seq = reference_seq + self.fillna_val * (len(table_columns) - len(reference_seq))
 
             return np.array([reference_seq], dtype='S').view(np.uint8) if return_as_np is True else reference_seq, compare_column_header
 
@@ -742,34 +1376,48 @@ class seqtable():
         """
             Returns the distribution of bases or amino acids at each position.
         """
-        if weight_by is not None:
-            try:
-                if isinstance(weight_by, pd.Series):
-                    assert(weight_by.shape[0] == self.seq_table.shape[0])
-                    weight_by = weight_by.values
-                elif isinstance(weight_by, pd.DataFrame):
-                    assert(weight_by.shape[0] == self.seq_table.shape[0])
-                    assert(weight_by.shape[1] == 1)
-                    weight_by = weight_by.values
-                else:
-                    assert(len(weight_by) == self.seq_table.shape[0])
-                    weight_by = np.array(weight_by)
-            except:
-                raise Exception('The provided weights for each seuence must match the number of input sequences!')
+        weight_by = self._validate_weights(weight_by)
         compare = self.seq_table.loc[:, positions] if positions else self.seq_table
 
         column_names = compare.columns
-        dist = numpy_value_counts_bin_count(compare, weight_by)   # compare.apply(pd.value_counts).fillna(0)
-        dist.rename({c: chr(c) for c in list(dist.index)}, inplace=True)
-        drop_values = list(set(ignore_characters) & set(list(dist.index)))
-        dist = dist.drop(drop_values, axis=0)
-        if method == 'freq':
-            dist = dist.astype(float) / dist.sum(axis=0)
-        elif method == 'bits':
-            N = self.seq_table.shape[0]
-            dist = get_bits(dist.astype(float) / dist.sum(axis=0), self.seqtype, N)
-        dist.rename(columns={old: new for (old, new) in zip(dist.columns, column_names)}, inplace=True)
-        return dist.fillna(0)
+        dist = value_counts(compare, weight_by)   # picks the fastest of COUNT_METHODS for this table
+        return self._format_seq_dist(dist, column_names, method, ignore_characters)
+
+    def _validate_weights(self, weight_by):
+        """
+            Confirm that there is one weight per sequence and return the weights as a numpy array (or None)
+
+            .. important::Private function
+
+                This function is not for public use
+        """
+        if weight_by is None:
+            # rows of a collapsed table represent counts reads
+            return self.counts.values if self.counts is not None else None
+        try:
+            if isinstance(weight_by, pd.Series):
+                assert(weight_by.shape[0] == len(self))
+                weight_by = weight_by.values
+            elif isinstance(weight_by, pd.DataFrame):
+                assert(weight_by.shape[0] == len(self))
+                assert(weight_by.shape[1] == 1)
+                weight_by = weight_by.values
+            else:
+                assert(len(weight_by) == len(self))
+                weight_by = np.array(weight_by)
+        except:
+            raise Exception('The provided weights for each seuence must match the number of input sequences!')
+        return weight_by
+
+    def _format_seq_dist(self, dist, column_names, method, ignore_characters):
+        """
+            Convert a table of counts (rows are ascii values, columns are positions) into the output of get_seq_dist
+
+            .. important::Private function
+
+                This function is not for public use
+        """
+        return format_seq_dist(dist, column_names, method, ignore_characters, self.seqtype, len(self) if self.counts is None else self.counts.sum())
 
     def get_plogo(self, background_seqs=None, positions=None, ignore_characters=[], alpha=0.01):
         counts = self.get_seq_dist(positions, ignore_characters=ignore_characters)
@@ -781,21 +1429,34 @@ class seqtable():
 
         return get_plogo(counts, self.seqtype, bkst_freq, alpha=alpha)
 
-    def get_consensus(self, positions=None, modecutoff=0.5):
+    def get_consensus(self, positions=None, modecutoff=0.5, weights=None, degenerate=False):
         """
             Returns the sequence consensus of the bases at the defined positions
 
             Args:
                 positions: Slice which positions in the table should be conidered
                 modecutoff: Only report the consensus base of letters which appear more than the provided modecutoff (in other words, the mode must be greater than this frequency)
+                weights (np array, default=None): weight of each sequence. If None and the table has been collapsed, counts are used
+                degenerate (bool, default=False): For nucleotides, report the IUPAC code (seq_table_util.degen_to_base) of the fewest bases that together pass the modecutoff
+                    when no single base passes it
+
+            .. note::Positions without a consensus
+
+                Positions without a consensus are reported as N (X for amino acids)
         """
-        compare = self.seq_table.loc[:, positions] if positions else self.seq_table
-        cutoff = float(compare.shape[0]) * modecutoff
-        chars = compare.shape[1]
-        dist = np.int8(compare.apply(lambda x: x.mode()).values[0])
-        dist[(compare.values == dist).sum(axis=0) <= cutoff] = ord('N')
-        seq = dist.view('S' + str(chars))[0]
-        return seq
+        # the consensus is calculated from the letter counts at each position (see get_seq_dist)
+        dist = self.get_seq_dist(positions, weight_by=weights)
+        letters = np.frombuffer(''.join(dist.index).encode(), dtype=np.uint8)
+        counts = dist.values.astype(np.float64)
+        cutoffs = counts.sum(axis=0) * modecutoff
+        consensus = letters[counts.argmax(axis=0)] if counts.shape[0] else np.full(counts.shape[1], ord(self.fillna_val), dtype=np.uint8)
+        no_consensus = counts.max(axis=0, initial=0) <= cutoffs
+        if degenerate and self.seqtype == 'NT':
+            base_counts = np.array([counts[letters == ord(b)].sum(axis=0) for b in 'ACGT']).reshape(4, -1)
+            consensus[no_consensus] = degenerate_consensus(base_counts[:, no_consensus], cutoffs[no_consensus], self.fillna_val)
+        else:
+            consensus[no_consensus] = ord(self.fillna_val)
+        return consensus.view('S' + str(consensus.shape[0]))[0]
 
     def pos_entropy(self, positions=None, ignore_characters=[], nbit=2):
         dist = self.get_seq_dist(positions, method='freq', ignore_characters=ignore_characters)
@@ -856,7 +1517,8 @@ class seqtable():
                 >>> plotly.plot(graphs)
         """
         assert (self.qual_table is not None)
-        return get_quality_dist(self.qual_table, bins, percentiles, exclude_null_quality, sample, plotly_sampledata_size=20)
+        weights = self.counts.values if self.counts is not None else None
+        return get_quality_dist(self.qual_table, bins, percentiles, exclude_null_quality, sample, plotly_sampledata_size, weights=weights)
 
 
 class seqtable_indexer():
@@ -0,0 +1,128 @@
+import json
+import struct
+import numpy as np
+
+"""
+Methods for storing seqtable arrays in a single binary file that can be memory mapped when it is reloaded
+
+File layout:
+    1. magic string (8 bytes) and format version (uint32)
+    2. length of the metadata (uint64) followed by the metadata as json
+    3. raw arrays, each starting at an offset that is a multiple of ALIGNMENT (offsets, shapes and dtypes are listed in the metadata)
+"""
+
+SEQTABLE_MAGIC = b'SEQTABLE'
+SEQTABLE_FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+# number of bytes of a non contiguous array that are copied at a time by write_arrays
+WRITE_CHUNK_SIZE = 2 ** 24
+
+
+def _aligned(offset):
+    return ((offset + ALIGNMENT - 1) // ALIGNMENT) * ALIGNMENT
+
+
+def _write_array(w, arr):
+    """
+        Write the bytes of an array (C order) without copying the whole array. Contiguous arrays are written directly from their memory,
+        other arrays (i.e. views of a subset of positions) are copied WRITE_CHUNK_SIZE bytes at a time
+    """
+    if arr.flags['C_CONTIGUOUS'] or arr.ndim == 0:
+        w.write(np.ascontiguousarray(arr).reshape(-1).view(np.uint8))
+        return
+    rows = max(1, WRITE_CHUNK_SIZE // max(arr[:1].nbytes, 1))
+    for i in range(0, arr.shape[0], rows):
+        w.write(np.ascontiguousarray(arr[i:i + rows]).reshape(-1).view(np.uint8))
+
+
+def write_arrays(path, arrays, metadata):
+    """
+        Write a set of numpy arrays and a metadata dictionary to a single file
+
+        Args:
+            path (str): output file
+            arrays (dict of np arrays): arrays to store (None values are skipped)
+            metadata (dict): json serializable information stored in the header
+    """
+    arrays = {k: np.asarray(v) for k, v in arrays.items() if v is not None}
+    # offsets depend on the size of the header, and the size of the header depends on the offsets, so reserve space for the offsets first
+    layout = {k: {'offset': 0, 'shape': list(v.shape), 'dtype': v.dtype.str} for k, v in arrays.items()}
+    for _ in range(2):
+        header = json.dumps({'metadata': metadata, 'arrays': layout}).encode()
+        offset = _aligned(len(SEQTABLE_MAGIC) + 4 + 8 + len(header) + 32 * len(arrays))
+        for k, v in arrays.items():
+            layout[k]['offset'] = offset
+            offset = _aligned(offset + v.nbytes)
+    header = json.dumps({'metadata': metadata, 'arrays': layout}).encode()
+    with open(path, 'wb') as w:
+        w.write(SEQTABLE_MAGIC)
+        w.write(struct.pack('<IQ', SEQTABLE_FORMAT_VERSION, len(header)))
+        w.write(header)
+        for k, v in arrays.items():
+            w.seek(layout[k]['offset'])
+            _write_array(w, v)
+
+
+def pack_strings(strings, separator=b'\n'):
+    """
+        Join a list of strings (or a list of bytes) into a single uint8 array so that they can be stored by write_arrays
+
+        Returns:
+            buf (np array uint8): every string (utf-8 encoded) followed by separator (except the last string)
+            lengths (np array int64): number of bytes in each string
+    """
+    strings = list(strings)
+    encoded = strings if len(strings) and isinstance(strings[0], bytes) else list(map(str.encode, strings))
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    return np.frombuffer(separator.join(encoded), dtype=np.uint8), lengths
+
+
+def unpack_strings(buf, lengths, decode=True, separator=b'\n'):
+    """
+        Convert the array created by pack_strings back into a list of strings (or bytes if decode is False)
+
+        The buffer is decoded and split in a single call; the lengths are only used if a string contains the separator
+    """
+    data = np.asarray(buf).tobytes()
+    if decode:
+        strings = data.decode('utf-8').split(separator.decode())
+    else:
+        strings = data.split(separator)
+    if len(strings) == lengths.shape[0] or lengths.shape[0] == 0:
+        return strings[:lengths.shape[0]]
+    starts = np.cumsum(lengths + len(separator)) - lengths - len(separator)
+    strings = [data[start:start + length] for start, length in zip(starts.tolist(), lengths.tolist())]
+    return [s.decode('utf-8') for s in strings] if decode else strings
+
+
+def read_arrays(path, mmap=True):
+    """
+        Read the arrays and metadata written by write_arrays
+
+        Args:
+            path (str): file written by write_arrays
+            mmap (bool, default=True): If True, arrays are returned as copy-on-write memory maps of the file (nothing is read until it is used,
+                and changes are never written back to the file). If False, arrays are read into memory
+
+        Returns:
+            arrays (dict of np arrays)
+            metadata (dict)
+    """
+    with open(path, 'rb') as r:
+        if r.read(len(SEQTABLE_MAGIC)) != SEQTABLE_MAGIC:
+            raise Exception('The provided file was not created by seqtable.save')
+        version, header_len = struct.unpack('<IQ', r.read(12))
+        if version > SEQTABLE_FORMAT_VERSION:
+            raise Exception('The provided file was created by a newer version of seqtables (format version {0})'.format(version))
+        header = json.loads(r.read(header_len).decode())
+        arrays = {}
+        for k, info in header['arrays'].items():
+            shape = tuple(info['shape'])
+            dtype = np.dtype(info['dtype'])
+            if mmap and int(np.prod(shape)) > 0:
+                arrays[k] = np.memmap(path, dtype=dtype, mode='c', offset=info['offset'], shape=shape)
+            else:
+                r.seek(info['offset'])
+                arrays[k] = np.fromfile(r, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+    return arrays, header['metadata']
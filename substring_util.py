@@ -0,0 +1,207 @@
+"""
+Count substrings (contiguous k-mers or gapped combinations of positions) in a table of sequences. The letters found at each combination of
+positions are combined into a single integer (base = number of distinct letters), so all combinations are counted with bincounts over
+integer keys rather than one np.unique per combination
+"""
+
+import itertools
+import numpy as np
+
+# largest count matrix (possible substrings x combinations) created at once. Larger spaces of substrings are counted with np.unique
+MAX_DENSE_COUNTS = 2 ** 22
+
+# number of hashes (combinations x rows) created at once
+MAX_CHUNK_CELLS = 2 ** 20
+
+
+def encode_letters(arr):
+    """
+        Convert a table of ascii values into dense codes 0..a-1, where a is the number of distinct letters in the table
+
+        Returns:
+            codes (np array uint8): same shape as arr
+            alphabet (np array uint8): ascii value of each code (sorted)
+    """
+    alphabet = np.flatnonzero(np.bincount(arr.ravel(), minlength=256)).astype(np.uint8)
+    lookup = np.zeros(256, dtype=np.uint8)
+    lookup[alphabet] = np.arange(alphabet.shape[0], dtype=np.uint8)
+    return (lookup[arr], alphabet)
+
+
+def kmer_combinations(num_cols, k):
+    """
+        Returns the positions of every contiguous k-mer (one row per start position)
+    """
+    return np.arange(max(num_cols - k + 1, 0), dtype=np.int64)[:, None] + np.arange(k, dtype=np.int64)
+
+
+def gapped_combinations(num_cols, word_length, max_span=None):
+    """
+        Returns every combination of word_length positions whose first and last positions are at most max_span apart. Combinations are
+        ordered as in itertools.combinations(range(num_cols), word_length)
+
+        Args:
+            num_cols (int): number of positions in the table
+            word_length (int): number of positions in each combination
+            max_span (int, default=None): maximum distance between the first and last position of a combination (None = no limit)
+    """
+    max_span = num_cols - 1 if max_span is None else min(max_span, num_cols - 1)
+    offsets = np.array([(0,) + o for o in itertools.combinations(range(1, max_span + 1), word_length - 1)], dtype=np.int64).reshape(-1, word_length)
+    combos = (np.arange(num_cols, dtype=np.int64)[:, None, None] + offsets[None]).reshape(-1, word_length)
+    return combos[combos[:, -1] < num_cols]
+
+
+def _row_selector(positions):
+    """
+        Use a slice when positions are consecutive so that codes_t[positions] is a view (the positions of contiguous k-mers are never copied)
+    """
+    if positions.shape[0] > 0 and (positions.shape[0] == 1 or (np.diff(positions) == 1).all()):
+        return slice(int(positions[0]), int(positions[-1]) + 1)
+    return positions
+
+
+def _key_dtype(max_key):
+    """
+        Smallest unsigned integer type that can hold every key (small keys keep the hashes cache friendly)
+    """
+    for dtype in [np.uint16, np.uint32]:
+        if max_key <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def hash_combinations(codes_t, combos, num_letters, dtype=np.int64):
+    """
+        Combine the codes found at each combination of positions into a single integer: sum(codes[p_i] * num_letters ** (word_length - 1 - i))
+
+        Args:
+            codes_t (np array uint8): transposed codes (rows are positions, columns are sequences) so that each position is contiguous
+            combos (np array of ints): rows are combinations, columns are positions
+            num_letters (int): number of distinct codes
+            dtype (numpy dtype, default=np.int64): type of the hashes
+
+        Returns:
+            hashes (np array): rows are combinations, columns are sequences
+    """
+    hashes = np.zeros((combos.shape[0], codes_t.shape[1]), dtype=dtype)
+    for i in range(combos.shape[1]):
+        hashes *= dtype(num_letters)
+        hashes += codes_t[_row_selector(combos[:, i])]
+    return hashes
+
+
+def decode_hashes(hashes, alphabet, word_length):
+    """
+        Opposite of hash_combinations: convert hashes into substrings (np array of bytes)
+    """
+    num_letters = alphabet.shape[0]
+    letters = np.empty((hashes.shape[0], word_length), dtype=np.uint8)
+    remaining = hashes.copy()
+    for i in range(word_length - 1, -1, -1):
+        letters[:, i] = alphabet[remaining % num_letters]
+        remaining //= num_letters
+    return letters.view('S' + str(word_length)).ravel()
+
+
+def count_combinations(codes, combos, num_letters, weights=None):
+    """
+        Count the substrings found at each combination of positions
+
+        Each batch of combinations is hashed into keys (combination * num_letters ** word_length + hash) and counted with a single bincount
+        (np.unique when the number of possible substrings is too large for a dense count)
+
+        Args:
+            codes (np array uint8): output of encode_letters
+            combos (np array of ints): rows are combinations, columns are positions (see kmer_combinations and gapped_combinations)
+            num_letters (int): number of distinct codes
+            weights (np array, default=None): weight of each sequence
+
+        Returns:
+            combo_index (np array int64): the combination (row of combos) of each substring
+            hashes (np array int64): the substring (see hash_combinations)
+            counts (np array): number of sequences (or sum of weights) containing the substring at the combination
+
+            Results are sorted by combination and then by hash (i.e. alphabetically)
+    """
+    (num_rows, word_length) = (codes.shape[0], combos.shape[1])
+    num_values = num_letters ** word_length
+    if num_values >= 2 ** 62:
+        raise Exception('Substrings of length {0} cannot be represented as 64 bit integers using {1} letters'.format(word_length, num_letters))
+    dense = num_values <= MAX_DENSE_COUNTS
+    codes_t = np.ascontiguousarray(codes.T)
+    weights = None if weights is None else np.asarray(weights, dtype=np.float64)
+    # number of combinations counted at a time (keys combine the combination and the hash so they must fit in 64 bits)
+    batch = max(1, min(MAX_DENSE_COUNTS // num_values if dense else 64, (2 ** 62) // num_values, MAX_CHUNK_CELLS // max(num_rows, 1)))
+    results = []
+    for b in range(0, combos.shape[0], batch):
+        batch_combos = combos[b:b + batch]
+        num_keys = batch_combos.shape[0] * num_values
+        dtype = _key_dtype(num_keys - 1)
+        offsets = (np.arange(batch_combos.shape[0], dtype=np.int64) * num_values).astype(dtype)[:, None]
+        chunk_rows = max(1, MAX_CHUNK_CELLS // batch_combos.shape[0])
+        counts = np.zeros(num_keys, dtype=np.int64 if weights is None else np.float64) if dense else []
+        keys = []
+        for c in range(0, num_rows, chunk_rows):
+            chunk_keys = hash_combinations(codes_t[:, c:c + chunk_rows], batch_combos, num_letters, dtype)
+            chunk_keys += offsets
+            chunk_weights = None if weights is None else np.tile(weights[c:c + chunk_rows], batch_combos.shape[0])
+            if dense:
+                counts += np.bincount(chunk_keys.ravel(), weights=chunk_weights, minlength=num_keys)
+            else:
+                (unique_keys, inverse) = np.unique(chunk_keys.ravel(), return_inverse=True)
+                keys.append(unique_keys.astype(np.int64))
+                counts.append(np.bincount(inverse.ravel(), weights=chunk_weights, minlength=unique_keys.shape[0]))
+        if dense:
+            keys = np.flatnonzero(counts)
+            counts = counts[keys]
+        else:
+            (keys, inverse) = np.unique(np.concatenate(keys), return_inverse=True)
+            counts = np.bincount(inverse.ravel(), weights=np.concatenate(counts), minlength=keys.shape[0])
+            if weights is None:
+                counts = counts.astype(np.int64)
+        results.append((keys // num_values + b, keys % num_values, counts))
+    if not results:
+        return (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64 if weights is None else np.float64))
+    return tuple(np.concatenate(r) for r in zip(*results))
+
+
+def count_kmers(arr, k, weights=None):
+    """
+        Count the contiguous substrings of length k starting at every position. Hashes are built with k multiply-adds over views of the (transposed) table
+
+        Args:
+            arr (np array uint8): rows are sequences, columns are positions
+            k (int): length of substrings
+            weights (np array, default=None): weight of each sequence
+
+        Returns:
+            start (np array int64): column of the first letter of each substring
+            substrings (np array of bytes)
+            counts (np array)
+    """
+    (codes, alphabet) = encode_letters(arr)
+    combos = kmer_combinations(arr.shape[1], k)
+    (combo_index, hashes, counts) = count_combinations(codes, combos, max(alphabet.shape[0], 1), weights)
+    return (combos[combo_index, 0], decode_hashes(hashes, alphabet, k), counts)
+
+
+def count_gapped_substrings(arr, word_length, max_span=None, weights=None):
+    """
+        Count the substrings formed by every combination of word_length positions whose first and last positions are at most max_span apart
+
+        Args:
+            arr (np array uint8): rows are sequences, columns are positions
+            word_length (int): number of positions in each substring
+            max_span (int, default=None): maximum distance between the first and last position of a substring (None = all combinations)
+            weights (np array, default=None): weight of each sequence
+
+        Returns:
+            combos (np array int64): the combinations of positions (see gapped_combinations)
+            combo_index (np array int64): the combination (row of combos) of each substring
+            substrings (np array of bytes)
+            counts (np array)
+    """
+    (codes, alphabet) = encode_letters(arr)
+    combos = gapped_combinations(arr.shape[1], word_length, max_span)
+    (combo_index, hashes, counts) = count_combinations(codes, combos, max(alphabet.shape[0], 1), weights)
+    return (combos, combo_index, decode_hashes(hashes, alphabet, word_length), counts)
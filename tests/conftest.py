@@ -0,0 +1,11 @@
+import importlib.util
+import os
+import sys
+
+# the repository is the seqtables package itself, make it importable as seqtables regardless of the name of the checkout
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if 'seqtables' not in sys.modules:
+    spec = importlib.util.spec_from_file_location('seqtables', os.path.join(ROOT, '__init__.py'), submodule_search_locations=[ROOT])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['seqtables'] = module
+    spec.loader.exec_module(module)
@@ -0,0 +1,73 @@
+import gzip
+import re
+import struct
+import zlib
+
+# writers for the small input files used by the tests
+
+
+def bgzf_compress(data, block_size=65280):
+    # every block is an independent gzip member with the BC extra field holding the block size, followed by the empty EOF block
+    out = []
+    for i in range(0, len(data), block_size):
+        chunk = data[i:i + block_size]
+        c = zlib.compressobj(6, zlib.DEFLATED, -15)
+        deflated = c.compress(chunk) + c.flush()
+        out.append(
+            b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00' + struct.pack('<H', len(deflated) + 25) + deflated +
+            struct.pack('<II', zlib.crc32(chunk) & 0xffffffff, len(chunk))
+        )
+    out.append(b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00\x1b\x00\x03\x00\x00\x00\x00\x00\x00\x00\x00\x00')
+    return b''.join(out)
+
+
+def write_text(path, text, compression=None, block_size=65280):
+    data = text.encode()
+    if compression == 'gzip':
+        data = gzip.compress(data)
+    elif compression == 'bgzf':
+        data = bgzf_compress(data, block_size)
+    with open(path, 'wb') as w:
+        w.write(data)
+    return str(path)
+
+
+def fastq_text(names, seqs, quals):
+    return ''.join('@{0}\n{1}\n+\n{2}\n'.format(n, s, q) for n, s, q in zip(names, seqs, quals))
+
+
+def sam_text(references, records):
+    # records are (name, flag, ref, pos, cigar, seq, qual)
+    lines = ['@HD\tVN:1.6'] + ['@SQ\tSN:{0}\tLN:{1}'.format(n, l) for n, l in references]
+    for name, flag, ref, pos, cigar, seq, qual in records:
+        lines.append('\t'.join([name, str(flag), ref, str(pos), '60', cigar, '*', '0', '0', seq, qual]))
+    return '\n'.join(lines) + '\n'
+
+
+def bam_bytes(references, records, block_size=65280):
+    # same records as sam_text, encoded using the BAM specification
+    text = sam_text(references, [])
+    header = b'BAM\x01' + struct.pack('<i', len(text)) + text.encode() + struct.pack('<i', len(references))
+    for n, l in references:
+        header += struct.pack('<i', len(n) + 1) + n.encode() + b'\x00' + struct.pack('<i', l)
+    ref_ids = {n: i for i, (n, _) in enumerate(references)}
+    nt16 = {c: i for i, c in enumerate('=ACMGRSVTWYHKDBN')}
+    body = b''
+    for name, flag, ref, pos, cigar, seq, qual in records:
+        cigar_ops = [(int(l), 'MIDNSHP=X'.index(o)) for l, o in re.findall(r'(\d+)([MIDNSHP=X])', cigar)]
+        seq = '' if seq == '*' else seq
+        packed = bytes(
+            (nt16[seq[i]] << 4) | (nt16[seq[i + 1]] if i + 1 < len(seq) else 0) for i in range(0, len(seq), 2)
+        )
+        quals = bytes([255] * len(seq)) if qual == '*' else bytes(ord(q) - 33 for q in qual)
+        rec = struct.pack(
+            '<iiBBHHHiiii', ref_ids.get(ref, -1), pos - 1, len(name) + 1, 60, 0, len(cigar_ops), flag, len(seq), -1, -1, 0
+        ) + name.encode() + b'\x00' + b''.join(struct.pack('<I', l << 4 | o) for l, o in cigar_ops) + packed + quals
+        body += struct.pack('<i', len(rec)) + rec
+    return bgzf_compress(header + body, block_size)
+
+
+def write_bam(path, references, records, block_size=65280):
+    with open(path, 'wb') as w:
+        w.write(bam_bytes(references, records, block_size))
+    return str(path)
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+from seqtables import accumulators, read_sequences
+
+REFERENCE = 'ACGTACGTACGTACGTACGTACGT'
+
+
+@pytest.fixture
+def mixed_length_fastq(tmp_path):
+    # the longest reads are all in the last chunk so that earlier chunks are narrower than the full table
+    rng = np.random.default_rng(0)
+    lengths = np.concatenate([rng.integers(5, 12, 40), rng.integers(8, 16, 40), rng.integers(10, 24, 40)])
+    path = tmp_path / 'mixed.fq'
+    with open(path, 'w') as w:
+        for i, length in enumerate(lengths):
+            seq = ''.join(rng.choice(list('ACGTN'), length, p=[0.3, 0.2, 0.2, 0.25, 0.05]))
+            # duplicate reads (some of which end in N) so that sequence counts are tested
+            seq = seq if i % 3 else REFERENCE[:length - 1] + 'N' * (i % 2)
+            qual = ''.join(chr(33 + q) for q in rng.integers(2, 41, len(seq)))
+            w.write('@read{0}\n{1}\n+\n{2}\n'.format(i, seq, qual))
+    return str(path)
+
+
+def chunks(path):
+    # small buffers so that each chunk is only padded to its own longest read
+    return list(read_sequences.iter_fastq(path, chunk_reads=40, buffer_size=512))
+
+
+def test_chunks_have_different_widths(mixed_length_fastq):
+    widths = {c.seq_table.shape[1] for c in chunks(mixed_length_fastq)}
+    assert len(widths) > 1
+
+
+@pytest.mark.parametrize('method', ['counts', 'freq', 'bits'])
+def test_seq_dist_matches_full_table(mixed_length_fastq, method):
+    st = read_sequences.read_fastq(mixed_length_fastq)
+    parts = chunks(mixed_length_fastq)
+    first = accumulators.seq_dist_accumulator()
+    second = accumulators.seq_dist_accumulator()
+    for c in parts[::-1][:1]:
+        first.update(c)
+    for c in parts[:-1]:
+        second.update(c)
+    merged = accumulators.merge_accumulators([second, first])
+    expected = st.get_seq_dist(method=method)
+    assert merged.result(method).equals(expected)
+
+
+def test_seq_dist_positions_and_weights(mixed_length_fastq):
+    st = read_sequences.read_fastq(mixed_length_fastq)
+    acc = accumulators.seq_dist_accumulator(positions=[3, 10, 20])
+    for c in chunks(mixed_length_fastq):
+        acc.update(c.collapse())
+    result = acc.result()
+    expected = st.get_seq_dist(positions=[3, 10, 20])
+    assert list(result.columns) == [3, 10, 20]
+    assert (result.values == expected.values).all()
+
+
+def test_mutation_profile_matches_full_table(mixed_length_fastq):
+    st = read_sequences.read_fastq(mixed_length_fastq)
+    acc = accumulators.mutation_profile_accumulator(REFERENCE)
+    for c in chunks(mixed_length_fastq):
+        acc.update(c)
+    assert acc.result().equals(st.mutation_profile(REFERENCE))
+    positions = list(range(4, 18))
+    acc = accumulators.mutation_profile_accumulator(REFERENCE, positions=positions, set_diff=True)
+    for c in chunks(mixed_length_fastq):
+        acc.update(c)
+    assert acc.result().equals(st.mutation_profile(REFERENCE, positions=positions, set_diff=True))
+
+
+@pytest.mark.parametrize('exclude_null_quality', [True, False])
+def test_quality_dist_matches_full_table(mixed_length_fastq, exclude_null_quality):
+    st = read_sequences.read_fastq(mixed_length_fastq)
+    acc = accumulators.quality_dist_accumulator()
+    for c in chunks(mixed_length_fastq):
+        acc.update(c)
+    result = acc.result(bins='even', exclude_null_quality=exclude_null_quality)
+    expected = st.get_quality_dist(bins='even', exclude_null_quality=exclude_null_quality)
+    assert result[1].equals(expected[1])
+    assert np.allclose(result[2].values.astype(float), expected[2].values.astype(float))
+
+
+def test_sequence_counts_match_collapse(mixed_length_fastq):
+    collapsed = read_sequences.read_fastq(mixed_length_fastq).collapse()
+    acc = accumulators.read_count_accumulator(keep_sequences=True)
+    for c in chunks(mixed_length_fastq):
+        acc.update(c)
+    counts = acc.sequence_counts()
+    assert acc.result().to_dict() == {'rows': 120, 'reads': 120}
+    assert counts.values.tolist() == collapsed.counts.values.tolist()
+    assert [k.decode() for k in counts.index] == [s.decode().rstrip('N') for s in collapsed.seq_df.seqs]
+
+
+def test_merged_workers_match_full_table(mixed_length_fastq):
+    st = read_sequences.read_fastq(mixed_length_fastq)
+    parts = chunks(mixed_length_fastq)
+    workers = []
+    for c in parts:
+        acc = (
+            accumulators.mutation_profile_accumulator(REFERENCE, ref_start=-2),
+            accumulators.quality_dist_accumulator(),
+            accumulators.read_count_accumulator(keep_sequences=True)
+        )
+        for a in acc:
+            a.update(c)
+        workers.append(acc)
+    (mutations, quality, reads) = [accumulators.merge_accumulators(w) for w in zip(*workers)]
+    assert mutations.result().equals(st.mutation_profile(REFERENCE, ref_start=-2))
+    assert quality.result(exclude_null_quality=False)[1].equals(st.get_quality_dist(exclude_null_quality=False)[1])
+    assert reads.sequence_counts().values.tolist() == st.collapse().counts.values.tolist()
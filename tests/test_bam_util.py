@@ -0,0 +1,28 @@
+import struct
+import numpy as np
+import pytest
+from seqtables import bam_util
+
+
+def fake_records(sizes):
+    # block_size followed by block_size bytes (only the sizes matter to bam_record_offsets)
+    return b''.join(struct.pack('<i', s) + bytes([i % 256]) * s for i, s in enumerate(sizes))
+
+
+def test_record_offsets():
+    sizes = [40, 100, 33, 250, 64]
+    data = fake_records(sizes)
+    (offsets, consumed) = bam_util.bam_record_offsets(data)
+    assert offsets.tolist() == (np.cumsum([0] + [s + 4 for s in sizes[:-1]])).tolist()
+    assert consumed == len(data)
+    # records that are not complete, or that start after end, are not returned
+    (offsets, consumed) = bam_util.bam_record_offsets(data[:-10])
+    assert offsets.shape[0] == 4 and consumed == len(data) - 68
+    (offsets, consumed) = bam_util.bam_record_offsets(data, start=44, end=150)
+    assert offsets.tolist() == [44, 148]
+    assert bam_util.bam_record_offsets(b'')[0].shape == (0,)
+
+
+def test_invalid_block_size():
+    with pytest.raises(Exception):
+        bam_util.bam_record_offsets(fake_records([40]) + struct.pack('<i', -4) + b'\\x00' * 40)
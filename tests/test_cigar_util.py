@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from seqtables import cigar_util, read_sequences
+from file_util import sam_text, write_text, write_bam
+
+REFERENCES = [('chrA', 100)]
+# name, flag, ref, pos, cigar, seq, qual
+RECORDS = [
+    ('r0', 0, 'chrA', 3, '2S4M', 'TTACGT', 'IIABCD'),
+    ('r1', 0, 'chrA', 4, '2M1I2M1S', 'CGAATG', 'EFGHIJ'),
+    ('r2', 0, 'chrA', 2, '2M2D2M', 'AAGG', 'KLMN'),
+    # secondary alignments do not store their bases
+    ('r3', 256, 'chrA', 5, '4M', '*', '*'),
+]
+
+
+def to_strings(matrix):
+    return [bytes(row).decode() for row in matrix.astype(np.uint8)]
+
+
+def test_parse_cigar_strings():
+    read_idx, ops, lens = cigar_util.parse_cigar_strings(['2S4M', '*', '12M1D103M'])
+    assert read_idx.tolist() == [0, 0, 2, 2, 2]
+    assert [cigar_util.CIGAR_OPS[o] for o in ops] == ['S', 'M', 'M', 'D', 'M']
+    assert lens.tolist() == [2, 4, 12, 1, 103]
+
+
+@pytest.fixture(params=['sam', 'bam'])
+def aligned_file(request, tmp_path):
+    if request.param == 'sam':
+        return (read_sequences.read_sam, write_text(tmp_path / 'a.sam', sam_text(REFERENCES, RECORDS)))
+    return (read_sequences.read_bam, write_bam(tmp_path / 'a.bam', REFERENCES, RECORDS))
+
+
+def test_project_cigar(aligned_file):
+    read, path = aligned_file
+    st, insertions = read(path, project_cigar=True, return_insertions=True)
+    assert list(st.seq_table.columns) == list(range(2, 8))
+    assert to_strings(st.seq_table.values) == ['NACGTN', 'NNCGAT', 'AA--GG', 'NNNNNN']
+    assert to_strings(st.qual_table.values + 33) == ['!ABCD!', '!!EFHI', 'KL!!MN', '!!!!!!']
+    assert insertions[['read', 'ref_pos', 'seq']].values.tolist() == [['r1', 6, 'A']]
+
+
+def test_cleave_softclip(aligned_file):
+    read, path = aligned_file
+    st = read(path, cleave_softclip=True)
+    assert to_strings(st.seq_table.values) == ['ACGTN', 'CGAAT', 'AAGGN', 'NNNNN']
+    assert to_strings(st.qual_table.values + 33) == ['ABCD!', 'EFGHI', 'KLMN!', '!!!!!']
+
+
+def test_project_to_reference_skips_reads_without_bases():
+    read_idx, ops, lens = cigar_util.parse_cigar_strings(['2M', '4M'])
+    seq_buf = np.frombuffer(b'AC', dtype=np.uint8)
+    seqs, quals, ref_min = cigar_util.project_to_reference(
+        seq_buf, np.array([0, 2]), None, None, np.array([1, 1]), read_idx, ops, lens, 2, seq_lens=np.array([2, 0])
+    )
+    assert ref_min == 1 and quals is None
+    assert seqs.tolist() == [[ord('A'), ord('C')], [ord('N'), ord('N')]]
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+from seqtables.seq_tables import seqtable
+
+# duplicated reads have the same qualities, so the mean quality of each unique sequence is exact
+READS = [('ACGTA', 'IIIII'), ('ACGTA', 'IIIII'), ('ACCTA', '#5?II'), ('TTGTN', 'II#I!'), ('ACGTA', 'IIIII'), ('ACCTA', '#5?II'), ('GCGTA', '55555')]
+REFERENCE = 'ACGTA'
+
+
+def tables():
+    st = seqtable([s for s, _ in READS], [q for _, q in READS])
+    return st, st.collapse()
+
+
+def test_collapse():
+    st, collapsed = tables()
+    assert [bytes(r).decode() for r in collapsed.seq_table.values] == ['ACGTA', 'ACCTA', 'TTGTN', 'GCGTA']
+    assert collapsed.counts.tolist() == [3, 2, 1, 1]
+    assert collapsed.counts.sum() == len(st)
+    # collapsing again only adds together the rows that become identical
+    assert collapsed.collapse().counts.tolist() == [3, 2, 1, 1]
+    assert collapsed.loc[:, 4:5].collapse().counts.tolist() == [6, 1]
+
+
+def test_collapsed_results_match_the_reads():
+    st, collapsed = tables()
+    pd.testing.assert_frame_equal(collapsed.get_seq_dist(), st.get_seq_dist(), check_dtype=False)
+    pd.testing.assert_frame_equal(collapsed.get_seq_dist(method='freq'), st.get_seq_dist(method='freq'))
+    pd.testing.assert_series_equal(collapsed.mutation_profile(REFERENCE), st.mutation_profile(REFERENCE))
+    assert collapsed.get_consensus() == st.get_consensus()
+    assert collapsed.get_consensus(modecutoff=0.55, degenerate=True) == st.get_consensus(modecutoff=0.55, degenerate=True)
+    pd.testing.assert_series_equal(collapsed.pos_entropy(), st.pos_entropy())
+    pd.testing.assert_frame_equal(collapsed.get_substrings(2), st.get_substrings(2), check_dtype=False)
+    for expected, result in zip(st.get_quality_dist()[1:], collapsed.get_quality_dist()[1:]):
+        pd.testing.assert_frame_equal(result, expected)
+
+
+def test_counts_follow_row_selections():
+    _, collapsed = tables()
+    subset = collapsed.iloc[[2, 0]]
+    assert subset.counts.tolist() == [1, 3]
+    assert subset.counts.index.equals(subset.seq_table.index)
+    filtered = collapsed.quality_filter(q=30, p=100)
+    assert filtered.counts.tolist() == [3]
+    collapsed.quality_filter(q=20, p=80, inplace=True)
+    assert collapsed.counts.tolist() == [3, 2, 1]
+    assert collapsed.get_seq_dist().sum().tolist() == [6] * 5
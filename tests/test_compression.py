@@ -0,0 +1,71 @@
+import gzip
+import numpy as np
+import pandas as pd
+import pytest
+from seqtables import parse_util, read_sequences
+from file_util import bgzf_compress, fastq_text, sam_text, write_text
+
+COMPRESSIONS = [None, 'gzip', 'bgzf']
+
+
+def random_reads(n, seed=0):
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(30, 90, n)
+    seqs = [''.join(rng.choice(list('ACGTN'), l)) for l in lengths]
+    quals = [''.join(rng.choice(list('#+5?I'), l)) for l in lengths]
+    return ['read{0} 1:N:0:1'.format(i) for i in range(n)], seqs, quals
+
+
+def test_detect_compression(tmp_path):
+    assert parse_util.detect_compression(write_text(tmp_path / 'a.txt', 'ACGT\n')) is None
+    assert parse_util.detect_compression(write_text(tmp_path / 'a.gz', 'ACGT\n', 'gzip')) == 'gzip'
+    assert parse_util.detect_compression(write_text(tmp_path / 'a.bgz', 'ACGT\n', 'bgzf')) == 'bgzf'
+
+
+@pytest.mark.parametrize('threads', [1, 3])
+def test_bgzf_buffers(tmp_path, threads):
+    data = fastq_text(*random_reads(300)).encode()
+    path = tmp_path / 'reads.fq.bgz'
+    path.write_bytes(bgzf_compress(data, block_size=1000))
+    # buffer_size is smaller than a group of blocks, so blocks are inflated in several groups
+    buffers = list(parse_util.iter_bgzf_buffers(str(path), buffer_size=2000, threads=threads))
+    assert len(buffers) > 1
+    assert b''.join(buffers) == data
+    assert b''.join(parse_util.iter_buffers(str(path), buffer_size=2000, threads=threads)) == data
+
+
+def test_gzip_buffers(tmp_path):
+    data = fastq_text(*random_reads(300)).encode()
+    path = tmp_path / 'reads.fq.gz'
+    # a file with several gzip members (i.e. files that were concatenated)
+    path.write_bytes(gzip.compress(data[:5000]) + gzip.compress(data[5000:]))
+    buffers = list(parse_util.iter_gzip_buffers(str(path), buffer_size=4096))
+    assert len(buffers) > 1
+    assert b''.join(buffers) == data
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_read_fastq(tmp_path, compression):
+    names, seqs, quals = random_reads(300)
+    path = write_text(tmp_path / 'reads.fq', fastq_text(names, seqs, quals), compression, block_size=1500)
+    st = read_sequences.read_fastq(path, buffer_size=2048)
+    assert list(st.index) == names
+    assert st.seq_df.seqs.tolist() == [s.ljust(st.seq_table.shape[1], 'N').encode() for s in seqs]
+    assert [bytes(r[:len(q)] + 33).decode() for r, q in zip(st.qual_table.values, quals)] == quals
+    assert len(read_sequences.read_fastq(path, limit=10, buffer_size=2048)) == 10
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_read_sam(tmp_path, compression):
+    names, seqs, quals = random_reads(200)
+    records = [(n.split()[0], 0, 'chrA', 10 + i, '{0}M'.format(len(s)), s, q) for i, (n, s, q) in enumerate(zip(names, seqs, quals))]
+    path = write_text(tmp_path / 'reads.sam', sam_text([('chrA', 1000)], records), compression, block_size=1500)
+    expected = read_sequences.read_sam(write_text(tmp_path / 'plain.sam', sam_text([('chrA', 1000)], records)))
+    st = read_sequences.read_sam(path)
+    assert list(st.index) == [r[0] for r in records]
+    pd.testing.assert_frame_equal(st.seq_table, expected.seq_table)
+    pd.testing.assert_frame_equal(st.qual_table, expected.qual_table)
+    assert st.seq_df.seqs.tolist() == [s.ljust(st.seq_table.shape[1], 'N').encode() for s in seqs]
+    projected = read_sequences.read_sam(path, project_cigar=True)
+    assert projected.seq_table.columns[0] == 10
+    assert bytes(projected.seq_table.values[5, 5:5 + len(seqs[5])]).decode() == seqs[5]
@@ -0,0 +1,71 @@
+import itertools
+from collections import Counter
+import numpy as np
+import pandas as pd
+import pytest
+from seqtables.seq_tables import seqtable
+
+SEQS = ['ACGTA', 'ACGAA', 'TCCTA', 'TGCAA', 'AC-TA', 'TGCTA', 'ACGTA']
+WEIGHTS = np.array([1, 2, 0.5, 1, 3, 1, 2])
+
+
+def entropy(counts):
+    p = np.array(list(counts.values()), dtype=np.float64)
+    p = p[p > 0] / p.sum()
+    return -(p * np.log2(p)).sum()
+
+
+def brute_force_mi(seqs, i, j, weights, ignore=''):
+    joint, a, b = Counter(), Counter(), Counter()
+    for seq, w in zip(seqs, weights):
+        if seq[i] in ignore or seq[j] in ignore:
+            continue
+        joint[(seq[i], seq[j])] += w
+        a[seq[i]] += w
+        b[seq[j]] += w
+    return entropy(a) + entropy(b) - entropy(joint)
+
+
+@pytest.mark.parametrize('chunk_rows', [None, 2])
+def test_pairwise_cooccurrence(chunk_rows):
+    st = seqtable(SEQS)
+    counts = st.pairwise_cooccurrence(chunk_rows=chunk_rows, weights=WEIGHTS)
+    for i, j in itertools.product(range(5), repeat=2):
+        expected = Counter()
+        for seq, w in zip(SEQS, WEIGHTS):
+            expected[(seq[i], seq[j])] += w
+        block = counts.loc[i + 1, j + 1]
+        assert {(x, y): v for x, row in block.iterrows() for y, v in row.items() if v} == pytest.approx(dict(expected))
+    # letters that are ignored are not counted
+    ignored = st.pairwise_cooccurrence(positions=[2, 3], ignore_characters=['-'], chunk_rows=chunk_rows)
+    assert '-' not in ignored.index.get_level_values('letter')
+    assert ignored.loc[(3, 'G'), (2, 'C')] == 3
+
+
+@pytest.mark.parametrize('chunk_rows', [None, 3])
+def test_mutual_information(chunk_rows):
+    st = seqtable(SEQS)
+    for weights in [np.ones(len(SEQS)), WEIGHTS]:
+        mi = st.mutual_information(weights=weights, chunk_rows=chunk_rows)
+        for i, j in itertools.product(range(5), repeat=2):
+            assert mi.iloc[i, j] == pytest.approx(brute_force_mi(SEQS, i, j, weights))
+    mi = st.mutual_information(ignore_characters=['-'], chunk_rows=chunk_rows)
+    for i, j in itertools.product(range(5), repeat=2):
+        assert mi.iloc[i, j] == pytest.approx(brute_force_mi(SEQS, i, j, np.ones(len(SEQS)), '-'))
+
+
+def test_average_product_correction():
+    st = seqtable(SEQS)
+    mi = st.mutual_information().values
+    corrected = st.mutual_information(apc=True).values
+    assert np.isnan(np.diag(corrected)).all()
+    off_diagonal = ~np.eye(5, dtype=bool)
+    raw = np.where(off_diagonal, mi, np.nan)
+    means = np.nanmean(raw, axis=1)
+    expected = mi - np.outer(means, means) / np.nanmean(raw)
+    np.testing.assert_allclose(corrected[off_diagonal], expected[off_diagonal])
+    # positions that never change share no information, the correction must not divide by zero
+    with np.errstate(all='raise'):
+        constant = seqtable(['ACGT', 'ACGT', 'ACGT']).mutual_information(apc=True)
+    assert (constant.values[~np.eye(4, dtype=bool)] == 0).all()
+    assert np.isnan(seqtable(['A', 'C']).mutual_information(apc=True).values).all()
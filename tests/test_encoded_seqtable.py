@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+from seqtables.encoded_seqtable import encoded_seqtable
+from seqtables.seq_tables import seqtable
+
+SEQS = ['ACGTN', 'ACCTA', 'TTZTT', 'GA-CA']
+QUALS = ['IIIII', '#####', 'IIIII', 'I#I#I']
+
+
+def test_letters_outside_the_alphabet_are_added():
+    st = encoded_seqtable(SEQS, QUALS)
+    assert st.alphabet[-1] == ord('Z')
+    assert (st.alphabet[st.codes] == seqtable(SEQS).seq_table.values).all()
+    pd.testing.assert_frame_equal(st.seq_table, seqtable(SEQS, QUALS).seq_table)
+    pd.testing.assert_frame_equal(st.get_seq_dist(), seqtable(SEQS).get_seq_dist(), check_dtype=False)
+    pd.testing.assert_frame_equal(st.get_seq_dist(positions=[3, 1]), seqtable(SEQS).get_seq_dist(positions=[3, 1]), check_dtype=False)
+
+
+def test_missing_positions_raise():
+    st = encoded_seqtable(['ACGT', 'ACGA'])
+    with pytest.raises(KeyError):
+        st.get_seq_dist(positions=[1, 9])
+    with pytest.raises(KeyError):
+        seqtable(['ACGT', 'ACGA']).get_seq_dist(positions=[1, 9])
+
+
+def test_compare_to_reference_and_hamming_distance():
+    st, ref = encoded_seqtable(SEQS), 'ACGTA'
+    pd.testing.assert_frame_equal(st.compare_to_reference(ref), seqtable(SEQS).compare_to_reference(ref), check_names=False)
+    assert st.hamming_distance(ref).tolist() == seqtable(SEQS).hamming_distance(ref).tolist() == [1, 1, 4, 4]
+
+
+def test_translate():
+    # ATG TAA AAR / TGG TGA NNN: stop codons are '*', degenerate codons are X
+    aa = encoded_seqtable(['ATGTAAAAR', 'TGGTGANNN', 'GCTGCCGCA'], ['I' * 9] * 3).translate()
+    assert aa.seqtype == 'AA' and aa.qual_table is None
+    assert list(aa.columns) == [1, 2, 3]
+    assert [bytes(r).decode() for r in aa.seq_table.values.astype(np.uint8)] == ['M*X', 'W*X', 'AAA']
+    assert aa.get_seq_dist().loc['X'].tolist() == [0, 0, 2]
+    assert encoded_seqtable(['CATGTT']).translate(frame=1).seq_table.values.tolist() == [[ord('M')]]
+    with pytest.raises(Exception):
+        aa.translate()
+
+
+def test_slice_object():
+    st = encoded_seqtable(SEQS, QUALS, index=['a', 'b', 'c', 'd'])
+    rows = st.iloc[[3, 1]]
+    assert isinstance(rows, encoded_seqtable)
+    assert list(rows.index) == ['d', 'b']
+    pd.testing.assert_frame_equal(rows.seq_table, st.seq_table.iloc[[3, 1]])
+    pd.testing.assert_frame_equal(rows.qual_table, st.qual_table.iloc[[3, 1]])
+    assert st.iloc[1:3].hamming_distance('ACGTA').tolist() == [1, 4]
+    # column selections are made on the decoded table
+    cols = st.loc[:, 2:3]
+    assert list(cols.seq_table.columns) == [2, 3]
+    pd.testing.assert_frame_equal(cols.seq_table, seqtable(SEQS, QUALS, index=['a', 'b', 'c', 'd']).loc[:, 2:3].seq_table)
+    # the original table is not modified
+    assert st.codes.shape == (4, 5)
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+from seqtables import read_sequences
+from seqtables.lazy_seqtable import lazy_fastq_seqtable
+from file_util import fastq_text, write_text
+
+SEQS = ['ACGTACGT', 'ACGAAC', 'TTTTACGTAA', 'GGCA', 'ACGTNCGT', 'CCCCCCCC']
+
+
+@pytest.fixture
+def fastq(tmp_path):
+    names = ['read{0} extra'.format(i) for i in range(len(SEQS))]
+    return write_text(tmp_path / 'a.fastq', fastq_text(names, SEQS, ['I' * len(s) for s in SEQS]))
+
+
+def test_iloc_and_subsample(fastq):
+    lz = read_sequences.read_fastq(fastq, lazy=True)
+    st = read_sequences.read_fastq(fastq)
+    assert isinstance(lz, lazy_fastq_seqtable)
+    rows = lz.iloc[[4, 1]]
+    assert isinstance(rows, lazy_fastq_seqtable)
+    pd.testing.assert_frame_equal(rows.seq_table, st.seq_table.iloc[[4, 1]])
+    pd.testing.assert_frame_equal(rows.qual_table, st.qual_table.iloc[[4, 1]])
+    pd.testing.assert_frame_equal(lz.iloc[1:3, 2:5].seq_table, st.seq_table.iloc[1:3, 2:5])
+    np.random.seed(0)
+    sample = lz.subsample(3)
+    assert isinstance(sample, lazy_fastq_seqtable) and len(sample) == 3
+    pd.testing.assert_frame_equal(sample.seq_table, st.seq_table.loc[sample.index])
+
+
+def test_column_selection(fastq):
+    lz = read_sequences.read_fastq(fastq, lazy=True)
+    st = read_sequences.read_fastq(fastq)
+    pd.testing.assert_frame_equal(lz[[2, 5]].seq_table, st.seq_table[[2, 5]])
+    pd.testing.assert_frame_equal(lz[3:5].seq_table, st[3:5].seq_table)
+    pd.testing.assert_frame_equal(lz[4].seq_table, st[4].seq_table)
+    with pytest.raises(KeyError):
+        lz[[2, 50]]
+
+
+def test_positions_do_not_decode_headers(fastq, monkeypatch):
+    lz = read_sequences.read_fastq(fastq, lazy=True)
+    expected = read_sequences.read_fastq(fastq).get_seq_dist(positions=[3, 7])
+
+    def fail(self, rows):
+        raise AssertionError('the headers were decoded')
+
+    monkeypatch.setattr(lazy_fastq_seqtable, '_decode_headers', fail)
+    pd.testing.assert_frame_equal(lz.get_seq_dist(positions=[3, 7]), expected, check_dtype=False)
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from seqtables import packed_seqtable as packed_module
+from seqtables.packed_seqtable import packed_seqtable
+from seqtables.seq_tables import seqtable
+
+# widths that are not a multiple of 4, letters that are stored as exceptions, and a reference letter that is not A, C, G or T
+SEQS = ['ACGTNACGT', 'ACCTAACGA', 'TTTTTTTTT', 'GANCA-CGT', 'ACGTAACGT', 'RCGTAACGT', 'ACGTAACGT']
+REFERENCES = ['ACGTAACGT', 'ACNTAACGT', 'TTTT']
+
+
+def test_row_selection_does_not_copy_the_table(monkeypatch):
+    st = packed_seqtable(['ACGTN', 'ACCTA', 'TTTTT', 'GANCA'], qualitydata=['IIIII', '#####', 'IIIII', 'I#I#I'])
+    def fail(self):
+        raise AssertionError('the full table was copied')
+
+    monkeypatch.setattr(packed_seqtable, 'copy', fail)
+    subset = st.iloc[[3, 1]]
+    assert subset.seq_df.seqs.tolist() == [b'GANCA', b'ACCTA']
+    assert subset.qual_table.values.tolist() == st.qual_table.values[[3, 1]].tolist()
+    assert st.iloc[1:3].seq_df.seqs.tolist() == [b'ACCTA', b'TTTTT']
+    # the original table is not modified
+    assert len(st) == 4
+    assert st.seq_df.seqs.tolist() == [b'ACGTN', b'ACCTA', b'TTTTT', b'GANCA']
+
+
+def test_quality_filter_and_subsample():
+    st = packed_seqtable(['ACGTN', 'ACCTA', 'TTTTT', 'GANCA'], qualitydata=['IIIII', '#####', 'IIIII', 'I#I#I'])
+    filtered = st.quality_filter(q=30, p=100)
+    assert filtered.seq_df.seqs.tolist() == [b'ACGTN', b'TTTTT']
+    assert isinstance(filtered, packed_seqtable)
+    np.random.seed(0)
+    assert len(st.subsample(2)) == 2
+
+
+@pytest.mark.parametrize('reference', REFERENCES)
+@pytest.mark.parametrize('positions', [None, [2, 5, 9], [1]])
+def test_kernels_match_seqtable(reference, positions):
+    st, packed = seqtable(SEQS), packed_seqtable(SEQS)
+    assert packed.hamming_distance(reference, positions).tolist() == st.hamming_distance(reference, positions).tolist()
+    pd.testing.assert_frame_equal(packed.compare_to_reference(reference, positions), st.compare_to_reference(reference, positions), check_names=False)
+    pd.testing.assert_frame_equal(
+        packed.compare_to_reference(reference, positions, flip=True, treat_as_true=['N']),
+        st.compare_to_reference(reference, positions, flip=True, treat_as_true=['N'])
+    )
+    pd.testing.assert_series_equal(packed.mutation_profile(reference, positions), st.mutation_profile(reference, positions))
+    pd.testing.assert_series_equal(
+        packed.mutation_profile(reference, positions, ignore_characters=['N'], normalized=True),
+        st.mutation_profile(reference, positions, ignore_characters=['N'], normalized=True)
+    )
+
+
+def test_get_seq_dist_matches_seqtable():
+    st, packed = seqtable(SEQS), packed_seqtable(SEQS)
+    weights = np.arange(1, len(SEQS) + 1)
+    pd.testing.assert_frame_equal(packed.get_seq_dist(), st.get_seq_dist(), check_dtype=False)
+    pd.testing.assert_frame_equal(packed.get_seq_dist(positions=[9, 3]), st.get_seq_dist(positions=[9, 3]), check_dtype=False)
+    pd.testing.assert_frame_equal(packed.get_seq_dist(weight_by=weights), st.get_seq_dist(weight_by=weights), check_dtype=False)
+    pd.testing.assert_frame_equal(packed.get_seq_dist(chunk_rows=2), st.get_seq_dist(), check_dtype=False)
+    collapsed = st.collapse()
+    pd.testing.assert_series_equal(packed_seqtable.from_seqtable(collapsed).mutation_profile('ACGTAACGT'), collapsed.mutation_profile('ACGTAACGT'))
+
+
+def test_sequences_are_decoded_at_most_once(monkeypatch):
+    packed = packed_seqtable(SEQS)
+    calls = []
+    unpack = packed_module.unpack_nucleotides
+
+    def spy(*args, **kwargs):
+        calls.append(1)
+        return unpack(*args, **kwargs)
+
+    monkeypatch.setattr(packed_module, 'unpack_nucleotides', spy)
+    packed.mutation_profile('ACGTAACGT')
+    assert len(calls) == 0
+    packed.compare_to_reference('ACGTAACGT', treat_as_true=['N'])
+    assert len(calls) == 1
+    packed.mutation_profile('ACGTAACGT', treat_as_true=['N'])
+    assert len(calls) == 2
@@ -0,0 +1,45 @@
+import numpy as np
+from seqtables import parse_util
+
+
+def expected_matrix(buf, starts, lengths, fillvalue, width):
+    matrix = np.full((len(starts), width), fillvalue, dtype=np.uint8)
+    for row, (start, length) in enumerate(zip(starts, lengths)):
+        length = min(length, width)
+        matrix[row, :length] = buf[start:start + length]
+    return matrix
+
+
+def test_fill_matrix_copies_rows_in_chunks(monkeypatch):
+    monkeypatch.setattr(parse_util, 'FILL_CHUNK_SIZE', 100)
+    rng = np.random.default_rng(0)
+    buf = rng.integers(65, 91, 10000).astype(np.uint8)
+    lengths = rng.integers(0, 250, 300)
+    starts = rng.integers(0, 10000 - 250, 300)
+    assert (parse_util.fill_matrix(buf, starts, lengths, 'N') == expected_matrix(buf, starts, lengths, ord('N'), lengths.max())).all()
+    assert (parse_util.fill_matrix(buf, starts, lengths, 0, 30) == expected_matrix(buf, starts, lengths, 0, 30)).all()
+    assert parse_util.fill_matrix(buf, starts[:0], lengths[:0], 'N').shape == (0, 0)
+
+
+def test_matrix_builder_grows_and_widens():
+    rng = np.random.default_rng(1)
+    blocks = [rng.integers(0, 255, (rng.integers(0, 50), rng.integers(1, 20))).astype(np.uint8) for _ in range(40)]
+    builder = parse_util.MatrixBuilder('N')
+    for block in blocks:
+        builder.append(block)
+    result = builder.result()
+    width = max(b.shape[1] for b in blocks)
+    expected = np.concatenate([np.pad(b, ((0, 0), (0, width - b.shape[1])), constant_values=ord('N')) for b in blocks])
+    assert result.shape == expected.shape
+    assert (result == expected).all()
+    assert (parse_util.stack_matrices(blocks, 'N') == expected).all()
+
+
+def test_read_fastq_arrays_across_buffers():
+    records = ''.join('@read{0}\n{1}\n+\n{2}\n'.format(i, 'ACGT' * (i % 5 + 1), 'I' * (4 * (i % 5 + 1))) for i in range(100)).encode()
+    buffers = [records[i:i + 97] for i in range(0, len(records), 97)]
+    (headers, seqs, quals) = parse_util.read_fastq_arrays(buffers)
+    assert seqs.shape == (100, 20)
+    assert parse_util.matrix_to_strings(headers).tolist() == ['read{0}'.format(i) for i in range(100)]
+    assert seqs[1].tobytes() == b'ACGTACGT' + b'N' * 12
+    assert quals[4].tobytes() == b'I' * 20
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from seqtables import seq_table_util
+
+PERCENTILES = [0, 5, 10, 25, 33, 50, 75, 90, 100]
+BINS = [1, (2, 4), (5, 12), (13, 20)]
+
+
+@pytest.fixture
+def quals():
+    rng = np.random.default_rng(3)
+    # include null qualities (0) so that exclude_null_quality changes the result
+    values = rng.integers(0, 42, (300, 20))
+    values[rng.random(values.shape) < 0.2] = 0
+    return values
+
+
+def expected_stats(values, first, last, weights, exclude_null_quality):
+    # raw qualities of every read within the bin (each read repeated by its weight)
+    raw = values[:, first - 1:last]
+    if weights is not None:
+        raw = np.repeat(raw, weights, axis=0)
+    raw = raw.ravel()
+    if exclude_null_quality:
+        raw = raw[raw > 0]
+    return np.percentile(raw, PERCENTILES), raw.mean()
+
+
+@pytest.mark.parametrize('exclude_null_quality', [True, False])
+@pytest.mark.parametrize('weighted', [False, True])
+def test_matches_np_percentile(quals, exclude_null_quality, weighted):
+    weights = np.random.default_rng(4).integers(1, 6, quals.shape[0]) if weighted else None
+    hist = seq_table_util.quality_histogram(quals, weights)
+    columns = list(range(1, quals.shape[1] + 1))
+    (_, dist, summary) = seq_table_util.quality_dist_from_histogram(hist, columns, BINS, PERCENTILES, exclude_null_quality)
+    assert list(dist.columns) == ['1', '2-4', '5-12', '13-20']
+    for name, b in zip(dist.columns, BINS):
+        (first, last) = (b, b) if isinstance(b, int) else b
+        (percentiles, mean) = expected_stats(quals, first, last, weights, exclude_null_quality)
+        np.testing.assert_allclose(dist[name].values, percentiles)
+        np.testing.assert_allclose(summary.loc['mean', name], mean)
+    assert list(dist.index) == [str(p) + '%' for p in PERCENTILES]
+
+
+def test_weighted_percentile():
+    rng = np.random.default_rng(5)
+    values = rng.integers(0, 40, 50)
+    weights = rng.integers(1, 10, 50)
+    np.testing.assert_allclose(
+        seq_table_util.weighted_percentile(values, weights, PERCENTILES), np.percentile(np.repeat(values, weights), PERCENTILES)
+    )
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+from seqtables import read_sequences
+from seqtables.seq_tables import seqtable
+from seqtables.packed_seqtable import packed_seqtable
+from seqtables.encoded_seqtable import encoded_seqtable
+from file_util import fastq_text, write_text
+
+SEQS = ['ACGTA', 'ACCTA', 'TTTTT', 'GANCA']
+QUALS = ['IIIII', '#####', 'II#II', 'I#I#I']
+
+
+def test_convert_low_bases_to_null_shares_memory():
+    st = seqtable(SEQS, QUALS)
+    before = st.seq_table.values.copy()
+    converted = st.convert_low_bases_to_null(20)
+    assert [bytes(r).decode() for r in converted.seq_table.values] == ['ACGTA', 'NNNNN', 'TTNTT', 'GNNNA']
+    # the original table is not modified and the qualities are shared
+    assert (st.seq_table.values == before).all()
+    assert np.shares_memory(converted.qual_table.values, st.qual_table.values)
+    # no base is converted, so the sequences are shared too
+    unchanged = st.convert_low_bases_to_null(1)
+    assert np.shares_memory(unchanged.seq_table.values, st.seq_table.values)
+    assert converted.convert_low_bases_to_null(20, replace_with='X').seq_table.equals(
+        st.convert_low_bases_to_null(20, replace_with='X').seq_table
+    )
+
+
+def test_convert_low_bases_to_null_read_only_arrays():
+    seqs = seqtable(SEQS).seq_table.values.copy()
+    seqs.setflags(write=False)
+    quals = seqtable(SEQS, QUALS).qual_table.values.copy()
+    quals.setflags(write=False)
+    st = seqtable(seqs)
+    st.qual_table = pd.DataFrame(quals, index=st.seq_table.index, columns=st.seq_table.columns)
+    st.convert_low_bases_to_null(20, inplace=True)
+    assert [bytes(r).decode() for r in st.seq_table.values] == ['ACGTA', 'NNNNN', 'TTNTT', 'GNNNA']
+    assert [bytes(r).decode() for r in seqs] == SEQS
+
+
+@pytest.fixture
+def lazy_table(tmp_path):
+    path = write_text(tmp_path / 'a.fastq', fastq_text(['r{0}'.format(i) for i in range(4)], SEQS, QUALS))
+    return read_sequences.read_fastq(path, lazy=True)
+
+
+@pytest.mark.parametrize('kind', ['seqtable', 'packed', 'encoded', 'lazy'])
+def test_quality_filter_inplace(kind, lazy_table):
+    def make():
+        if kind == 'lazy':
+            return lazy_table.copy_lazy()
+        return {'seqtable': seqtable, 'packed': packed_seqtable, 'encoded': encoded_seqtable}[kind](SEQS, QUALS, index=['r0', 'r1', 'r2', 'r3'])
+
+    expected = make().quality_filter(q=30, p=80)
+    st = make()
+    cls = type(st)
+    assert st.quality_filter(q=30, p=80, inplace=True) is None
+    assert type(st) is cls
+    assert len(st) == 2
+    assert list(st.index) == ['r0', 'r2']
+    pd.testing.assert_frame_equal(st.seq_table, expected.seq_table)
+    pd.testing.assert_frame_equal(st.qual_table, expected.qual_table)
+    assert st.seq_df.seqs.tolist() == [b'ACGTA', b'TTTTT']
+    # the indexers use the filtered table
+    assert list(st.iloc[[1]].index) == ['r2']
@@ -0,0 +1,36 @@
+import pytest
+from seqtables.ragged_seqtable import ragged_seqtable
+
+
+@pytest.fixture
+def reads():
+    return ragged_seqtable(['ACGTACGT', 'ACG', 'ACGTA'], qualitydata=['IIIIIIII', '#I#', 'I#I#I'])
+
+
+def test_assigning_seq_table_keeps_qualities_and_lengths(reads):
+    (seqs, quals) = (reads.seq_table.copy(), reads.qual_table.copy())
+    reads.seq_table = reads.seq_table
+    assert reads.lengths.tolist() == [8, 3, 5]
+    assert reads.seq_table.equals(seqs)
+    assert reads.qual_table.equals(quals)
+
+
+def test_assigning_modified_seq_table(reads):
+    reads.seq_table = reads.seq_table.replace(ord('A'), ord('T'))
+    assert reads.lengths.tolist() == [8, 3, 5]
+    assert reads.seq_buffer.tobytes() == b'TCGTTCGT' + b'TCG' + b'TCGTT'
+    assert reads.qual_buffer is not None
+
+
+def test_assigning_seq_table_of_another_shape(reads):
+    with pytest.raises(Exception):
+        reads.seq_table = reads.seq_table.iloc[:2]
+    reads.qual_table = None
+    reads.seq_table = reads.seq_table.iloc[:2]
+    assert reads.lengths.tolist() == [8, 8]
+
+
+def test_mutation_profile_ignores_positions_past_the_end(reads):
+    profile = reads.mutation_profile('ACGTTCGT')
+    assert profile.to_dict() == {('T', 'A'): 2.0}
+    assert profile.equals(reads.pad().mutation_profile('ACGTTCGT', ignore_characters=['N']).dropna())
@@ -0,0 +1,94 @@
+import os
+import numpy as np
+import pytest
+from seqtables import read_sequences
+from file_util import write_text
+
+FILES = os.path.join(os.path.dirname(__file__), 'files')
+
+
+def read_expected(text):
+    # reference parser: headers are the text after '>', sequences are the uppercase concatenation of the following lines
+    records = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('>'):
+            records.append([line[1:], ''])
+        elif line:
+            records[-1][1] += line.upper()
+    return [h for h, _ in records], [s for _, s in records]
+
+
+def table_seqs(st):
+    return [b''.join(row).decode() for row in st.seq_table.values.view('S1')]
+
+
+def check(st, headers, seqs, fill='N'):
+    width = max(map(len, seqs))
+    assert list(st.seq_table.index) == headers
+    assert table_seqs(st) == [s.ljust(width, fill) for s in seqs]
+
+
+MULTI_LINE = (
+    '>seq1 first record\n'
+    'ACGTAC\n'
+    'GTac\n'
+    'gt\n'
+    '>seq2\n'
+    'TTTT\n'
+    '\n'
+    '>seq3 description with  spaces\n'
+    'AC\n'
+    '\n'
+    'GG\n'
+    '\n'
+)
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip', 'bgzf'])
+def test_multi_line_records(tmp_path, compression):
+    path = write_text(tmp_path / 'seqs.fa', MULTI_LINE, compression)
+    st = read_sequences.read_fasta(path)
+    check(st, ['seq1 first record', 'seq2', 'seq3 description with  spaces'], ['ACGTACGTACGT', 'TTTT', 'ACGG'])
+
+
+def test_crlf(tmp_path):
+    path = write_text(tmp_path / 'seqs.fa', MULTI_LINE.replace('\n', '\r\n'))
+    st = read_sequences.read_fasta(path)
+    check(st, ['seq1 first record', 'seq2', 'seq3 description with  spaces'], ['ACGTACGTACGT', 'TTTT', 'ACGG'])
+
+
+def test_missing_final_newline(tmp_path):
+    path = write_text(tmp_path / 'seqs.fa', '>a\nAC\nGT\n>b desc\nTTG')
+    check(read_sequences.read_fasta(path), ['a', 'b desc'], ['ACGT', 'TTG'])
+
+
+def test_amino_acids(tmp_path):
+    path = write_text(tmp_path / 'seqs.fa', '>p1\nMKV\nLA\n>p2\nmk\n')
+    st = read_sequences.read_fasta(path, seqtype='AA')
+    check(st, ['p1', 'p2'], ['MKVLA', 'MK'], fill='X')
+
+
+@pytest.mark.parametrize('buffer_size', [7, 64, 2 ** 20])
+def test_records_across_buffers(tmp_path, buffer_size):
+    text = MULTI_LINE.replace('\n', '\r\n') * 20
+    path = write_text(tmp_path / 'seqs.fa', text)
+    headers, seqs = read_expected(text)
+    check(read_sequences.read_fasta(path, buffer_size=buffer_size), headers, seqs)
+    check(read_sequences.read_fasta(path, limit=31, buffer_size=buffer_size), headers[:31], seqs[:31])
+
+
+def test_without_header_index(tmp_path):
+    path = write_text(tmp_path / 'seqs.fa', MULTI_LINE)
+    st = read_sequences.read_fasta(path, use_header_as_index=False)
+    assert list(st.seq_table.index) == [0, 1, 2]
+
+
+def test_r1_10k():
+    path = os.path.join(FILES, 'r1_10k.fa')
+    with open(path) as r:
+        headers, seqs = read_expected(r.read())
+    st = read_sequences.read_fasta(path, buffer_size=2 ** 16)
+    assert st.seq_table.shape == (10000, max(map(len, seqs)))
+    check(st, headers, seqs)
+    np.testing.assert_array_equal(read_sequences.read_fasta(path, limit=100).seq_table.values, st.seq_table.values[:100])
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+from seqtables import read_sequences
+from file_util import fastq_text, write_text
+
+
+def write_fastq(path, names, seqs, quals):
+    with open(path, 'w') as w:
+        for name, seq, qual in zip(names, seqs, quals):
+            w.write('@{0}\n{1}\n+\n{2}\n'.format(name, seq, qual))
+    return str(path)
+
+
+@pytest.fixture
+def paired_files(tmp_path):
+    names = ['read{0}'.format(i) for i in range(4)]
+    r1 = write_fastq(tmp_path / 'r1.fq', [n + '/1' for n in names], ['ACGT', 'AAAA', 'CCCC', 'GGGG'], ['IIII', '####', 'IIII', 'IIII'])
+    r2 = write_fastq(tmp_path / 'r2.fq', [n + '/2' for n in names], ['TTT', 'GGG', 'AAA', 'CCC'], ['III', 'III', '###', 'III'])
+    return (r1, r2)
+
+
+def test_paired_mate_columns_survive_filters(paired_files):
+    st = read_sequences.read_fastq_paired(*paired_files, combine=True)
+    assert st.mate_columns == {'R1': [1, 2, 3, 4], 'R2': [5, 6, 7]}
+    filtered = st.quality_filter(q=30, p=100)
+    assert len(filtered) == 2
+    assert filtered.mate_columns == st.mate_columns
+    assert st.iloc[[0, 3]].mate_columns == st.mate_columns
+    assert st.loc[:, 3:6].mate_columns == {'R1': [3, 4], 'R2': [5, 6]}
+    st.quality_filter(q=30, p=100, inplace=True)
+    assert st.mate_columns == {'R1': [1, 2, 3, 4], 'R2': [5, 6, 7]}
+
+
+def test_processes_with_limit_warns_and_reads_serially(paired_files):
+    with pytest.warns(UserWarning, match='processes is ignored when limit is set'):
+        st = read_sequences.read_fastq(paired_files[0], limit=2, processes=2)
+    assert list(st.index) == ['read0/1', 'read1/1']
+    np.testing.assert_array_equal(st.seq_table.values, read_sequences.read_fastq(paired_files[0]).seq_table.values[:2])
+
+
+@pytest.mark.parametrize('compression', [None, 'bgzf'])
+def test_parallel_read_matches_serial(tmp_path, compression):
+    rng = np.random.default_rng(0)
+    lengths = rng.integers(20, 80, 500)
+    seqs = [''.join(rng.choice(list('ACGTN'), n)) for n in lengths]
+    quals = [''.join(rng.choice(list('#(5?I'), n)) for n in lengths]
+    text = fastq_text(['read{0}'.format(i) for i in range(500)], seqs, quals)
+    path = write_text(tmp_path / 'reads.fq', text, compression, block_size=4096)
+    serial = read_sequences.read_fastq(path)
+    parallel = read_sequences.read_fastq(path, processes=2)
+    assert list(parallel.index) == list(serial.index)
+    pd.testing.assert_frame_equal(parallel.seq_table, serial.seq_table)
+    pd.testing.assert_frame_equal(parallel.qual_table, serial.qual_table)
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+from seqtables.seq_tables import seqtable
+
+SEQS = ['ACGTACGT', 'TTGCAACG', 'GGGGCCCC', 'ACGTTTTT', 'NNACGTAC']
+QUALS = ['IIIIIIII', '#I#I#I#I', 'ABCDEFGH', 'IIII####', '!!IIIIII']
+
+
+@pytest.fixture
+def st():
+    return seqtable(SEQS, QUALS, index=['a', 'b', 'c', 'd', 'e'])
+
+
+@pytest.mark.parametrize('select', [
+    lambda t: t.iloc[1:4],
+    lambda t: t.iloc[:, 2:6],
+    lambda t: t.iloc[1:3, 2:6],
+    lambda t: t.loc['b':'d'],
+    lambda t: t.loc[:, 3:6],
+    lambda t: t.loc['a':'c', [2, 3, 4]],
+    lambda t: t[3:6],
+    lambda t: t[[2, 3]],
+    lambda t: t[4],
+])
+def test_slices_are_views(st, select):
+    sliced = select(st)
+    assert np.shares_memory(sliced.seq_table.values, st.seq_table.values)
+    assert np.shares_memory(sliced.qual_table.values, st.qual_table.values)
+    expected = st.seq_table.loc[sliced.seq_table.index, sliced.seq_table.columns]
+    pd.testing.assert_frame_equal(sliced.seq_table, expected)
+    pd.testing.assert_frame_equal(sliced.qual_table, st.qual_table.loc[sliced.index, sliced.seq_table.columns])
+
+
+def test_views_are_copied_on_write(st):
+    before = st.seq_table.values.copy()
+    sliced = st.iloc[1:3, 2:6]
+    sliced.seq_table.iloc[0, 0] = ord('N')
+    sliced.qual_table.iloc[0, 0] = 0
+    assert sliced.seq_table.iloc[0, 0] == ord('N')
+    assert (st.seq_table.values == before).all()
+    assert st.qual_table.iloc[1, 2] == ord('#') - 33
+    # changing the original does not change the view either
+    view = st.loc[:, 3:6]
+    st.seq_table.iloc[0, 2] = ord('T')
+    assert view.seq_table.iloc[0, 0] == ord('G')
+    assert view.seq_df.seqs.tolist()[0] == b'GTAC'
+
+
+def test_selections_that_are_not_consecutive_are_copies(st):
+    sliced = st.iloc[[0, 2, 4]]
+    assert list(sliced.index) == ['a', 'c', 'e']
+    pd.testing.assert_frame_equal(sliced.seq_table, st.seq_table.iloc[[0, 2, 4]])
+    assert not np.shares_memory(sliced.seq_table.values, st.seq_table.values)
@@ -0,0 +1,65 @@
+import tracemalloc
+import numpy as np
+from seqtables import storage_util
+from seqtables.seq_tables import seqtable
+
+
+def test_round_trip_of_contiguous_and_strided_arrays(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_util, 'WRITE_CHUNK_SIZE', 64)
+    rng = np.random.default_rng(0)
+    table = rng.integers(0, 255, (100, 30)).astype(np.uint8)
+    arrays = {'contiguous': table, 'columns': table[:, 5:17], 'transposed': table.T, 'counts': np.arange(100, dtype=np.int64), 'empty': table[:0]}
+    path = str(tmp_path / 'arrays.seqtable')
+    storage_util.write_arrays(path, arrays, {'name': 'test'})
+    for mmap in [True, False]:
+        (loaded, metadata) = storage_util.read_arrays(path, mmap)
+        assert metadata == {'name': 'test'}
+        for k, v in arrays.items():
+            assert loaded[k].shape == v.shape
+            assert (loaded[k] == v).all()
+
+
+def test_write_does_not_copy_contiguous_arrays(tmp_path):
+    table = np.zeros((2 ** 12, 2 ** 12), dtype=np.uint8)
+    tracemalloc.start()
+    storage_util.write_arrays(str(tmp_path / 'large.seqtable'), {'seq_table': table}, {})
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert peak < table.nbytes // 4
+
+
+def test_save_and_load_a_selection_of_positions(tmp_path):
+    st = seqtable(['ACGTACGT', 'TTGCAACG', 'GGGGCCCC'], qualitydata=['IIIIIIII', '#I#I#I#I', 'ABCDEFGH'])
+    subset = st.loc[:, 3:6]
+    path = str(tmp_path / 'subset.seqtable')
+    subset.save(path)
+    loaded = seqtable.load(path)
+    assert loaded.seq_table.equals(subset.seq_table)
+    assert loaded.qual_table.equals(subset.qual_table)
+
+
+def test_pack_strings():
+    for strings in [['read1 1:N', 'réad2', '', 'read\n4'], [b'a', b'bc\n', b''], [], ['']]:
+        buf, lengths = storage_util.pack_strings(strings)
+        assert buf.dtype == np.uint8
+        assert storage_util.unpack_strings(buf, lengths, decode=len(strings) == 0 or isinstance(strings[0], str)) == strings
+
+
+def test_save_and_load_the_index(tmp_path):
+    path = str(tmp_path / 'index.seqtable')
+    for index in [['M001:1:1101:1 1:N:0:1', 'M001:1:1101:2 1:N:0:1', 'read3'], [b'a', b'b', b'c'], [10, 5, 7]]:
+        st = seqtable(['ACGT', 'ACGA', 'TTTT'], index=index)
+        st.save(path)
+        loaded = seqtable.load(path)
+        assert loaded.seq_table.index.tolist() == index
+        assert loaded.seq_table.equals(st.seq_table)
+        assert seqtable.load(path, load_index=False).seq_table.index.tolist() == [0, 1, 2]
+
+
+def test_save_and_load_mate_columns(tmp_path):
+    st = seqtable(['ACGTAA', 'ACGATT'], mate_columns={'R1': [1, 2, 3, 4], 'R2': [5, 6]})
+    path = str(tmp_path / 'paired.seqtable')
+    st.save(path)
+    assert seqtable.load(path).mate_columns == {'R1': [1, 2, 3, 4], 'R2': [5, 6]}
+    seqtable(['ACGT']).save(path)
+    assert seqtable.load(path).mate_columns is None
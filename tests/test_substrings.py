@@ -0,0 +1,59 @@
+import itertools
+from collections import Counter
+import numpy as np
+import pytest
+from seqtables import substring_util
+from seqtables.seq_tables import seqtable
+
+SEQS = ['ACTWAC', 'ATTAGC', 'ACTWAC', 'GGGTTN', 'ATTAGA']
+WEIGHTS = np.array([1.5, 2, 0.5, 3, 1])
+
+
+def brute_force(seqs, combos, weights=None):
+    counts = Counter()
+    for row, seq in enumerate(seqs):
+        for combo in combos:
+            counts[(tuple(p + 1 for p in combo), ''.join(seq[p] for p in combo))] += 1 if weights is None else weights[row]
+    return counts
+
+
+@pytest.mark.parametrize('num_cols, word_length, max_span', [(6, 2, None), (6, 3, 2), (7, 3, 4), (5, 1, 0), (4, 4, None)])
+def test_gapped_combinations_order(num_cols, word_length, max_span):
+    expected = [c for c in itertools.combinations(range(num_cols), word_length) if max_span is None or c[-1] - c[0] <= max_span]
+    assert [tuple(c) for c in substring_util.gapped_combinations(num_cols, word_length, max_span).tolist()] == expected
+
+
+def test_get_substrings():
+    st = seqtable(SEQS, encode_letters=False)
+    table = st.get_substrings(3)
+    expected = brute_force(SEQS, list(itertools.combinations(range(6), 3)))
+    assert list(table.columns) == [tuple(p + 1 for p in c) for c in itertools.combinations(range(6), 3)]
+    assert table.values.sum() == len(SEQS) * table.shape[1]
+    assert {(c, s): v for s, row in table.iterrows() for c, v in row.items() if v} == dict(expected)
+
+
+def test_get_kmers():
+    st = seqtable(SEQS, encode_letters=False)
+    for k in [1, 3, 6]:
+        expected = brute_force(SEQS, [tuple(range(s, s + k)) for s in range(6 - k + 1)], WEIGHTS)
+        kmers = st.get_kmers(k, weights=WEIGHTS)
+        assert {(p, s): v for (p, s), v in kmers.items()} == {(c[0], s): v for (c, s), v in expected.items()}
+    # contiguous substrings are the gapped substrings with the smallest span
+    pairs = st.get_kmers(2)
+    gapped = st.get_gapped_substrings(2, max_span=1)
+    assert pairs.tolist() == gapped.tolist()
+
+
+@pytest.mark.parametrize('max_dense', [substring_util.MAX_DENSE_COUNTS, 4])
+def test_get_gapped_substrings(monkeypatch, max_dense):
+    # a small MAX_DENSE_COUNTS counts the substrings with np.unique instead of dense bincounts
+    monkeypatch.setattr(substring_util, 'MAX_DENSE_COUNTS', max_dense)
+    st = seqtable(SEQS, encode_letters=False)
+    combos = [c for c in itertools.combinations(range(6), 3) if c[-1] - c[0] <= 3]
+    for weights in [None, WEIGHTS]:
+        result = st.get_gapped_substrings(3, max_span=3, weights=weights)
+        assert dict(result.items()) == pytest.approx(dict(brute_force(SEQS, combos, weights)))
+        assert result.dtype == (np.int64 if weights is None else np.float64)
+    # collapsed tables are weighted by their counts
+    collapsed = seqtable(SEQS, encode_letters=False).collapse()
+    assert dict(collapsed.get_gapped_substrings(3, max_span=3).items()) == dict(brute_force(SEQS, combos))
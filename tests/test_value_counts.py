@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from seqtables import seq_tables
+
+
+def rare_letter_table():
+    # 'N' only appears in 5 rows that are not part of the sample used by custom_numpy_count to find the letters
+    rng = np.random.default_rng(1)
+    arr = np.frombuffer(b'ACGT', dtype=np.uint8)[rng.integers(0, 4, (1000000, 20))]
+    arr[[1, 3, 5, 7, 9], 10] = ord('N')
+    return arr
+
+
+@pytest.mark.parametrize('method', list(seq_tables.COUNT_METHODS))
+def test_value_counts_finds_rare_letters(method):
+    arr = rare_letter_table()
+    dist = seq_tables.value_counts(arr, method=method)
+    expected = seq_tables.value_counts(arr, method='bincount')
+    assert dist.loc[ord('N'), 10] == 5
+    assert dist.equals(expected)
+
+
+def test_weighted_value_counts_finds_rare_letters():
+    arr = rare_letter_table()
+    weights = np.full(arr.shape[0], 0.5)
+    dist = seq_tables.value_counts(arr, weights, method='compare')
+    assert dist.loc[ord('N'), 10] == 2.5
+    assert dist.equals(seq_tables.value_counts(arr, weights, method='bincount'))
+
+
+@pytest.mark.parametrize('method', list(seq_tables.COUNT_METHODS))
+def test_seq_dist_finds_rare_letters(method, monkeypatch):
+    monkeypatch.setattr(seq_tables, 'choose_count_method', lambda *args, **kwargs: method)
+    st = seq_tables.seqtable(rare_letter_table())
+    assert st.get_seq_dist().loc['N', 11] == 5
+
+
+def test_counting_does_not_calibrate(tmp_path, monkeypatch):
+    # large tables must not time the methods, write a calibration file or change the global random state
+    path = tmp_path / 'count_calibration.json'
+    monkeypatch.setattr(seq_tables, 'COUNT_CALIBRATION_FILE', str(path))
+    monkeypatch.setattr(seq_tables, '_count_models', None)
+    np.random.seed(0)
+    expected = np.random.rand(3)
+    np.random.seed(0)
+    seq_tables.seqtable(rare_letter_table()).get_seq_dist()
+    assert (np.random.rand(3) == expected).all()
+    assert not path.exists()
+    assert seq_tables._get_count_models() == seq_tables.DEFAULT_COUNT_MODELS
+
+
+def test_calibration_keeps_random_state(monkeypatch):
+    monkeypatch.setattr(seq_tables, '_count_models', None)
+    np.random.seed(0)
+    expected = np.random.rand(3)
+    np.random.seed(0)
+    models = seq_tables.calibrate_count_methods(path=None, repeats=1)
+    assert (np.random.rand(3) == expected).all()
+    assert set(models) == set(seq_tables.COUNT_METHODS)
+
+
+def test_weighted_counts_use_bincount():
+    assert seq_tables.choose_count_method(10 ** 7, 300, 4, weighted=True) == 'bincount'